@@ -1,25 +1,21 @@
 """
 Este módulo contém implementações de diversos algoritmos de busca em grafos, 
 incluindo DFS (Busca em Profundidade), BFS (Busca em Largura), A* (A Estrela), 
-Dijkstra, Best First Search e Hill Climbing. Cada algoritmo é responsável 
-por encontrar o caminho entre um nó inicial e um nó final, usando diferentes 
-estratégias de exploração de nós. O código também utiliza a classe 'Navigator' 
+Dijkstra, Best First Search e Hill Climbing, além das versões bidirecionais do 
+BFS, do Dijkstra e do A*, e a busca pela hierarquia de contração. Cada
+algoritmo é responsável por encontrar o caminho entre um nó inicial e um nó
+final, usando diferentes estratégias de exploração de nós. O código também utiliza a classe 'Navigator' 
 para manipulação do grafo e visualização dos estados durante a execução.
+
+As buscas em si ficam em kernels.py (ids internos, bytearray de visitados,
+deque e heapq); as classes daqui ligam os kernels ao Navigator. As mensagens
+de progresso só são exibidas com run(..., verbose=True).
 """
 
 
 from navigator import Navigator
-from queue import Queue, PriorityQueue
-from dataclasses import dataclass, field
-from typing import Any
-
-
-@dataclass(order=True)
-class PrioritizedItem:
-    # Definição da classe PrioritizedItem para ser usada em filas de prioridade.
-    priority: int  # Prioridade do item.
-    # Item armazenado, sem ser comparado na ordenação.
-    item: Any = field(compare=False)
+import numpy as np
+import kernels
 
 
 TIME_PER_IT = 0.1  # Tempo entre as iterações para exibição, em segundos.
@@ -30,88 +26,49 @@ def mostra_grafo(grafo: Navigator, last=False):
     grafo.add_imgtogif()
 
 
+def _hooks(grafo: Navigator, try_plot=False, verbose=False):
+    # Funções que ligam um kernel ao grafo: navegação, imagens do gif e mensagens
+    return {'nav': grafo.nav_internal,
+            'frame': (lambda: mostra_grafo(grafo)) if try_plot else None,
+            'log': print if verbose else None}
+
+
+def _node_heuristic(heuristica, no_final: int):
+    # Heurísticas por nó (como a de landmarks.py) são calculadas pelo id interno
+    # do objetivo; as de heuristicas.py usam as posições e ficam com None
+    if hasattr(heuristica, 'node_heuristic'):
+        return heuristica.node_heuristic(no_final)
+    return None
+
+
 class DFS:
     def __init__(self, grafo: Navigator, heuristica=None):
         self.no_final = None  # O nó objetivo (final).
         self.grafo = grafo  # O grafo sobre o qual a busca será realizada.
-        self.visitados = []  # Lista para armazenar nós visitados.
-
-    def _dfs(self, inicio: int, try_plot=False) -> bool:
-        # Pilha para armazenar os nós a serem visitados.
-        stack = [inicio]  # Inicializa a pilha com o nó inicial.
-        self.visitados = []  # Limpa a lista de nós visitados.
-        
-        while stack:
-            cur = stack.pop()  # Remove o último nó da pilha (topo da pilha).
-            
-            if cur not in self.visitados:
-                self.visitados.append(cur)  # Marca o nó atual como visitado.
-
-                if try_plot:
-                    mostra_grafo(self.grafo)  # Plota o grafo se 'try_plot' for True.
-
-                # Se o nó final foi encontrado, retorna True.
-                if cur == self.no_final:
-                    return True
-
-                # Para cada vizinho do nó atual.
-                for outro in reversed(self.grafo.get_neighboors(cur)):
-                    if outro not in self.visitados:
-                        # Realiza a navegação para o vizinho e empilha.
-                        self.grafo.nav(cur, outro)
-                        print(f'DFS: Indo de {cur} -> {outro}')
-                        stack.append(outro)  # Adiciona o vizinho à pilha.
-        
-        return False  # Se não encontrou o destino, retorna False.
-
-    def run(self, no_inicial: int, no_final: int, try_plot=False) -> bool:
+
+    def run(self, no_inicial: int, no_final: int, try_plot=False, verbose=False) -> bool:
         # Função principal para rodar a busca em profundidade.
         if no_inicial == no_final:
             return True  # Se o nó inicial é o final, não há busca a ser feita.
 
         self.no_final = no_final  # Define o nó objetivo.
-        return self._dfs(no_inicial, try_plot=try_plot)  # Inicia a busca.
+        mapping = self.grafo.node_id_mapping
+        return kernels.dfs(self.grafo.adjacency(), mapping[no_inicial], mapping[no_final],
+                           **_hooks(self.grafo, try_plot, verbose))
 
 
 class BFS:
     def __init__(self, grafo: Navigator, heuristica=None):
         self.grafo = grafo  # O grafo sobre o qual a busca será realizada.
 
-    def run(self, no_inicial: int, no_final: int, try_plot=False) -> bool:
+    def run(self, no_inicial: int, no_final: int, try_plot=False, verbose=False) -> bool:
         # Função principal para rodar a busca em largura.
         if no_inicial == no_final:
             return True  # Se o nó inicial é o final, não há busca a ser feita.
 
-        fila = Queue()  # Cria uma fila para a busca em largura.
-        fila.put(no_inicial)  # Adiciona o nó inicial à fila.
-
-        visitados = set([no_inicial])  # Conjunto de nós visitados.
-
-        while not fila.empty():
-            if try_plot:
-                # Plota o grafo se 'try_plot' for True.
-                mostra_grafo(self.grafo)
-
-            cur = fila.get()  # Pega o próximo nó da fila.
-            print(f'BFS: Expandindo {cur}')
-
-            # Para cada vizinho do nó atual.
-            for outro in self.grafo.get_neighboors(cur):
-                if outro not in visitados:
-                    # Realiza a navegação para o vizinho.
-                    self.grafo.nav(cur, outro)
-                    visitados.add(outro)  # Marca o vizinho como visitado.
-
-                    print(f'BFS: Indo de {cur} -> {outro}')
-
-                    if outro == no_final:
-                        return True  # Se encontrou o destino, retorna True.
-
-                    fila.put(outro)  # Adiciona o vizinho à fila.
-
-        if try_plot:
-            mostra_grafo(self.grafo)  # Plota o grafo ao final da execução.
-        return False  # Se não encontrou o destino, retorna False.
+        mapping = self.grafo.node_id_mapping
+        return kernels.bfs(self.grafo.adjacency(), mapping[no_inicial], mapping[no_final],
+                           **_hooks(self.grafo, try_plot, verbose))
 
 
 class AEstrela:
@@ -123,65 +80,21 @@ class AEstrela:
         self.heuristica = heuristica
         self.heuristic_historic = []  # Histórico das heurísticas calculadas.
 
-    def run(self, no_inicial: int, no_final: int, try_plot=False, w: float = 1) -> bool:
+    def run(self, no_inicial: int, no_final: int, try_plot=False, w: float = 1,
+            verbose=False) -> bool:
         # Função principal para rodar a busca A*.
         if no_inicial == no_final:
             return True  # Se o nó inicial é o final, não há busca a ser feita.
 
-        goal_xy = self.grafo.get_pos_goal()  # Obtém a posição do objetivo.
-        print(f'{goal_xy = }')
-
-        fila = PriorityQueue()  # Fila de prioridade para a busca A*.
-        # Adiciona o nó inicial à fila.
-        fila.put(PrioritizedItem(0, (no_inicial, 0)))
-
-        # Mantem a menor distancia encontrada ate agora
-        # Dicionário com as distâncias até os nós.
-        distancias = {no_inicial: 0}
-
-        while not fila.empty():
-            # Pega o item com menor prioridade (menor custo).
-            item = fila.get()
-            est = item.priority  # Estimativa do custo (prioridade).
-            (cur, dist) = item.item  # Nó atual e sua distância.
-
-            # Se depois de por na fila encontrou-se um caminho melhor, ignora
-            if cur in distancias and distancias[cur] < dist:
-                continue
-
-            print(f'Expandindo {cur} ({dist = })')
-            self.heuristic_historic.append(est)
-
-            # Para cada vizinho do nó atual.
-            for (outro, peso) in self.grafo.get_neighboors(cur, return_weight=True):
-                dist_outro = dist + peso  # Calcula a nova distância.
-
-                # Se essa é a melhor distância encontrada até agora
-                if outro not in distancias or dist_outro < distancias[outro]:
-                    # Realiza a navegação para o vizinho.
-                    self.grafo.nav(cur, outro)
-                    if try_plot:
-                        # Plota o grafo se 'try_plot' for True.
-                        mostra_grafo(self.grafo)
-                    if outro == no_final:
-                        return True  # Se encontrou o destino, retorna True.
-
-                    # Calcula a estimativa do próximo vértice
-                    outro_xy = self.grafo.get_pos(outro)
-                    # Estimativa considerando o peso.
-                    est = self.heuristica(outro_xy, goal_xy)*w
-                    # Total de distância + estimativa.
-                    est_outro = dist_outro + est
-
-                    # Atualiza a distância para o vizinho.
-                    distancias[outro] = dist_outro
-                    # Adiciona o vizinho à fila de prioridade.
-                    fila.put(PrioritizedItem(est_outro, (outro, dist_outro)))
-
-                    print(
-                        f'Indo de {cur} -> {outro} ({outro_xy = }, {est = }, tot = {est_outro})')
-
-        return False  # Se não encontrou o destino, retorna False.
+        self.heuristic_historic = []  # O histórico é só desta busca.
+        goal_xy = self.grafo.get_pos_goal().tolist()  # Obtém a posição do objetivo.
+        if verbose:
+            print(f'{goal_xy = }')
+        mapping = self.grafo.node_id_mapping
+        return kernels.astar(self.grafo.adjacency(), mapping[no_inicial], mapping[no_final],
+                             self.heuristica, goal_xy, w=w, historic=self.heuristic_historic,
+                             node_heuristic=_node_heuristic(self.heuristica, mapping[no_final]),
+                             **_hooks(self.grafo, try_plot, verbose))
 
 
 class Dijkstra:
@@ -189,12 +102,12 @@ class Dijkstra:
         self.grafo = grafo  # O grafo sobre o qual a busca será realizada.
         self.heuristic_historic = []  # Histórico das heurísticas calculadas.
 
-    def run(self, no_inicial: int, no_final: int, try_plot=False) -> bool:
+    def run(self, no_inicial: int, no_final: int, try_plot=False, verbose=False) -> bool:
         # Função principal para rodar o algoritmo de Dijkstra.
         # Usando A* com heurística zero (sem consideração de estimativa).
         aest = AEstrela(self.grafo, lambda p1, p2: 0)
         # Chama A* para rodar Dijkstra.
-        conseguiu_chegar = aest.run(no_inicial, no_final, try_plot=try_plot)
+        conseguiu_chegar = aest.run(no_inicial, no_final, try_plot=try_plot, verbose=verbose)
         return conseguiu_chegar  # Retorna o resultado da execução.
 
 
@@ -205,48 +118,18 @@ class BestFirstSearch:
         self.heuristica = heuristica
         self.heuristic_historic = []  # Histórico das heurísticas calculadas.
 
-    def run(self, no_inicial: int, no_final: int, try_plot=False) -> bool:
+    def run(self, no_inicial: int, no_final: int, try_plot=False, verbose=False) -> bool:
         # Função principal para rodar a Best First Search (Busca Primeiro o Melhor).
         if no_inicial == no_final:
             return True  # Se o nó inicial é o final, não há busca a ser feita.
 
-        fila = PriorityQueue()  # Fila de prioridade para a busca.
-        # Estimativa da distância inicial.
-        est = self.heuristica(self.grafo.get_pos(
-            no_inicial), self.grafo.goal_xy)
-
-        # Adiciona o nó inicial à fila de prioridade.
-        fila.put(PrioritizedItem(est, no_inicial))
-        visited = set([no_inicial])  # Conjunto de nós visitados.
-
-        while not fila.empty():
-            # Pega o item com menor prioridade (menor estimativa).
-            getted = fila.get()
-            cur = getted.item  # Nó atual.
-
-            self.heuristic_historic.append(getted.priority)
-
-            if try_plot:
-                # Plota o grafo se 'try_plot' for True.
-                mostra_grafo(self.grafo)
-            if cur == no_final:
-                return True  # Se encontrou o destino, retorna True.
-
-            # Para cada vizinho do nó atual.
-            for outro in self.grafo.get_neighboors(cur):
-                if outro not in visited:
-                    # Realiza a navegação para o vizinho.
-                    self.grafo.nav(cur, outro)
-                    visited.add(outro)  # Marca o vizinho como visitado.
-
-                    # Obtém a posição do vizinho.
-                    outro_xy = self.grafo.get_pos(outro)
-                    # Estimativa de distância até o objetivo.
-                    est = self.heuristica(outro_xy, self.grafo.goal_xy)
-                    # Adiciona o vizinho à fila de prioridade.
-                    fila.put(PrioritizedItem(est, outro))
-
-        return False  # Se não encontrou o destino, retorna False.
+        self.heuristic_historic = []  # O histórico é só desta busca.
+        mapping = self.grafo.node_id_mapping
+        return kernels.best_first(self.grafo.adjacency(), mapping[no_inicial], mapping[no_final],
+                                  self.heuristica, self.grafo.goal_xy.tolist(),
+                                  historic=self.heuristic_historic,
+                                  node_heuristic=_node_heuristic(self.heuristica, mapping[no_final]),
+                                  **_hooks(self.grafo, try_plot, verbose))
 
 
 class HillClimb:
@@ -262,43 +145,126 @@ class HillClimb:
         self.heuristica = heuristica
         self.heuristic_historic = []  # Histórico das heurísticas calculadas.
 
-    def run(self, no_inicial: int, no_final: int, try_plot=False) -> bool:
+    def run(self, no_inicial: int, no_final: int, try_plot=False, verbose=False) -> bool:
         # Função principal para rodar a Hill Climb (Escalada de Colina).
         if no_inicial == no_final:
             return True  # Se o nó inicial é o final, não há busca a ser feita.
 
-        cur = no_inicial  # Começa no nó inicial.
-        inicial_xy = self.grafo.get_pos(no_inicial)  # Posição do nó inicial.
-        # Estimativa inicial.
-        cur_est = self.heuristica(inicial_xy, self.grafo.goal_xy)
-        
-        while cur != no_final:
-            print(f'HillClimb: expandindo {cur} ({cur_est = })')
-
-            # Para cada vizinho do nó atual.
-            for outro in self.grafo.get_neighboors(cur):
-                # Obtém a posição do vizinho.
-                outro_xy = self.grafo.get_pos(outro)
-                # Estimativa de distância até o objetivo.
-                est = self.heuristica(outro_xy, self.grafo.goal_xy)
-
-                print(f'HillClimb: tentando {outro = } ({est = })')
-                if est < cur_est:  # Se encontrou um vizinho melhor.
-                    self.grafo.nav(cur, outro)  # Realiza a navegação.
-                    if try_plot:
-                        # Plota o grafo se 'try_plot' for True.
-                        mostra_grafo(self.grafo)
-                    print(f'HillClimb: inde de {cur} -> {outro}')
-                    cur = outro  # Move para o próximo nó.
-                    cur_est = est  # Atualiza a estimativa.
-                    self.heuristic_historic.append(est)
-                    break
-            else:
-                # Nao achou nenhum vizinho melhor
-                if try_plot:
-                    # Plota o grafo ao final da execução.
-                    mostra_grafo(self.grafo)
-                # Se não encontrou um vizinho melhor, retorna False.
-                return False
-
-        return True  # Se chegou ao objetivo, retorna True.
+        self.heuristic_historic = []  # O histórico é só desta busca.
+        mapping = self.grafo.node_id_mapping
+        return kernels.hill_climb(self.grafo.adjacency(), mapping[no_inicial], mapping[no_final],
+                                  self.heuristica, self.grafo.goal_xy.tolist(),
+                                  historic=self.heuristic_historic,
+                                  node_heuristic=_node_heuristic(self.heuristica, mapping[no_final]),
+                                  **_hooks(self.grafo, try_plot, verbose))
+
+
+class BidirectionalBFS:
+    # BFS que cresce uma fronteira a partir de cada ponta (ver kernels.bidirectional_bfs)
+    def __init__(self, grafo: Navigator, heuristica=None):
+        self.grafo = grafo  # O grafo sobre o qual a busca será realizada.
+
+    def run(self, no_inicial: int, no_final: int, try_plot=False, verbose=False) -> bool:
+        if no_inicial == no_final:
+            return True  # Se o nó inicial é o final, não há busca a ser feita.
+
+        mapping = self.grafo.node_id_mapping
+        return kernels.bidirectional_bfs(self.grafo.adjacency(), self.grafo.reverse_adjacency(),
+                                         mapping[no_inicial], mapping[no_final],
+                                         **_hooks(self.grafo, try_plot, verbose))
+
+
+class BidirectionalDijkstra:
+    # Dijkstra que cresce uma fronteira a partir de cada ponta (ver kernels.bidirectional_dijkstra)
+    def __init__(self, grafo: Navigator, heuristica=None):
+        self.grafo = grafo  # O grafo sobre o qual a busca será realizada.
+        self.heuristic_historic = []  # Histórico das prioridades dos nós expandidos.
+        self.distancia_minima = None  # Menor distância encontrada na última busca.
+
+    def _potential(self, no_inicial: int, no_final: int):
+        # Sem heurística, o potencial é nulo
+        return None
+
+    def run(self, no_inicial: int, no_final: int, try_plot=False, verbose=False) -> bool:
+        if no_inicial == no_final:
+            self.distancia_minima = 0
+            return True  # Se o nó inicial é o final, não há busca a ser feita.
+
+        self.heuristic_historic = []  # O histórico é só desta busca.
+        mapping = self.grafo.node_id_mapping
+        self.distancia_minima = kernels.bidirectional_dijkstra(
+            self.grafo.adjacency(), self.grafo.reverse_adjacency(),
+            mapping[no_inicial], mapping[no_final],
+            potential=self._potential(no_inicial, no_final),
+            historic=self.heuristic_historic, **_hooks(self.grafo, try_plot, verbose))
+        return self.distancia_minima < float('inf')
+
+
+class BidirectionalAEstrela(BidirectionalDijkstra):
+    """
+    A* bidirecional. A heurística entra pelo potencial médio
+    (heuristica(nó, objetivo) - heuristica(nó, início))/2*w, que mantém a
+    distância exata quando a heurística é consistente (ex.: euclidiana com os
+    pesos do MundoPequeno) e w = 1. Com a heurística de landmarks (landmarks.py),
+    as estimativas até o objetivo e a partir do início vêm das tabelas.
+    """
+
+    def __init__(self, grafo: Navigator, heuristica):
+        super().__init__(grafo)
+        # Função heurística que estimará a distância até o objetivo.
+        self.heuristica = heuristica
+        self.w = 1
+
+    def run(self, no_inicial: int, no_final: int, try_plot=False, w: float = 1,
+            verbose=False) -> bool:
+        self.w = w
+        return super().run(no_inicial, no_final, try_plot=try_plot, verbose=verbose)
+
+    def _potential(self, no_inicial: int, no_final: int):
+        w = self.w
+        if hasattr(self.heuristica, 'node_heuristic'):
+            # Landmarks: as estimativas até o objetivo e a partir do início de todos os nós
+            mapping = self.grafo.node_id_mapping
+            with np.errstate(invalid='ignore'):
+                potentials = (self.heuristica.to_goal(mapping[no_final])
+                              - self.heuristica.from_source(mapping[no_inicial])) / 2 * w
+            # inf - inf: o nó não está em nenhum caminho do início ao objetivo
+            potentials[np.isnan(potentials)] = 0
+            return potentials.tolist().__getitem__
+
+        positions = self.grafo.adjacency()[4]
+        inicial_xy = self.grafo.get_pos(no_inicial).tolist()
+        goal_xy = self.grafo.get_pos(no_final).tolist()
+        heuristica = self.heuristica
+
+        def potential(node: int):
+            return (heuristica(positions[node], goal_xy) - heuristica(positions[node], inicial_xy)) / 2 * w
+        return potential
+
+
+class ContractionHierarchySearch:
+    """
+    Menor caminho pela hierarquia de contração do grafo (ver hierarchy.py): a
+    hierarquia é calculada na primeira busca e reaproveitada nas seguintes, e cada
+    busca só percorre o caminho já desfeito dos atalhos.
+    """
+
+    def __init__(self, grafo: Navigator, heuristica=None):
+        self.grafo = grafo  # O grafo sobre o qual a busca será realizada.
+        self.distancia_minima = None  # Menor distância encontrada na última busca.
+
+    def run(self, no_inicial: int, no_final: int, try_plot=False, verbose=False) -> bool:
+        if no_inicial == no_final:
+            self.distancia_minima = 0
+            return True  # Se o nó inicial é o final, não há busca a ser feita.
+
+        self.distancia_minima, caminho = self.grafo.contraction_hierarchy().path(no_inicial, no_final)
+        hooks = _hooks(self.grafo, try_plot, verbose)
+        mapping = self.grafo.node_id_mapping
+        for atual, outro in zip(caminho, caminho[1:]):
+            if hooks['log'] is not None:
+                hooks['log'](f'Indo de {atual} -> {outro}')
+            hooks['nav'](mapping[atual], mapping[outro])
+            if hooks['frame'] is not None:
+                hooks['frame']()
+        return bool(caminho)
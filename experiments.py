@@ -1,4 +1,5 @@
-from generator import MundoPequeno
+from generator import MundoPequeno, generate_batch
+from hierarchy import hierarchy_path
 from pipeline import *
 import os
 import time
@@ -7,12 +8,6 @@ import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
 import matplotlib.colors as mcolors
 
-def create_rede(n,k,p):
-    mp = MundoPequeno(n, seed=42)
-    mp.create_data(dim=2,space=n)
-    mp.create_connections(k, p)
-    return mp
-
 n=2000
 k=7
 quantity_tests=15
@@ -36,22 +31,17 @@ experimentos = (
 
 print("Instanciando experimentos ----")
 main_path = os.path.dirname(os.path.abspath(__file__))    
+# Gera (ou reaproveita do backup) todas as redes em paralelo, cada uma com a sua seed
+configs = [{**experimento, 'seed': 42, 'dim': 2, 'space': experimento['n']}
+           for experimento in experimentos]
+print(' '*2,f"Verificando existência de backups em [saves/]...")
+paths = generate_batch(configs, cache_dir=os.path.join(main_path, 'saves'))
 redes=[]
-for experimento in experimentos:
+for experimento, file_path in zip(experimentos, paths):
     n,k,p = experimento.values()
-    file_path = f'saves/{n}nodes_k={k}_p={p}.pkl'
-    print(' '*2,f"Verificando existência de backup [{file_path}]...")
-    
-    file_path = os.path.join(main_path, file_path)
-    if not os.path.isfile(file_path):
-        print(' '*4,'Arquivo não encontrado. Realizando criação de rede Mundo Pequeno') 
-        rede = create_rede(n,k,p)
-        rede.save(relative_path='saves')
-        print(' '*4,'Rede criada e salva com sucesso')
-    else:
-        rede = MundoPequeno.load(file_path)
-        print(' '*4,"Arquivo encontrado. Rede obtida por backup")
-    redes.append((rede,(n,k,p)))
+    rede = MundoPequeno.load(file_path)
+    print(' '*4,f"Rede obtida de [{file_path}]")
+    redes.append((rede,(n,k,p),file_path))
 
 
 
@@ -61,7 +51,7 @@ for experimento in experimentos:
 
 ## Configurando experimentos
 def run_pipeline(algorithm_name:str,
-                 rede:MundoPequeno,
+                 graph:Navigator,
                  initial:int,
                  goal:int,
                  heuristica='euclidian'
@@ -74,19 +64,18 @@ def run_pipeline(algorithm_name:str,
         kwargs_run = {}
     
     results = pipeline(
-        rede.get_connections(),        # Conexões geradas no mundo pequeno
+        graph,                         # Grafo compilado uma vez para todas as buscas
         algorithm_name,                # Nome do algoritmo
         heuristica,                    # Nome da heurística: Euclidiana
         initial,                       # Nó inicial para a busca (nó 1)
         goal,                          # Nó objetivo para a busca (nó 13)
-        nodes_positions=rede.embeddings,
         kwargs_run = kwargs_run
     )
     return results
 
 
 def run_test(algorithm_name:str,
-             rede:MundoPequeno,
+             graph:Navigator,
              quantity_tests=10,
              heuristica='euclidian'):
     
@@ -99,7 +88,7 @@ def run_test(algorithm_name:str,
     for i in range(quantity_tests):
         initial = random.randint(0,n-1)
         goal = random.randint(0,n-1)
-        exp_name,delay,dist,chegou,steps,historic = run_pipeline(algorithm_name,rede,initial,goal,heuristica=heuristica)
+        exp_name,delay,dist,chegou,steps,historic = run_pipeline(algorithm_name,graph,initial,goal,heuristica=heuristica)
         delay_mean+=delay
         dist_mean+=dist
         steps_mean+=steps
@@ -126,14 +115,19 @@ def run_test(algorithm_name:str,
 
 
 estatisticas = []
-for (rede,(n,k,p)) in redes:
+for (rede,(n,k,p),file_path) in redes:
     print("\n"*4,f'==================== Rodando experimento n={n} k={k} p={p}')
     
     algorithms_results=[]
+    # O grafo é compilado uma vez e cada busca só o volta ao estado inicial
+    graph = build_graph(rede.iter_connections(), nodes_positions=rede.embeddings, headless=True)
+    # A hierarquia de contração (algoritmo CH) fica salva ao lado da rede e só é
+    # calculada na primeira execução
+    graph.contraction_hierarchy(directory=hierarchy_path(file_path), verbose=True)
     for algorithm_name in algorithms_to_run:
         print(' '*2,f'Rodando algoritmo [{algorithm_name}] em 3s...')
         # time.sleep(3)
-        results = run_test(algorithm_name,rede,quantity_tests=quantity_tests)
+        results = run_test(algorithm_name,graph,quantity_tests=quantity_tests)
         algorithms_results.append(results)
         print('\n\n')
     estatisticas.append(((n,k,p),algorithms_to_run,algorithms_results))
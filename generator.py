@@ -1,7 +1,16 @@
 import numpy as np
 from math import sqrt
+import os
+import json
+import hashlib
+import inspect
 import pickle
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from typing import cast
+from spatial import GridIndex
+from storage import save_arrays, load_arrays, is_saved_dir
+from nndescent import nn_descent, knn_recall
 
 """
 Este código é responsável por gerar um grafo de pequeno mundo, no qual a maioria dos nós
@@ -18,6 +27,13 @@ e geração de conexões entre os nós.
 def cosine_f(u, v):
     return np.sum(u * v) / (sqrt(np.sum(u ** 2)) * sqrt(np.sum(v ** 2)))
 
+# Distância cosseno (1 - similaridade): 0 para vetores na mesma direção, 2 para
+# direções opostas. É a métrica 'cosine' usada para ordenar vizinhos e como peso
+
+
+def cosine_distance_f(u, v):
+    return max(1 - cosine_f(u, v), 0)
+
 # Função para calcular a distância euclidiana entre dois vetores u e v
 
 
@@ -25,13 +41,114 @@ def euclidian_f(u, v):
     return sqrt(np.sum((u - v) ** 2))
 
 
-# Dicionário de métricas disponíveis para o cálculo de distâncias
+# Versões vetorizadas das métricas acima. Operam sobre o último eixo e aceitam
+# broadcasting, então servem tanto para pares (m, dim) x (m, dim) quanto para
+# blocos (b, 1, dim) x (1, n, dim). Produzem os mesmos valores das versões por par.
+
+
+def cosine_batch(u, v):
+    return np.sum(u * v, axis=-1) / (np.sqrt(np.sum(u ** 2, axis=-1)) * np.sqrt(np.sum(v ** 2, axis=-1)))
+
+
+def cosine_distance_batch(u, v):
+    # O arredondamento pode dar 1 - cos um pouco abaixo de 0; os pesos nunca ficam negativos
+    return np.maximum(1 - cosine_batch(u, v), 0)
+
+
+def euclidian_batch(u, v):
+    return np.sqrt(np.sum((u - v) ** 2, axis=-1))
+
+
+# Formato de cada conexão nos arquivos escritos por MundoPequeno.save_connections
+edge_dtype = np.dtype([('src', np.int64), ('dst', np.int64), ('weight', np.float64)])
+
+
+def read_connections(file_name: str, chunk_size: int = 65536):
+    """
+    Lê em blocos um arquivo de conexões escrito por MundoPequeno.save_connections.
+    O arquivo é aberto com memmap, então só o bloco atual fica em memória.
+    Yields:
+        (src, dst, weight) - arrays com a origem, o destino e a distância de cada conexão
+    """
+    file_name += '.npy' if not file_name.endswith('.npy') else ''
+    edges = np.load(file_name, mmap_mode='r')
+    for start in range(0, len(edges), chunk_size):
+        block = np.asarray(edges[start:start + chunk_size])
+        yield block['src'], block['dst'], block['weight']
+
+
+def edges_to_csr(src: np.ndarray, dst: np.ndarray, weights: np.ndarray, n: int, dtype=np.float64):
+    """
+    Monta a adjacência CSR de um grafo não direcionado a partir de uma lista de arestas.
+    Cada aresta é canonizada como (min, max), auto-conexões são descartadas e arestas
+    repetidas (em qualquer sentido) viram uma só, mantendo o peso da primeira ocorrência.
+    Args:
+        src, dst: np.ndarray - extremidades de cada aresta (ids de 0 a n-1)
+        weights: np.ndarray - peso de cada aresta
+        n: int - número de nós
+        dtype [default=np.float64] - tipo dos pesos (np.float32 economiza memória)
+    Returns:
+        (indptr, indices, weights) - os vizinhos do nó i são indices[indptr[i]:indptr[i+1]],
+        em ordem crescente, com os pesos correspondentes em weights[indptr[i]:indptr[i+1]]
+    """
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    weights = np.asarray(weights)
+    keep = src != dst
+    low = np.minimum(src, dst)[keep]
+    high = np.maximum(src, dst)[keep]
+    weights = weights[keep]
+
+    # Remove as arestas repetidas
+    _, first = np.unique(low * n + high, return_index=True)
+    low, high, weights = low[first], high[first], weights[first]
+
+    # Cada aresta aparece na linha das suas duas extremidades
+    rows = np.concatenate([low, high])
+    cols = np.concatenate([high, low])
+    order = np.lexsort((cols, rows))
+    index_dtype = np.int32 if n < np.iinfo(np.int32).max else np.int64
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+    return (indptr,
+            cols[order].astype(index_dtype),
+            np.concatenate([weights, weights])[order].astype(dtype))
+
+
+# Dicionário de métricas disponíveis para o cálculo de distâncias. Todas são
+# distâncias (menor = mais próximo), então servem direto como peso das arestas
 metrics = {
-    'euclidean': euclidian_f,  # Distância Euclidiana
-    'cosine': cosine_f         # Similaridade Cosseno
+    'euclidean': euclidian_f,     # Distância Euclidiana
+    'cosine': cosine_distance_f   # Distância Cosseno (1 - similaridade)
+}
+
+# Mesmas métricas, na versão vetorizada
+batch_metrics = {
+    'euclidean': euclidian_batch,
+    'cosine': cosine_distance_batch
 }
 
 
+def distance_blocks(embeddings: np.ndarray, metric: str = 'euclidean', block_size: int = 256):
+    """
+    Calcula a matriz de distâncias em blocos de linhas, sem nunca alocar mais
+    do que block_size x n x dim valores temporários.
+    Args:
+        embeddings: np.ndarray (n, dim) - embeddings dos nós
+        metric: str [default='euclidean'] - métrica usada ('euclidean' ou 'cosine')
+        block_size: int [default=256] - quantidade de linhas calculadas por vez
+    Yields:
+        (inicio, fim, bloco) - bloco é a matriz (fim-inicio, n) com as distâncias
+        das linhas inicio:fim para todos os nós
+    """
+    metric_f = batch_metrics[metric]
+    n = len(embeddings)
+    others = embeddings[None, :, :]
+    for start in range(0, n, block_size):
+        end = min(start + block_size, n)
+        yield start, end, metric_f(embeddings[start:end, None, :], others)
+
+
 class MundoPequeno():
     def __init__(self, n: int, seed=None):
         """
@@ -51,51 +168,199 @@ class MundoPequeno():
     def set_seed(self, seed):
         """
         Define a semente para geração aleatória de números.
+        Cada grafo tem o seu próprio gerador (self.rng), então gerar vários grafos
+        ao mesmo tempo não interfere no estado global do numpy nem entre eles.
         Args:
             seed: int - semente para a geração dos dados aleatórios
         """
         if seed is None:
-            self.seed = np.random.randint(0, np.iinfo(np.int32).max)
+            self.seed = int(np.random.default_rng().integers(0, np.iinfo(np.int32).max))
         else:
             self.seed = seed
         print(f"Seed: {self.seed}")
-        np.random.seed(self.seed)
+        self.rng = np.random.default_rng(self.seed)
 
-    def create_data(self, dim: int = 2, space: int = 1, metric: str = 'euclidean', verbose=False):
+    def create_data(self, dim: int = 2, space: int = 1, metric: str = 'euclidean', verbose=False,
+                    block_size: int = 256, mode: str = 'dense', embeddings: np.ndarray = None,
+                    kwargs_knn={}):
         """
-        Gera os dados de embeddings dos nós e a matriz de distâncias entre os nós.
+        Gera os dados de embeddings dos nós e a estrutura usada para achar os vizinhos.
         Args:
             dim: int [default=2] - dimensão das embeddings dos nós
             space: int [default=1] - fator de espaçamento entre os nós (aumenta o espaço entre eles)
-            metric: str [default='euclidean'] - métrica usada para calcular a distância ('euclidean' ou 'cosine')
+            metric: str [default='euclidean'] - métrica usada para calcular a distância ('euclidean' ou
+                'cosine', a distância cosseno 1 - cos: os vizinhos são os mais similares)
             verbose: bool [default=False] - se True, exibe informações durante a execução
+            block_size: int [default=256] - linhas da matriz calculadas por vez (limita o pico de memória)
+            mode: str [default='dense'] - 'dense' calcula a matriz de distâncias n x n;
+                'grid' usa um índice espacial (GridIndex) e nunca monta a matriz,
+                o que permite redes com milhões de nós (só 'euclidean', dim 2 ou 3);
+                'nndescent' acha os vizinhos de forma aproximada por NN-descent, para
+                embeddings de alta dimensão (qualquer métrica). O recall obtido contra
+                uma amostra exata é exibido e guardado em self.knn_recall
+            embeddings: np.ndarray (n, dim) [default=None] - embeddings prontas para usar
+                no lugar das aleatórias (dim e space são ignorados)
+            kwargs_knn: dict [default={}] - parâmetros extras do modo 'nndescent'
+                (ver nndescent.nn_descent) e 'recall_sample', o tamanho da amostra exata
         """
+        if metric not in batch_metrics:
+            raise ValueError(
+                f"Erro - métrica '{metric}' desconhecida. Use uma de {list(batch_metrics.keys())}")
+        if mode not in ('dense', 'grid', 'nndescent'):
+            raise ValueError(
+                f"Erro - modo '{mode}' desconhecido. Use 'dense', 'grid' ou 'nndescent'")
+        if mode == 'grid' and metric != 'euclidean':
+            raise ValueError(
+                "Erro - o modo 'grid' só suporta a métrica 'euclidean'")
         self.space = space
         self.metric = metric
-        # Seleção da função de distância de acordo com a métrica
-        metric_f = metrics[metric]
+        self.block_size = block_size
+        self.mode = mode
+        self.kwargs_knn = kwargs_knn
 
-        # Gera embeddings aleatórias para os nós no espaço definido
-        self.embeddings = np.random.rand(self.n, dim) * space
+        if embeddings is None:
+            # Gera embeddings aleatórias para os nós no espaço definido
+            self.embeddings = self.rng.random((self.n, dim)) * space
+        else:
+            self.embeddings = np.asarray(embeddings, dtype=np.float64)
+            if len(self.embeddings) != self.n:
+                raise ValueError(
+                    f"Erro - foram passadas {len(self.embeddings)} embeddings para um grafo de {self.n} nós")
         self.has_data = True  # Marca que os dados foram gerados
 
-        # Criação da matriz de distâncias entre os nós
-        self.distances = np.array([[0, ] * self.n] * self.n, dtype=np.float64)
-        for i in range(self.n):
-            for j in range(i + 1, self.n):  # A matriz é simétrica, então só calcula uma metade
-                u = self.embeddings[i]
-                v = self.embeddings[j]
-                self.distances[i][j] = metric_f(u, v)
-                self.distances[j][i] = self.distances[i][j]
+        self.distances = None
+        self.index = None
+        if mode == 'nndescent':
+            # Os vizinhos só são calculados no create_connections, quando k é conhecido
+            return
+        if mode == 'grid':
+            # Índice espacial sobre as embeddings, sem matriz de distâncias
+            self.index = GridIndex(self.embeddings)
             if verbose:
-                print(f"Calculating distances: {100 * float(i) / self.n:.2f}%")
+                print(f"GridIndex: grade {self.index.shape} com célula de lado {self.index.cell_size:.4f}")
+            return
 
-        # Organiza os nós pelos vizinhos mais próximos
-        self.organized_nearest = np.argsort(self.distances, axis=1)
-        # Remove o próprio nó de cada linha (auto-conexão)
-        self.organized_nearest = self.organized_nearest[:, 1:]
-        if verbose:
-            print("organized_nearest:\n", self.organized_nearest, '\n\n')
+        # Criação da matriz de distâncias entre os nós, calculada em blocos de linhas
+        self.distances = np.empty((self.n, self.n), dtype=np.float64)
+        for start, end, block in distance_blocks(self.embeddings, metric, block_size):
+            self.distances[start:end] = block
+            if verbose:
+                print(f"Calculating distances: {100 * float(end) / self.n:.2f}%")
+        # A distância de um nó para ele mesmo não é calculada (fica zerada)
+        np.fill_diagonal(self.distances, 0)
+
+    def _nearest(self, k: int):
+        """
+        Seleciona, para cada nó, os k vizinhos mais próximos (sem contar ele mesmo),
+        ordenados da menor para a maior distância.
+        No modo 'dense' usa seleção parcial (argpartition) sobre a matriz de distâncias
+        em vez de ordenar as linhas inteiras; no modo 'grid' consulta o índice espacial.
+        Returns:
+            (np.ndarray (n, k), np.ndarray (n, k)) - índices e distâncias dos k vizinhos
+            mais próximos de cada nó
+        """
+        if self.mode == 'grid':
+            return self._spatial_index().knn(k)
+        if self.mode == 'nndescent':
+            return self._approximate_nearest(k)
+
+        k = min(k, self.n - 1)
+        nearest = np.empty((self.n, k), dtype=int)
+        for start in range(0, self.n, self.block_size):
+            end = min(start + self.block_size, self.n)
+            block = self._distance_rows(start, end)
+            rows = np.arange(end - start)
+            block[rows, rows + start] = np.inf  # Remove a auto-conexão
+            if k < self.n - 1:
+                candidates = np.argpartition(block, k - 1, axis=1)[:, :k]
+            else:
+                candidates = np.tile(np.arange(self.n), (end - start, 1))
+            # Ordena apenas os k candidatos de cada linha
+            order = np.argsort(np.take_along_axis(
+                block, candidates, axis=1), axis=1, kind='stable')
+            nearest[start:end] = np.take_along_axis(candidates, order, axis=1)[:, :k]
+        return nearest, self._pair_distances(np.arange(self.n)[:, None], nearest)
+
+    def _approximate_nearest(self, k: int):
+        """
+        kNN aproximado por NN-descent. Mede o recall contra o kNN exato de uma
+        amostra de nós, exibe e guarda em self.knn_recall.
+        """
+        kwargs = dict(self.kwargs_knn)
+        recall_sample = kwargs.pop('recall_sample', 200)
+        metric_f = batch_metrics[self.metric]
+        nearest, distances = nn_descent(self.embeddings, k, self.metric, metric_f, self.rng, **kwargs)
+        self.knn_recall = knn_recall(self.embeddings, nearest, metric_f, self.rng,
+                                     sample_size=recall_sample)
+        print(f"NN-descent: recall@{nearest.shape[1]} = {self.knn_recall:.4f} "
+              f"(amostra de {min(recall_sample, self.n)} nós)")
+        return nearest, distances
+
+    def _distance_rows(self, start: int, end: int):
+        """
+        Retorna uma cópia das linhas start:end da matriz de distâncias. Se a matriz
+        não estiver em memória (grafo carregado do disco), as linhas são recalculadas.
+        """
+        if self.distances is not None:
+            return self.distances[start:end].copy()
+        return batch_metrics[self.metric](self.embeddings[start:end, None, :],
+                                          self.embeddings[None, :, :])
+
+    def _spatial_index(self):
+        # O índice espacial não é salvo em disco; é reconstruído no primeiro uso
+        if getattr(self, 'index', None) is None:
+            self.index = GridIndex(self.embeddings)
+        return self.index
+
+    def _ranked(self, nodes: np.ndarray, ranks: np.ndarray):
+        """
+        Para cada nó em nodes, retorna o vizinho que ocupa a posição ranks[i] na
+        ordem de distância (a posição 0 é o vizinho mais próximo, sem contar o próprio nó).
+        Cada linha usa uma seleção parcial em O(n), sem ordenar a linha inteira.
+        """
+        selected = np.empty(len(nodes), dtype=int)
+        for i, (node, rank) in enumerate(zip(nodes, ranks)):
+            row = self._distance_rows(node, node + 1)[0]
+            row[node] = np.inf  # Remove a auto-conexão
+            selected[i] = np.argpartition(row, rank)[rank]
+        return selected
+
+    def _check_far(self, nodes: np.ndarray, k: int):
+        """
+        Lança um erro se algum nó de nodes não tem nenhum candidato a vizinho distante
+        (todos os n nós são ele mesmo ou um dos seus k mais próximos). Sem essa
+        verificação o sorteio por rejeição do _far_sample não terminaria.
+        """
+        if len(nodes) and k + int((nodes < self.n).any()) >= self.n:
+            raise ValueError(
+                f"Erro - com k={k} e {self.n} nós não sobra nenhum nó fora dos k mais próximos "
+                "para as conexões distantes; use p=0 ou um k menor")
+
+    def _far_sample(self, nodes: np.ndarray, nearest: np.ndarray):
+        """
+        Sorteia, para cada nó em nodes, um vizinho distante uniformemente entre
+        todos os nós (0 a n-1) que não são ele mesmo nem um dos seus k mais próximos.
+        É a mesma distribuição de sortear uma posição >= k na ordem de distância,
+        mas feita por rejeição, sem precisar ordenar ou conhecer as distâncias.
+        Args:
+            nodes: np.ndarray (m,) - nós que terão conexão distante
+            nearest: np.ndarray (m, k) - k mais próximos de cada nó de nodes
+        """
+        self._check_far(nodes, nearest.shape[1])
+        selected = self.rng.integers(0, self.n, size=len(nodes))
+        invalid = np.ones(len(nodes), dtype=bool)
+        while True:
+            invalid[invalid] = (selected[invalid] == nodes[invalid]) | \
+                (nearest[invalid] == selected[invalid, None]).any(axis=1)
+            if not invalid.any():
+                return selected
+            selected[invalid] = self.rng.integers(0, self.n, size=int(invalid.sum()))
+
+    def _pair_distances(self, a: np.ndarray, b: np.ndarray):
+        # Distância entre os pares (a[i], b[i])
+        if self.distances is None:
+            return batch_metrics[self.metric](self.embeddings[a], self.embeddings[b])
+        return self.distances[a, b]
 
     def create_connections(self, k: int, p: int, verbose=False):
         """
@@ -113,89 +378,423 @@ class MundoPequeno():
         self.k = k
         self.p = p
         self.has_connections = True  # Marca que as conexões foram geradas
+        self._csr = None  # Descarta a adjacência CSR carregada de um grafo salvo
 
-        # Seleciona as k conexões mais próximas para cada nó
-        k_neighboors_links = self.organized_nearest[:, :self.k].astype(int)
+        # Seleciona as k conexões mais próximas para cada nó.
+        # As conexões são guardadas só como arrays: a lista (i, j, distância)
+        # é gerada sob demanda por iter_connections/get_connections
+        self.knn_links, self.knn_distances = self._nearest(self.k)
         if verbose:
-            print('k_neighboors_links: \n', k_neighboors_links, '\n\n')
-
-        # Lista para armazenar as conexões (i, j, distância)
-        self.connections = []
-        for i in range(self.n):
-            package = np.transpose([np.full(
-                (self.k,), i), k_neighboors_links[i], self.distances[i, k_neighboors_links[i]]])
-            self.connections.extend(package.tolist())
-            # Adiciona as conexões inversas (de i para j e de j para i)
-            self.connections.extend(package[:, [1, 0, 2]].tolist())
-        if verbose:
-            print('connections: \n', np.array(self.connections), '\n\n')
+            print('k_neighboors_links: \n', self.knn_links, '\n\n')
 
         # Conexões com nós distantes:
         # Número de nós que terão conexões distantes
         p_quantity = int(self.n * p)
-        p_choosed_nodes = np.random.choice(self.n, size=(p_quantity,))
+        p_choosed_nodes = self.rng.choice(self.n, size=(p_quantity,))
         if verbose:
             print(
                 f' os nós p_choosed_nodes[{p_quantity}] terão conexão com um nó distante: {p_choosed_nodes}')
 
-        # Sorteia os nós distantes com base na distância
-        random_sorted = np.random.randint(
-            self.k, self.n - 1, size=(p_quantity,))
-
-        far_neighboors = self.organized_nearest[p_choosed_nodes, random_sorted]
+        self._check_far(p_choosed_nodes, self.knn_links.shape[1])
+        if self.mode != 'dense':
+            # Sorteia os nós distantes fora dos k mais próximos, sem ordenar nada
+            far_neighboors = self._far_sample(p_choosed_nodes, self.knn_links[p_choosed_nodes])
+        else:
+            # Sorteia os nós distantes com base na distância
+            random_sorted = self.rng.integers(
+                self.k, self.n - 1, size=(p_quantity,))
+            far_neighboors = self._ranked(p_choosed_nodes, random_sorted)
         if verbose:
             print(f'far_neighboor: {far_neighboors}')
 
-        # Adiciona as conexões distantes
-        for node, neighboor in list(zip(p_choosed_nodes, far_neighboors)):
-            if node==neighboor:
-                continue
-            distance = self.distances[node][neighboor]
-            self.connections.append(
-                [int(neighboor), int(node), float(distance)])
-            self.connections.append(
-                [int(node), int(neighboor), float(distance)])
+        # Guarda as conexões distantes (descartando auto-conexões) como pares (nó, vizinho)
+        keep = p_choosed_nodes != far_neighboors
+        self.far_links = np.column_stack([p_choosed_nodes[keep], far_neighboors[keep]])
+        self.far_distances = self._pair_distances(self.far_links[:, 0], self.far_links[:, 1])
 
-    def get_connections(self):
+    def _query_nearest(self, points: np.ndarray, k: int):
         """
-        Retorna as conexões geradas.
-        Lança um erro se as conexões não foram geradas.
+        Acha, para cada ponto de points (que não fazem parte do grafo), os k nós
+        mais próximos do grafo. Usa o índice espacial no modo 'grid' e, nos outros,
+        calcula as distâncias por blocos contra todos os nós (O(n) por ponto).
+        """
+        k = min(k, self.n)
+        if self.mode == 'grid':
+            return self._spatial_index().knn(k, queries=points)
+
+        metric_f = batch_metrics[self.metric]
+        nearest = np.empty((len(points), k), dtype=int)
+        distances = np.empty((len(points), k))
+        for start in range(0, len(points), self.block_size):
+            block = metric_f(points[start:start + self.block_size, None, :],
+                             self.embeddings[None, :, :])
+            candidates = np.argpartition(block, k - 1, axis=1)[:, :k] if k < self.n else \
+                np.tile(np.arange(self.n), (len(block), 1))
+            candidate_distances = np.take_along_axis(block, candidates, axis=1)
+            order = np.argsort(candidate_distances, axis=1, kind='stable')
+            nearest[start:start + len(block)] = np.take_along_axis(candidates, order, axis=1)
+            distances[start:start + len(block)] = np.take_along_axis(candidate_distances, order, axis=1)
+        return nearest, distances
+
+    def _append(self, name: str, rows: np.ndarray):
+        """
+        Acrescenta linhas ao array self.<name> sem copiar o array inteiro a cada vez:
+        o array passa a ser uma fatia de um buffer que dobra de tamanho quando enche,
+        então cada inserção custa, em média, proporcional ao número de linhas novas.
+        """
+        current = getattr(self, name)
+        if not hasattr(self, '_buffers'):
+            self._buffers = {}
+        buffer = self._buffers.get(name)
+        size, new_size = len(current), len(current) + len(rows)
+        if buffer is None or current.base is not buffer or len(buffer) < new_size:
+            buffer = np.empty((max(2 * new_size, 16),) + current.shape[1:], dtype=current.dtype)
+            buffer[:size] = current
+            self._buffers[name] = buffer
+        buffer[size:new_size] = rows
+        setattr(self, name, buffer[:new_size])
+
+    def add_nodes(self, embeddings: np.ndarray, verbose=False):
         """
+        Insere novos nós num grafo já conectado, sem recalcular o grafo inteiro.
+        Cada nó novo é ligado aos seus k nós mais próximos entre os nós já existentes
+        e, com probabilidade p, ganha uma conexão distante (um nó existente fora dos
+        seus k mais próximos). As conexões dos nós antigos não são sorteadas de novo.
+        As consultas dos vizinhos custam proporcional ao tamanho do lote (no modo
+        'grid') ou ao tamanho do lote vezes n (nos outros modos), nunca a n². No modo
+        'grid', atualizar o índice espacial ainda custa O(n + células) por chamada
+        (ver GridIndex.insert), então vale inserir os nós em lotes e não um a um.
+        No modo 'dense' a matriz de distâncias deixa de valer para o grafo todo e é
+        descartada; as distâncias passam a ser calculadas sob demanda.
+        Args:
+            embeddings: np.ndarray (m, dim) - embeddings dos nós novos
+            verbose: bool [default=False] - se True, exibe informações durante a execução
+        Returns:
+            np.ndarray (m,) - ids dos nós novos (n, n+1, ..., n+m-1 com o n de antes)
+        """
+        self._check_connections()
+        if not hasattr(self, 'knn_links'):
+            raise ValueError(
+                "Erro - grafos salvos no formato antigo não suportam add_nodes; gere o grafo novamente")
+        embeddings = np.asarray(embeddings, dtype=np.float64).reshape(-1, self.embeddings.shape[1])
+        m = len(embeddings)
+        new_nodes = np.arange(self.n, self.n + m)
+
+        # Conexões dos nós novos, calculadas contra os nós que já existem. Num grafo
+        # pequeno (k > n-1) os nós antigos têm menos de k vizinhos, e os novos ficam
+        # com a mesma quantidade, que é a largura de knn_links
+        k = self.knn_links.shape[1]
+        nearest, nearest_distances = self._query_nearest(embeddings, k)
+        chosen = np.flatnonzero(self.rng.random(m) < self.p)
+        far = self._far_sample(new_nodes[chosen], nearest[chosen])
+        if verbose:
+            print(f'add_nodes: {m} nós novos, {len(chosen)} com conexão distante')
+
+        # Atualiza os arrays do grafo
+        self._append('embeddings', embeddings)
+        if self.mode == 'grid':
+            self._spatial_index().insert(embeddings, all_points=self.embeddings)
+        self.distances = None
+        self._append('knn_links', nearest)
+        self._append('knn_distances', nearest_distances)
+        far_links = np.column_stack([new_nodes[chosen], far])
+        self._append('far_links', far_links)
+        self._append('far_distances', self._pair_distances(far_links[:, 0], far_links[:, 1]))
+        self.n += m
+        self._csr = None
+        return new_nodes
+
+    def _check_connections(self):
         if not self.has_connections:
             raise ValueError("""Erro - o seu grafo de mundo pequeno não possui conexões. 
                              Verifique se você rodou a função .create_data e .create_connections""")
-        return self.connections
 
-    def save(self,relative_path=''):
+    def count_connections(self):
+        """
+        Retorna quantas conexões (direcionadas) iter_connections/get_connections produzem.
+        """
+        self._check_connections()
+        if not hasattr(self, 'knn_links'):
+            return len(self.connections)
+        return 2 * self.knn_links.size + 2 * len(self.far_links)
+
+    def iter_connections(self, chunk_size: int = 65536):
+        """
+        Gera as conexões em blocos de arrays numpy, sem montar a lista de listas.
+        A ordem é a mesma de get_connections: para cada nó, suas k conexões mais
+        próximas nos dois sentidos e, ao final, as conexões distantes nos dois sentidos.
+        Args:
+            chunk_size: int [default=65536] - quantidade máxima de conexões por bloco
+        Yields:
+            (src, dst, weight) - arrays com a origem, o destino e a distância de cada conexão
+        """
+        self._check_connections()
+        if not hasattr(self, 'knn_links'):
+            # Grafos salvos antes das conexões serem guardadas como arrays
+            for start in range(0, len(self.connections), chunk_size):
+                block = np.array(self.connections[start:start + chunk_size], dtype=np.float64)
+                yield block[:, 0].astype(int), block[:, 1].astype(int), block[:, 2]
+            return
+        k = self.knn_links.shape[1]
+        # Cada nó gera 2k conexões (ida e volta)
+        rows_per_chunk = max(chunk_size // max(2 * k, 1), 1)
+        for start in range(0, len(self.knn_links), rows_per_chunk):
+            end = min(start + rows_per_chunk, len(self.knn_links))
+            nodes = np.repeat(np.arange(start, end), k).reshape(-1, k)
+            links = self.knn_links[start:end]
+            distances = self.knn_distances[start:end]
+            yield (np.stack([nodes, links], axis=1).ravel(),
+                   np.stack([links, nodes], axis=1).ravel(),
+                   np.stack([distances, distances], axis=1).ravel())
+
+        pairs_per_chunk = max(chunk_size // 2, 1)
+        for start in range(0, len(self.far_links), pairs_per_chunk):
+            pairs = self.far_links[start:start + pairs_per_chunk]
+            distances = self.far_distances[start:start + pairs_per_chunk]
+            yield (pairs[:, ::-1].ravel(),
+                   pairs.ravel(),
+                   np.repeat(distances, 2))
+
+    def save_connections(self, file_name: str, chunk_size: int = 65536):
+        """
+        Escreve as conexões direto num arquivo .npy (array estruturado com os campos
+        'src', 'dst' e 'weight'), bloco a bloco, sem montar a lista em memória.
+        O arquivo pode ser lido em blocos com read_connections.
+        """
+        file_name += '.npy' if not file_name.endswith('.npy') else ''
+        out = np.lib.format.open_memmap(
+            file_name, mode='w+', dtype=edge_dtype, shape=(self.count_connections(),))
+        position = 0
+        for src, dst, weight in self.iter_connections(chunk_size):
+            block = out[position:position + len(src)]
+            block['src'], block['dst'], block['weight'] = src, dst, weight
+            position += len(src)
+        out.flush()
+        del out
+
+    def to_csr(self, dtype=np.float64):
         """
-        Salva o grafo de pequeno mundo gerado em um arquivo .pkl
+        Exporta o grafo como adjacência CSR não direcionada, sem arestas repetidas.
+        As conexões de get_connections aparecem nos dois sentidos, pares mutuamente
+        próximos aparecem duas vezes e conexões distantes podem se repetir; aqui cada
+        aresta aparece uma única vez em cada uma das suas duas extremidades.
+        Args:
+            dtype [default=np.float64] - tipo dos pesos (np.float32 economiza memória)
+        Returns:
+            (indptr, indices, weights) - ver edges_to_csr
+        """
+        self._check_connections()
+        csr = getattr(self, '_csr', None)
+        if csr is not None:
+            # Adjacência carregada do disco
+            return csr[0], csr[1], np.asarray(csr[2], dtype=dtype)
+        if not hasattr(self, 'knn_links'):
+            # Grafos salvos antes das conexões serem guardadas como arrays
+            edges = np.array(self.connections, dtype=np.float64).reshape(-1, 3)
+            return edges_to_csr(edges[:, 0].astype(int), edges[:, 1].astype(int),
+                                edges[:, 2], self.n, dtype=dtype)
+        k = self.knn_links.shape[1]
+        src = np.concatenate([np.repeat(np.arange(len(self.knn_links)), k), self.far_links[:, 0]])
+        dst = np.concatenate([self.knn_links.ravel(), self.far_links[:, 1]])
+        weights = np.concatenate([self.knn_distances.ravel(), self.far_distances])
+        return edges_to_csr(src, dst, weights, self.n, dtype=dtype)
+
+    def get_connections(self):
+        """
+        Retorna as conexões geradas como uma lista de [i, j, distância].
+        Lança um erro se as conexões não foram geradas.
+        Para redes grandes prefira iter_connections, que não monta a lista inteira.
+        """
+        if not hasattr(self, 'knn_links'):
+            # Grafos salvos antes das conexões serem guardadas como arrays
+            self._check_connections()
+            return self.connections
+        connections = []
+        for src, dst, weight in self.iter_connections():
+            connections.extend(np.column_stack([src, dst, weight]).tolist())
+        return connections
+
+    def get_name(self):
+        """
+        Nome do grafo usado nos arquivos salvos, ex.: 2000nodes_k=7_p=0.1
         """
         graph_name = f'{self.n}nodes'
         if self.has_connections:
             graph_name += f'_k={self.k}_p={self.p}'
         else:
             graph_name += '_NoConnections'
-        self.name=graph_name
-        
-        # Salva o grafo em um arquivo binário .pkl
-        with open(f"{relative_path}/{graph_name}.pkl", "wb") as file:
-            pickle.dump(self, file)
+        return graph_name
+
+    def save(self, relative_path='', format: str = 'dir', name: str = None):
+        """
+        Salva o grafo de pequeno mundo gerado.
+        Args:
+            relative_path: str [default=''] - pasta onde o grafo é salvo
+            name: str [default=None] - nome do arquivo/diretório (None usa get_name())
+            format: str [default='dir'] - 'dir' salva um diretório com um .npy por array
+                (embeddings, conexões e adjacência CSR) e um meta.json, que o load abre
+                com memmap; 'pkl' salva o objeto inteiro em um .pkl (formato antigo)
+        Returns:
+            str - caminho do diretório ou arquivo salvo
+        """
+        graph_name = self.get_name() if name is None else name
+        self.name = graph_name
+        path = os.path.join(relative_path, graph_name)
+
+        if format == 'pkl':
+            # Salva o grafo em um arquivo binário .pkl
+            with open(f"{path}.pkl", "wb") as file:
+                pickle.dump(self, file)
+            return f"{path}.pkl"
+        if format != 'dir':
+            raise ValueError(f"Erro - formato '{format}' desconhecido. Use 'dir' ou 'pkl'")
+
+        # A matriz de distâncias e o índice espacial não são salvos: podem ser
+        # recalculados a partir das embeddings
+        arrays = {}
+        meta = {'n': self.n, 'seed': int(self.seed), 'name': graph_name,
+                'has_data': self.has_data, 'has_connections': self.has_connections,
+                'rng_state': self.rng.bit_generator.state}
+        if self.has_data:
+            arrays['embeddings'] = self.embeddings
+            meta.update({'metric': self.metric, 'space': self.space, 'mode': self.mode,
+                         'block_size': self.block_size, 'kwargs_knn': self.kwargs_knn})
+        if self.has_connections:
+            indptr, indices, weights = self.to_csr()
+            arrays.update({'knn_links': self.knn_links, 'knn_distances': self.knn_distances,
+                           'far_links': self.far_links, 'far_distances': self.far_distances,
+                           'indptr': indptr, 'indices': indices, 'weights': weights})
+            meta.update({'k': self.k, 'p': self.p})
+        save_arrays(path, arrays, meta)
+        return path
 
     @staticmethod
-    def load(file_name: str):
+    def load(file_name: str, mmap: bool = True):
         """
-        Carrega um grafo de pequeno mundo a partir de um arquivo .pkl.
+        Carrega um grafo de pequeno mundo salvo por save.
         Args:
-            file_name: str - nome do arquivo do grafo
+            file_name: str - diretório do grafo (formato 'dir') ou nome do arquivo .pkl
+            mmap: bool [default=True] - no formato 'dir', abre os arrays com memmap
+                (somente leitura, carregados do disco sob demanda)
         Returns:
-            MundoPequeno - o grafo carregado do arquivo
+            MundoPequeno - o grafo carregado
         """
+        if is_saved_dir(file_name):
+            arrays, meta = load_arrays(file_name, mmap=mmap)
+            # Não passa pelo __init__ para não reinicializar a semente
+            graph = MundoPequeno.__new__(MundoPequeno)
+            graph.n = meta['n']
+            graph.seed = meta['seed']
+            # Continua a sequência aleatória de onde ela parou quando o grafo foi salvo
+            graph.rng = np.random.default_rng(graph.seed)
+            graph.rng.bit_generator.state = meta['rng_state']
+            graph.name = meta['name']
+            graph.has_data = meta['has_data']
+            graph.has_connections = meta['has_connections']
+            graph.embeddings = arrays.get('embeddings')
+            graph.distances = None
+            graph.index = None
+            if graph.has_data:
+                graph.metric = meta['metric']
+                graph.space = meta['space']
+                graph.mode = meta['mode']
+                graph.block_size = meta['block_size']
+                graph.kwargs_knn = meta['kwargs_knn']
+            if graph.has_connections:
+                graph.k = meta['k']
+                graph.p = meta['p']
+                graph.knn_links = arrays['knn_links']
+                graph.knn_distances = arrays['knn_distances']
+                graph.far_links = arrays['far_links']
+                graph.far_distances = arrays['far_distances']
+                graph._csr = (arrays['indptr'], arrays['indices'], arrays['weights'])
+            return graph
+
         file_name += '.pkl' if '.pkl' not in file_name else ''
         with open(file_name, "rb") as file:
             file = pickle.load(file)
             return cast(MundoPequeno, file)
 
 
+def _data_key(config: dict):
+    """
+    Hash dos parâmetros do create_data de uma configuração, já com os valores
+    padrão preenchidos (então omitir um parâmetro ou passar o valor padrão dá a
+    mesma chave). Arrays (ex.: embeddings prontas) entram pelo conteúdo.
+    """
+    bound = inspect.signature(MundoPequeno.create_data).bind(None, **config)
+    bound.apply_defaults()
+    params = dict(bound.arguments)
+    params.pop('self')
+    params.pop('verbose')  # só muda as mensagens, não o grafo
+    digest = hashlib.sha1()
+    for name in sorted(params):
+        value = params[name]
+        if isinstance(value, np.ndarray):
+            digest.update(f'{name}:{value.dtype}{value.shape}'.encode())
+            digest.update(np.ascontiguousarray(value).tobytes())
+        else:
+            digest.update(json.dumps({name: value}, sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:12]
+
+
+def _generate_one(config: dict, cache_dir: str, overwrite: bool):
+    """
+    Gera e salva um grafo de generate_batch. Fica no nível do módulo para poder
+    ser executada nos processos do pool. O nome do diretório tem n, k, p, a
+    semente e um hash dos demais parâmetros (ver _data_key), então configurações
+    diferentes nunca usam o mesmo cache.
+    """
+    config = dict(config)
+    n, k, p, seed = config.pop('n'), config.pop('k'), config.pop('p'), config.pop('seed')
+    name = f'{n}nodes_k={k}_p={p}_seed={seed}_{_data_key(config)}'
+    path = os.path.join(cache_dir, name)
+    if is_saved_dir(path) and not overwrite:
+        return path
+
+    graph = MundoPequeno(n, seed=seed)
+    graph.create_data(**config)
+    graph.create_connections(k, p)
+    return graph.save(relative_path=cache_dir, name=name)
+
+
+def generate_batch(configs: list, cache_dir: str = 'saves', workers: int = None,
+                   overwrite: bool = False, kwargs_data={}):
+    """
+    Gera vários grafos de mundo pequeno em paralelo, num pool de processos, e os
+    salva em cache_dir (um diretório por grafo, ver MundoPequeno.save).
+    Cada grafo usa o seu próprio gerador aleatório criado a partir da sua semente,
+    então o resultado de cada configuração é sempre o mesmo, bit a bit,
+    independente da quantidade de processos ou da ordem de execução.
+    Args:
+        configs: list - configurações (n, k, p, seed) ou dicionários com as chaves
+            'n', 'k', 'p', 'seed' e, opcionalmente, parâmetros do create_data
+        cache_dir: str [default='saves'] - pasta onde os grafos são salvos
+        workers: int [default=None] - quantidade de processos (None usa todos os
+            núcleos; 1 gera tudo no processo atual)
+        overwrite: bool [default=False] - se False, grafos já salvos não são gerados de novo
+        kwargs_data: dict [default={}] - parâmetros do create_data comuns a todas as configurações
+    Returns:
+        list - caminho de cada grafo salvo, na mesma ordem de configs
+    """
+    jobs = []
+    for config in configs:
+        if not isinstance(config, dict):
+            config = dict(zip(('n', 'k', 'p', 'seed'), config))
+        jobs.append({**kwargs_data, **config})
+    os.makedirs(cache_dir, exist_ok=True)
+
+    if workers == 1:
+        return [_generate_one(job, cache_dir, overwrite) for job in jobs]
+    # Com 'fork' os processos não reimportam o script principal, o que permite
+    # chamar esta função direto do nível do módulo (como em experiments.py)
+    context = multiprocessing.get_context(
+        'fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = [pool.submit(_generate_one, job, cache_dir, overwrite) for job in jobs]
+        return [future.result() for future in futures]
+
+
 # Teste do código (executado se for o script principal)
 if __name__ == "__main__":
     n = 10  # Número de nós no grafo
@@ -1,20 +1,38 @@
 """
 
-Este código implementa um grafo visual usando as bibliotecas networkx e opencv.
-Ele cria um grafo com nós e arestas, onde cada nó tem uma posição e estado
-(ativo ou inativo), e as arestas conectam os nós com um peso.
+Este código implementa um grafo visual usando numpy e opencv.
+A classe `Graph` guarda a estrutura do grafo: os nós (com o mapeamento entre ids
+externos e ids internos contíguos) e as arestas, guardadas em blocos de arrays
+(origem, destino, peso) em vez de um objeto por aresta. A classe `VisualGraph`
+acrescenta a parte visual: depois do compile, posições, pesos e estados ficam em
+arrays numpy (um elemento por nó ou aresta), no formato de estrutura de arrays, e
+o estilo é compartilhado por todos os elementos.
 O estado de nós e arestas pode ser alterado, e a visualização do grafo é feita
 com círculos para os nós e linhas para as arestas.
 A visualização pode ser modificada para mostrar diferentes estados 
 (ativado/desativado) usando cores. 
-O grafo pode ser salvo e carregado a partir de um arquivo .pkl.
+O networkx é opcional: o grafo networkx (`Graph.G`) só é montado quando é usado,
+por exemplo no layout 'spring'.
+O grafo é salvo em um diretório com um .npy por array e um meta.json (ver
+storage.py), que o load abre com memmap; o formato antigo, um arquivo .pkl com o
+objeto inteiro, continua disponível com format='pkl'.
 
 """
-import networkx as nx
 import cv2
 import numpy as np
 import pickle
+from functools import lru_cache
 from typing import cast
+from layout import barnes_hut_layout, cached_layout, DEFAULT_CACHE_DIR
+from spatial import GridIndex
+from storage import save_arrays, load_arrays, is_saved_dir
+
+# networkx é opcional: só é usado para o layout (spring_layout) quando as
+# posições dos nós não são informadas, ou para análises feitas sobre Graph.G
+try:
+    import networkx as nx
+except ImportError:
+    nx = None
 
 
 # Soma vetorial de duas triplas de cores
@@ -29,109 +47,21 @@ def add_color(color1, color2):
     return color3.tolist()
 
 
-# Classe que representa um nó no grafo visual
-class Node:
-    def __init__(self, center_img, center):
-        self.center_img = np.array(center_img, dtype=int)  # posição na imagem
-        self.center = np.array(center)  # posição no gráfico
-        self.activate = False  # Estado inicial (desativado)
-
-    def set_state(self, state: bool):
-        self.activate = state  # Altera o estado (ativo ou inativo)
-
-    def set_attributes(self,
-                       color_activate,
-                       color_deactivate,
-                       default_color_append=70,
-                       radius=10,
-                       radius_add=10):
-        self.activate = False  # Começa desativado
-
-        self.radius = radius  # Raio padrão do nó
-        self.radius_add = radius_add  # Raio extra quando ativo
-
-        self.color_activate = color_activate  # Cor do nó quando ativado
-        self.color_deactivate = color_deactivate  # Cor do nó quando desativado
-        self.default_color_append = default_color_append  # Cor adicional para bordas
-
-    def draw(self, img):
-        # Desenha o nó na imagem
-        if self.activate:
-            # Desenha nó ativado com cor de borda
-            border_color = add_color(
-                self.color_activate, self.default_color_append)
-            img = cv2.circle(img, self.center_img, self.radius +
-                             self.radius_add, border_color, -1)
-            return cv2.circle(img, self.center_img, self.radius, self.color_activate, -1)
-        else:
-            # Desenha nó desativado com cor padrão
-            return cv2.circle(img, self.center_img, self.radius, self.color_deactivate, -1)
+# Estrutura do grafo, sem nenhuma parte visual: os nós (com o mapeamento entre
+# ids externos e internos), as arestas guardadas em blocos de arrays, o layout das
+# posições e o grafo networkx montado sob demanda. É a base do VisualGraph e dos
+# navegadores (ver navigator.py)
+class Graph:
+    # Atributos que são só cache (refeitos sob demanda) e não precisam ser salvos
+    _cache_attributes = ('_G', '_connections')
 
+    def __init__(self) -> None:
+        self._G = None  # Grafo networkx, montado só quando é usado (ver Graph.G)
 
-# Classe que representa uma aresta entre dois nós no grafo
-class Aresta:
-    def __init__(self, p1, p2, weight):
-        self.p1 = np.array(p1, dtype=int)  # Posição do primeiro nó
-        self.p2 = np.array(p2, dtype=int)  # Posição do segundo nó
-        self.weight = weight  # Peso da aresta
-        self.activate = False  # Estado inicial da aresta (desativada)
-
-    def set_state(self, state: bool):
-        self.activate = state  # Altera o estado (ativo ou inativo)
-    
-    def set_attributes(self,
-                       color_activate,
-                       color_deactivate,
-                       default_color_add=70,
-                       thickness=2,
-                       thickness_add=3):
-        self.activate = False  # Começa desativada
-
-        self.thickness = thickness  # Espessura padrão da linha
-        self.thickness_add = thickness_add  # Espessura extra quando ativada
-
-        self.color_activate = color_activate  # Cor da aresta quando ativada
-        self.color_deactivate = color_deactivate  # Cor da aresta quando desativada
-        self.default_color_add = default_color_add  # Cor adicional para bordas
-
-    def draw(self, img):
-        # Desenha a aresta na imagem
-        if self.activate:
-            # Desenha aresta ativada com cor de borda
-            border_color = add_color(
-                self.color_activate, self.default_color_add)
-            img = cv2.line(img, self.p1, self.p2, border_color,
-                           self.thickness + self.thickness_add)
-            return cv2.line(img, self.p1, self.p2, self.color_activate, self.thickness)
-        else:
-            # Desenha aresta desativada com cor padrão
-            return cv2.line(img, self.p1, self.p2, self.color_deactivate, self.thickness)
-
-
-# Classe que representa o grafo visual
-class VisualGraph:
-    def __init__(self,
-                 color_deactivate=(100, 100, 100),
-                 color_activate=(0, 0, 200),
-                 color_add=70,
-                 radius=10,
-                 radius_add=10,
-                 thickness=2,
-                 thickness_add=3) -> None:
-        # Atributos de estilo
-        self.radius = radius
-        self.radius_add = radius_add
-        self.thickness = thickness
-        self.thickness_add = thickness_add
-
-        self.G = nx.Graph()  # Grafo em si (estrutura de dados)
-
-        # Cores de ativação e desativação
-        self.color_deactivate = color_deactivate
-        self.color_activate = color_activate
-        self.color_add = color_add
-
-        self.connections = {}  # Armazena conexões entre os nós
+        # Arestas adicionadas (ids internos), em blocos de arrays (src, dst, peso)
+        self._edge_chunks = []
+        self._pending_edges = []  # Arestas de add ainda não convertidas em bloco
+        self._connections = None  # Cache do dicionário de conexões
         self.compilated = False  # Indica se o grafo foi compilado
         self.node_id_mapping = {}  # Mapeamento de IDs dos nós
         self.node_id_antimapping = {}  # Mapeamento inverso de IDs dos nós
@@ -142,6 +72,7 @@ class VisualGraph:
             weight: float = None):
         """
         Função para adicionar um nó e suas conexões ao grafo.
+        Para muitas arestas de uma vez, prefira add_edges.
         """
         node=int(node)
         conn=int(conn)
@@ -162,43 +93,218 @@ class VisualGraph:
                 
                 self.node_id_antimapping[conn_id] = conn
                 self.node_id_mapping[conn] = conn_id
-            
-            self.G.add_edge(node_id, conn_id, weight=weight)  # Adiciona aresta
-        else:
-            self.G.add_node(node_id)  # Adiciona apenas o nó
-        
         
-        # Armazena as conexões para o nó
-        if node_id in self.connections.keys():
-            self.connections[node_id].append((conn_id, weight))
-        else:
-            self.connections[node_id] = [(conn_id, weight),]
+        # Armazena a conexão do nó
+        self._pending_edges.append((node_id, conn_id, np.nan if weight is None else weight))
+        self._connections = None
+        self._G = None
+
+    def add_edges(self, src: np.ndarray, dst: np.ndarray, weight: np.ndarray = None):
+        """
+        Adiciona várias arestas de uma vez. É equivalente a chamar
+        add(src[i], dst[i], weight[i]) para cada i, na mesma ordem (os ids internos
+        dos nós novos são os mesmos), mas feito com operações vetorizadas.
+        Args:
+            src: np.ndarray (m,) - ids (externos) dos nós de origem
+            dst: np.ndarray (m,) - ids (externos) dos nós de destino
+            weight: np.ndarray (m,) [default=None] - peso de cada aresta
+        """
+        src = np.asarray(src, dtype=np.int64).ravel()
+        dst = np.asarray(dst, dtype=np.int64).ravel()
+        if len(src) != len(dst):
+            raise ValueError("Erro - src e dst devem ter o mesmo tamanho")
+        if len(src) == 0:
+            return
+        weights = np.full(len(src), np.nan) if weight is None else \
+            np.asarray(weight, dtype=np.float64).ravel()
+
+        # Ids externos na ordem em que add os veria: src[0], dst[0], src[1], ...
+        external = np.column_stack([src, dst]).ravel()
+        unique, first, inverse = np.unique(external, return_index=True, return_inverse=True)
+        internal = np.array([self.node_id_mapping.get(node, -1) for node in unique.tolist()],
+                            dtype=np.int64)
+        # Nós novos recebem ids internos na ordem da primeira aparição
+        new = np.flatnonzero(internal < 0)
+        new = new[np.argsort(first[new], kind='stable')]
+        internal[new] = len(self.node_id_mapping) + np.arange(len(new))
+        new_external, new_internal = unique[new].tolist(), internal[new].tolist()
+        self.node_id_mapping.update(zip(new_external, new_internal))
+        self.node_id_antimapping.update(zip(new_internal, new_external))
+
+        ids = internal[inverse.ravel()].reshape(-1, 2)
+        self._flush_edges()
+        self._edge_chunks.append((ids[:, 0], ids[:, 1], weights))
+        self._connections = None
+        self._G = None
+
+    def _flush_edges(self):
+        # Converte as arestas pendentes de add em um bloco de arrays
+        if self._pending_edges:
+            src, dst, weights = zip(*self._pending_edges)
+            self._edge_chunks.append((np.array(src, dtype=np.int64), np.array(dst, dtype=np.int64),
+                                      np.array(weights, dtype=np.float64)))
+            self._pending_edges = []
+
+    def _edge_arrays(self, grouped=True):
+        """
+        Retorna todas as arestas adicionadas (ids internos) como arrays (src, dst, peso).
+        Se grouped for True, as arestas vêm agrupadas por nó de origem: os grupos seguem
+        a ordem da primeira vez que cada nó apareceu como origem e, dentro de um grupo,
+        a ordem de inserção. Se for False, vêm na ordem de inserção.
+        """
+        self._flush_edges()
+        if len(self._edge_chunks) != 1:
+            chunks = self._edge_chunks or [(np.empty(0, dtype=np.int64),)*2 + (np.empty(0),)]
+            self._edge_chunks = [tuple(np.concatenate(part) for part in zip(*chunks))]
+        src, dst, weights = self._edge_chunks[0]
+        if not grouped:
+            return src, dst, weights
+
+        first_as_source = np.full(len(self.node_id_mapping), len(src))
+        np.minimum.at(first_as_source, src, np.arange(len(src)))
+        order = np.argsort(first_as_source[src], kind='stable')
+        return src[order], dst[order], weights[order]
+
+    @property
+    def G(self):
+        """
+        Grafo networkx (nós = ids internos, arestas com o atributo 'weight').
+        Não é mantido durante os add: é montado a partir dos arrays de arestas na
+        primeira vez que é usado e refeito só se o grafo mudar.
+        """
+        if nx is None:
+            raise ImportError(
+                "Erro - o networkx não está instalado; ele é necessário para o layout automático "
+                "(compile sem nodes_positions) e para Graph.G")
+        if self._G is None:
+            src, dst, weights = self._edge_arrays(grouped=False)
+            self._G = nx.Graph()
+            self._G.add_nodes_from(range(len(self.node_id_mapping)))
+            # Arestas sem peso ficam sem o atributo 'weight'
+            self._G.add_edges_from(
+                (i, j, {} if np.isnan(w) else {'weight': w})
+                for i, j, w in zip(src.tolist(), dst.tolist(), weights.tolist()))
+        return self._G
+
+    @property
+    def connections(self):
+        """
+        Conexões de cada nó (id interno) no formato {nó: [(conexão, peso), ...]}.
+        É montado a partir dos arrays de arestas na primeira vez que é usado.
+        """
+        if self._connections is None:
+            src, dst, weights = self._edge_arrays()
+            bounds = np.flatnonzero(np.diff(src)) + 1
+            pairs = list(zip(dst.tolist(), [None if np.isnan(w) else w for w in weights.tolist()]))
+            starts = [0] + bounds.tolist()
+            ends = bounds.tolist() + [len(src)]
+            self._connections = {int(src[a]): pairs[a:b] for a, b in zip(starts, ends) if b > a}
+        return self._connections
     
+    def _layout_points(self, nodes_positions, kwargs_graph: dict, layout: str, layout_cache: str):
+        """
+        Posição de cada nó (indexada pelo id interno) no gráfico, com os mesmos
+        parâmetros do compile. Sem nodes_positions, usa o layout automático
+        (pelo cache de layouts) centralizado na origem.
+        """
+        n = len(self.node_id_mapping)
+        indexes = np.array([self.node_id_antimapping[i] for i in range(n)], dtype=int)
+        if nodes_positions is not None:
+            ## reorganiza os pontos de acordo com o mapeamento inicial
+            return np.asarray(nodes_positions)[indexes]
+
+        layouts = {'barnes_hut': barnes_hut_layout, 'spring': self._spring_layout}
+        if layout not in layouts:
+            raise ValueError(
+                f"Erro - layout '{layout}' desconhecido, use um de {list(layouts)}")
+        src, dst, _ = self._edge_arrays(grouped=False)
+        points = cached_layout(src, dst, indexes, layouts[layout],
+                               cache_dir=layout_cache, **kwargs_graph)
+        # Centraliza o layout na origem
+        return points - (points.min(axis=0) + points.max(axis=0))/2
+
+    def _spring_layout(self, src, dst, n, **kwargs):
+        # nx.spring_layout no formato das funções de layout (posições por id interno)
+        graph = self.G  # monta o grafo networkx (avisa se ele não estiver instalado)
+        positions = nx.spring_layout(graph, **kwargs)
+        return np.array([positions[node] for node in range(n)])
+
+    def __getstate__(self):
+        # No pickle, os caches são descartados (eles são refeitos quando forem usados)
+        state = self.__dict__.copy()
+        for name in self._cache_attributes:
+            if name in state:
+                state[name] = None
+        return state
+
+
+# Classe que representa o grafo visual.
+# Depois do compile, os nós e as arestas são guardados como arrays (um elemento
+# por nó ou por aresta) e o estilo é guardado uma única vez para todos
+class VisualGraph(Graph):
+    # Acima dessa quantidade de nós/arestas alterados desde o último plot, a
+    # imagem é refeita inteira em vez de só nas regiões alteradas
+    max_dirty = 256
+    # Lado, em pixels, das células do índice dos elementos ativados já desenhados
+    # (ver _update_frame)
+    tile_px = 64
+
+    def __init__(self,
+                 color_deactivate=(100, 100, 100),
+                 color_activate=(0, 0, 200),
+                 color_add=70,
+                 radius=10,
+                 radius_add=10,
+                 thickness=2,
+                 thickness_add=3) -> None:
+        super().__init__()
+        # Atributos de estilo
+        self.radius = radius
+        self.radius_add = radius_add
+        self.thickness = thickness
+        self.thickness_add = thickness_add
+
+        # Cores de ativação e desativação
+        self.color_deactivate = color_deactivate
+        self.color_activate = color_activate
+        self.color_add = color_add
+
     def compile(self, img_shape: np.ndarray,
                 border: int = 30,
                 nodes_positions=None,
-                kwargs_graph={}):
+                kwargs_graph={},
+                layout: str = 'barnes_hut',
+                layout_cache: str = DEFAULT_CACHE_DIR):
         """
         Função para compilar a representação visual do grafo, 
         gerando as posições dos nós e arestas.
+        Args:
+            img_shape: np.ndarray - (altura, largura) da imagem
+            border: int [default=30] - borda da imagem, em pixels
+            nodes_positions: np.ndarray (n, 2) [default=None] - posição de cada nó (indexada
+                pelo id externo). Se None, as posições são calculadas pelo layout
+            kwargs_graph: dict [default={}] - parâmetros do layout (ex.: {'k': 0.05})
+            layout: str [default='barnes_hut'] - layout automático: 'barnes_hut'
+                (layout.barnes_hut_layout) ou 'spring' (nx.spring_layout)
+            layout_cache: str [default='saves/layouts'] - diretório do cache de layouts;
+                se None, ou sem 'seed' em kwargs_graph, o layout é sempre recalculado
+        Depois do compile o grafo fica guardado nos arrays:
+            positions: (n, 2) - posição de cada nó (id interno) no gráfico
+            positions_img: (n, 2) - posição de cada nó na imagem
+            edge_src, edge_dst, edge_weight: (m,) - arestas direcionadas (ids internos)
+            node_active, edge_active: (n,) e (m,) - estado de cada nó e aresta
         """
         self.img_shape = np.array(img_shape)
+        n = len(self.node_id_mapping)
         
         # Calcula o tamanho da imagem para incluir a borda
         desired_img_shape = self.img_shape - 2*border
+        points = self._layout_points(nodes_positions, kwargs_graph, layout, layout_cache)
         if nodes_positions is None:
-            # Calcula posições dos nós
-            positions = nx.spring_layout(self.G, **kwargs_graph)
-            points = list(positions.values())
             translade = self.img_shape/2  # valor a ser somado em todos os points
         else:
-            points = nodes_positions
             translade = np.zeros(2)  # valor a ser somado em todos os points
         
-        ## reorganiza os pontos de acordo com o mapeamento inicial
-        indexes = [self.node_id_antimapping[i] for i in range(len(points))]
-        points = [points[i] for i in indexes]
-        
         # Calcula a escala para ajustar os nós na imagem
         min_dims = np.min(points, axis=0)
         max_dims = np.max(points, axis=0)
@@ -207,23 +313,20 @@ class VisualGraph:
         # o quanto precisa aumentar para cobrir todo mapa
         scale = (desired_img_shape*1/2) / graph_height_width
         
-        def get_imgposition(x, y): 
-            return translade+(np.array((x, y)))*scale
-        
-        # Cria os objetos Node e Aresta
-        nodes_positions_in_img = [get_imgposition(x, y) for x, y in points]
-        self.nodes = [Node(center, center_real) for center, center_real in list(
-            zip(nodes_positions_in_img, points))]
+        # Posições dos nós no gráfico e na imagem (visão completa, sem janela)
+        self.positions = np.array(points, dtype=np.float64)
+        self._translade, self._scale = translade, scale
+        self.viewport = None  # (centro, zoom) definido por set_viewport
+        self.lod_px = 0  # nível de detalhe (ver set_viewport)
+        self._project()
         
-        # Cria as arestas
-        self.arestas = {}
-        for node_idx, connections in list(self.connections.items()):
-            for (conn_idx, weight) in connections:
-                p1 = nodes_positions_in_img[node_idx]
-                p2 = nodes_positions_in_img[conn_idx]
-                self.arestas[(node_idx, conn_idx)] = Aresta(p1=p1,
-                                                            p2=p2,
-                                                            weight=weight)
+        # Cria as arestas. Uma aresta repetida (mesmo par i -> j) fica só uma vez,
+        # na posição em que apareceu primeiro e com o último peso informado
+        self._set_edges(*self._edge_arrays())
+
+        # Estados e estilo de cada nó, com as exceções por nó (ex.: goal)
+        self.node_active = np.zeros(n, dtype=bool)
+        self.node_style = {}
 
         # Configura os atributos dos nós e arestas
         self.set_attributes(self.color_activate,
@@ -235,6 +338,38 @@ class VisualGraph:
                             self.thickness_add)
         self.compilated = True
 
+    def _set_edges(self, src: np.ndarray, dst: np.ndarray, weights: np.ndarray):
+        # Guarda as arestas sem repetição e monta a tabela ordenada de chaves
+        # (src*n + dst) usada para achar o índice de uma aresta por busca binária
+        n = len(self.node_id_mapping)
+        keys = src*n + dst
+        _, last = np.unique(keys[::-1], return_index=True)
+        last = len(keys) - 1 - last
+        _, first = np.unique(keys, return_index=True)
+        order = np.argsort(first, kind='stable')
+        self.edge_src = src[first[order]]
+        self.edge_dst = dst[first[order]]
+        self.edge_weight = weights[last[order]]
+        self.edge_active = np.zeros(len(self.edge_src), dtype=bool)
+
+        self._edge_keys = keys[first]  # já ordenadas pelo np.unique
+        self._edge_order = np.argsort(order, kind='stable')  # chave ordenada -> índice da aresta
+        self._cull_index = None  # índice espacial da janela de visualização, montado sob demanda
+
+    def edge_index(self, node_i: int, node_j: int):
+        """
+        Retorna o índice (nos arrays de arestas) da aresta node_i -> node_j
+        (ids internos), ou -1 se ela não existe.
+        """
+        n = len(self.node_id_mapping)
+        if not (0 <= node_i < n and 0 <= node_j < n):
+            return -1
+        key = node_i*n + node_j
+        pos = int(np.searchsorted(self._edge_keys, key))
+        if pos < len(self._edge_keys) and self._edge_keys[pos] == key:
+            return int(self._edge_order[pos])
+        return -1
+
     def set_attributes(self,
                        color_activate=None,
                        color_deactivate=None,
@@ -243,53 +378,406 @@ class VisualGraph:
                        thickness=None, thickness_add=None):
         """
         Função para configurar os atributos de estilo do grafo.
+        O estilo vale para todos os nós e arestas; parâmetros None mantêm o valor atual.
+        Assim como antes, todos os nós e arestas voltam a ficar desativados.
+        """
+        if color_activate is not None:
+            self.color_activate = color_activate
+        if color_deactivate is not None:
+            self.color_deactivate = color_deactivate
+        if color_add is not None:
+            self.color_add = color_add
+        if radius is not None:
+            self.radius = radius
+        if radius_add is not None:
+            self.radius_add = radius_add
+        if thickness is not None:
+            self.thickness = thickness
+        if thickness_add is not None:
+            self.thickness_add = thickness_add
+
+        # Cor da borda dos elementos ativados, calculada uma vez por estilo
+        self.border_color = add_color(self.color_activate, self.color_add)
+
+        # Começa desativado
+        self.node_active[:] = False
+        self.edge_active[:] = False
+        # Nós e arestas ativados desde a última limpeza (ver clear_states)
+        self._touched_nodes, self._touched_edges = [], []
+        # O estilo mudou: as imagens guardadas pelo plot deixam de valer
+        self._base_img = None
+        self._frame = None
+
+    def set_node_style(self, node_id: int, color_activate=None, color_add=None):
         """
-        if color_activate is None:
-            color_activate = self.color_activate
-        if color_deactivate is None:
-            color_deactivate = self.color_deactivate
-        if color_add is None:
-            color_add = self.color_add
-        if radius is None:
-            radius = self.radius
-        if radius_add is None:
-            radius_add = self.radius_add
-
-        # Aplica as configurações para todos os nós
-        for node in self.nodes:
-            node.set_attributes(
-                color_activate,
-                color_deactivate,
-                default_color_append=color_add,
-                radius=radius,
-                radius_add=radius_add
-            )
-
-        # Aplica as configurações para todas as arestas
-        for (i, j), aresta in self.arestas.items():
-            aresta.set_attributes(
-                color_activate,
-                color_deactivate,
-                default_color_add=color_add,
-                thickness=thickness,
-                thickness_add=thickness_add
-            )
+        Define um estilo próprio para um nó (id interno), diferente do estilo geral.
+        """
+        color_activate = self.color_activate if color_activate is None else color_activate
+        color_add = self.color_add if color_add is None else color_add
+        self.node_style[node_id] = (color_activate, color_add, add_color(color_activate, color_add))
+        self._mark_dirty(0, node_id)
 
-    def plot(self, step=None):
+    def clear_node_style(self, node_id: int):
         """
-        Função para plotar o grafo em uma imagem.
+        Remove o estilo próprio de um nó (id interno), que volta ao estilo geral.
+        """
+        if self.node_style.pop(node_id, None) is not None:
+            self._mark_dirty(0, node_id)
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _disk(radius: int):
+        # Deslocamentos (dy, dx) dos pixels de um círculo preenchido de raio radius,
+        # rasterizado pelo próprio cv2.circle
+        patch = np.zeros((2*radius + 3, 2*radius + 3), dtype='uint8')
+        cv2.circle(patch, (radius + 1, radius + 1), radius, 255, -1)
+        dy, dx = np.nonzero(patch)
+        return dy - radius - 1, dx - radius - 1
+
+    def _stamp_circles(self, img, nodes: np.ndarray, radius: int, color, chunk_size: int = 4096):
+        """
+        Desenha círculos preenchidos iguais (mesmo raio e cor) em todos os nós de uma
+        vez, pintando os pixels do círculo em cada centro. O resultado é igual ao de
+        um cv2.circle por nó, já que todos os círculos têm a mesma cor.
+        """
+        dy, dx = self._disk(radius)
+        height, width = img.shape[:2]
+        for start in range(0, len(nodes), chunk_size):
+            centers = self.positions_img[nodes[start:start + chunk_size]]
+            ys = centers[:, 1, None] + dy
+            xs = centers[:, 0, None] + dx
+            inside = (ys >= 0) & (ys < height) & (xs >= 0) & (xs < width)
+            img[ys[inside], xs[inside]] = color
+        return img
+
+    def _draw_nodes(self, img, nodes: np.ndarray, active: bool):
+        """
+        Desenha os nós na imagem, agrupados por estilo. Nós ativados ganham uma borda
+        (um círculo maior na cor de borda) por baixo.
+        """
+        if not active:
+            # Desenha nós desativados com cor padrão
+            return self._stamp_circles(img, nodes, self.radius, self.color_deactivate)
+
+        # Nós com o estilo geral e, depois, cada nó com estilo próprio (ex.: goal)
+        styled = np.array([node in self.node_style for node in nodes.tolist()], dtype=bool)
+        groups = [(nodes[~styled], self.color_activate, self.border_color)]
+        groups += [(np.array([node]), *self.node_style[node][::2]) for node in nodes[styled].tolist()]
+        for group, color, border_color in groups:
+            img = self._stamp_circles(img, group, self.radius + self.radius_add, border_color)
+            img = self._stamp_circles(img, group, self.radius, color)
+        return img
+
+    def _draw_arestas(self, img, edges: np.ndarray, active: bool):
+        """
+        Desenha as arestas na imagem com um único cv2.polylines por estilo.
+        Arestas ativadas ganham uma borda (uma linha mais grossa na cor de borda) por baixo.
+        """
+        if len(edges) == 0:
+            return img
+        segments = np.stack([self.positions_img[self.edge_src[edges]],
+                             self.positions_img[self.edge_dst[edges]]], axis=1).astype(np.int32)
+        if active:
+            img = cv2.polylines(img, segments, False, self.border_color,
+                                self.thickness + self.thickness_add)
+            return cv2.polylines(img, segments, False, self.color_activate, self.thickness)
+        else:
+            # Desenha arestas desativadas com cor padrão
+            return cv2.polylines(img, segments, False, self.color_deactivate, self.thickness)
+
+    def _node_rects(self, nodes: np.ndarray):
+        # Retângulos (x0, y0, x1, y1) que contêm o desenho dos nós, ativados ou não
+        margin = self.radius + self.radius_add + 2
+        centers = self.positions_img[nodes]
+        return np.concatenate([centers - margin, centers + margin + 1], axis=1)
+
+    def _aresta_rects(self, edges: np.ndarray):
+        # Retângulos (x0, y0, x1, y1) que contêm o desenho das arestas, ativadas ou não
+        margin = self.thickness + self.thickness_add + 2
+        p1 = self.positions_img[self.edge_src[edges]]
+        p2 = self.positions_img[self.edge_dst[edges]]
+        return np.concatenate([np.minimum(p1, p2) - margin, np.maximum(p1, p2) + margin + 1], axis=1)
+
+    def _image_center(self):
+        # Centro da imagem em pixels (x, y)
+        return np.array(self.img_shape[:2][::-1], dtype=np.float64)/2
+
+    def default_center(self):
+        """
+        Centro da visão completa do compile, nas coordenadas do grafo: é o centro
+        usado por set_viewport quando center é None.
+        """
+        return (self._image_center() - self._translade) / self._scale
+
+    def _project(self):
+        # Calcula a posição de cada nó na imagem, considerando a janela de visualização
+        if self.viewport is None:
+            positions_img = self._translade + self.positions*self._scale
+        else:
+            center, zoom = self.viewport
+            positions_img = self._image_center() + (self.positions - center)*self._scale*zoom
+        # Limita as coordenadas de nós muito fora da janela (o cv2 ainda desenha
+        # corretamente a parte visível das arestas que chegam neles)
+        self.positions_img = np.clip(positions_img, -2**28, 2**28).astype(int)
+
+    def set_viewport(self, center=None, zoom: float = 1, lod_px: float = None):
+        """
+        Define a janela de visualização usada pelo plot. Só os nós e arestas que
+        aparecem na janela são desenhados, e eles são achados por um índice espacial
+        (spatial.GridIndex) sobre as posições dos nós, sem percorrer o grafo inteiro.
+        Args:
+            center: (x, y) [default=None] - centro da janela, nas coordenadas do grafo
+                (as mesmas de nodes_positions). Se None, usa o centro da visão completa
+            zoom: float [default=1] - aproximação em relação à visão completa do compile.
+                Com center=None e zoom=1 volta para a visão completa
+            lod_px: float [default=None] - nível de detalhe, em pixels. Nós desativados
+                que caem na mesma célula de lod_px x lod_px pixels são desenhados uma vez
+                só e arestas desativadas com menos de lod_px pixels não são desenhadas.
+                Elementos ativados são sempre desenhados. 0 desliga; None mantém o atual
         """
         if not self.compilated:
             raise ValueError(
-                "Você deve fazer o .compile do grafo antes de chamar o plot")
+                "Você deve fazer o .compile do grafo antes de definir a janela de visualização")
+        if center is None and zoom == 1:
+            self.viewport = None
+        else:
+            center = self.default_center() if center is None else center
+            self.viewport = (np.array(center, dtype=np.float64), float(zoom))
+        if lod_px is not None:
+            self.lod_px = lod_px
+        self._project()
+        # As imagens guardadas pelo plot deixam de valer
+        self._base_img = None
+        self._frame = None
+
+    def focus(self, nodes=None, padding: float = 0.1, max_zoom: float = None, lod_px: float = None):
+        """
+        Ajusta a janela de visualização para mostrar um conjunto de nós (ids internos),
+        por padrão os nós ativados (a região que a busca já explorou).
+        Args:
+            nodes: np.ndarray [default=None] - nós a mostrar. Se None, usa os nós ativados
+            padding: float [default=0.1] - folga em volta dos nós, em fração do tamanho deles
+            max_zoom: float [default=None] - zoom máximo
+            lod_px: float [default=None] - nível de detalhe (ver set_viewport)
+        """
+        nodes = np.flatnonzero(self.node_active) if nodes is None else np.asarray(nodes, dtype=int)
+        if len(nodes) == 0:
+            return
+        lo = self.positions[nodes].min(axis=0)
+        hi = self.positions[nodes].max(axis=0)
+        extent_px = np.abs((hi - lo)*self._scale)*(1 + 2*padding)
+        zoom = float(np.min(self.img_shape[:2][::-1] / np.maximum(extent_px, 1e-12)))
+        if max_zoom is not None:
+            zoom = min(zoom, max_zoom)
+        self.set_viewport((lo + hi)/2, zoom, lod_px=lod_px)
+
+    def _build_cull_index(self):
+        """
+        Monta as estruturas usadas para achar o que aparece na janela:
+        o GridIndex das posições, as arestas "curtas" agrupadas por nó de origem e
+        a lista das arestas "longas" (mais que o dobro do comprimento do percentil 90,
+        como as conexões distantes do MundoPequeno), que são testadas uma a uma.
+        Uma aresta curta que cruza a janela tem a origem a menos de max_short dela.
+        """
+        n = len(self.positions)
+        lengths = np.linalg.norm(self.positions[self.edge_src] - self.positions[self.edge_dst], axis=1)
+        max_short = 2*float(np.quantile(lengths, 0.9)) if len(lengths) else 0.
+        short = np.flatnonzero(lengths <= max_short)
+        by_src = short[np.argsort(self.edge_src[short], kind='stable')]
+        indptr = np.searchsorted(self.edge_src[by_src], np.arange(n + 1))
+        self._cull_index = (GridIndex(self.positions), max_short, by_src, indptr,
+                            np.flatnonzero(lengths > max_short))
+
+    @staticmethod
+    def _touches(rects: np.ndarray, rect):
+        # Indica quais retângulos (x0, y0, x1, y1) encostam em rect
+        return (rects[:, 0] < rect[2]) & (rects[:, 2] > rect[0]) & \
+            (rects[:, 1] < rect[3]) & (rects[:, 3] > rect[1])
 
+    def _visible(self):
+        """
+        Retorna os nós e arestas que aparecem na janela de visualização.
+        Sem janela definida, retorna todos.
+        """
+        if self.viewport is None:
+            return np.arange(len(self.positions)), np.arange(len(self.edge_src))
+        if self._cull_index is None:
+            self._build_cull_index()
+        index, max_short, by_src, indptr, long_edges = self._cull_index
+
+        # Caixa da imagem (com uma folga do tamanho dos desenhos) nas coordenadas do grafo
+        height, width = self.img_shape[:2]
+        margin = self.radius + self.radius_add + self.thickness + self.thickness_add + 2
+        center, zoom = self.viewport
+        corners = center + (np.array([[-margin, -margin], [width + margin, height + margin]])
+                            - self._image_center()) / (self._scale*zoom)
+        lo, hi = corners.min(axis=0), corners.max(axis=0)
+
+        nodes = np.sort(index.query_box(lo, hi))
+        # Arestas curtas saindo de nós perto da janela, mais as arestas longas
+        near = index.query_box(lo - max_short, hi + max_short)
+        counts = indptr[near + 1] - indptr[near]
+        take = np.repeat(indptr[near], counts) + np.arange(counts.sum()) - \
+            np.repeat(np.cumsum(counts) - counts, counts)
+        edges = np.concatenate([by_src[take], long_edges])
+        edges = np.sort(edges[self._touches(self._aresta_rects(edges), (0, 0, width, height))])
+        return nodes, edges
+
+    def _level_of_detail(self, nodes: np.ndarray, edges: np.ndarray):
+        """
+        Aplica o nível de detalhe (lod_px) aos elementos desativados: um nó por célula
+        de lod_px x lod_px pixels e só as arestas com pelo menos lod_px pixels.
+        """
+        cells = np.floor_divide(self.positions_img[nodes], self.lod_px).astype(np.int64)
+        if len(cells):
+            cells -= cells.min(axis=0)
+            keys = cells[:, 0]*(int(cells[:, 1].max()) + 1) + cells[:, 1]
+            _, first = np.unique(keys, return_index=True)
+            nodes = nodes[np.sort(first)]
+        lengths = np.linalg.norm(self.positions_img[self.edge_src[edges]] -
+                                 self.positions_img[self.edge_dst[edges]], axis=1)
+        return nodes, edges[lengths >= self.lod_px]
+
+    def _render_base(self):
+        # Imagem do grafo com todos os nós e arestas (visíveis) desativados
         img = np.full(
             (self.img_shape[0], self.img_shape[1], 3), 255, dtype='uint8')  # Cria imagem em branco
-        for node in self.nodes:
-            img = node.draw(img)  # Desenha os nós
-        for (i, j), aresta in self.arestas.items():
-            img = aresta.draw(img)  # Desenha as arestas
+        nodes, edges = self._visible()
+        if self.lod_px > 0:
+            nodes, edges = self._level_of_detail(nodes, edges)
+        img = self._draw_nodes(img, nodes, active=False)  # Desenha os nós
+        img = self._draw_arestas(img, edges, active=False)  # Desenha as arestas
+        return img
+
+    def _active_elements(self):
+        # Nós e arestas ativados que aparecem na imagem, com os retângulos dos seus desenhos
+        image = (0, 0, self.img_shape[1], self.img_shape[0])
+        nodes = np.flatnonzero(self.node_active)
+        edges = np.flatnonzero(self.edge_active)
+        node_rects, edge_rects = self._node_rects(nodes), self._aresta_rects(edges)
+        visible_nodes = self._touches(node_rects, image)
+        visible_edges = self._touches(edge_rects, image)
+        return (nodes[visible_nodes], node_rects[visible_nodes],
+                edges[visible_edges], edge_rects[visible_edges])
+
+    def _draw_active(self, img, rect=None, active=None):
+        """
+        Desenha sobre img os nós e depois as arestas ativados.
+        Se rect for dado, desenha só os que encostam no retângulo (x0, y0, x1, y1).
+        active é o resultado de _active_elements, se já tiver sido calculado.
+        """
+        nodes, node_rects, edges, edge_rects = active or self._active_elements()
+        if rect is not None:
+            nodes = nodes[self._touches(node_rects, rect)]
+            edges = edges[self._touches(edge_rects, rect)]
+        img = self._draw_nodes(img, nodes, active=True)
+        return self._draw_arestas(img, edges, active=True)
+
+    def _mark_dirty(self, kind: int, element: int):
+        """
+        Anota um nó (kind 0) ou aresta (kind 1) alterado desde o último plot. Sem
+        imagem guardada, ou com mais de max_dirty elementos alterados, a próxima
+        imagem é refeita inteira e não é preciso anotar nada.
+        """
+        if self._frame is None:
+            return
+        (self._dirty_nodes, self._dirty_edges)[kind].add(element)
+        if len(self._dirty_nodes) + len(self._dirty_edges) > self.max_dirty:
+            self._frame = None
+
+    def _tiles(self, rect):
+        # Células do índice de desenho cobertas por um retângulo (já limitado à imagem)
+        x0, y0, x1, y1 = rect
+        size = self.tile_px
+        return [(tx, ty) for ty in range(y0 // size, (y1 - 1) // size + 1)
+                for tx in range(x0 // size, (x1 - 1) // size + 1)]
+
+    def _index_drawn(self, kind: int, element: int, rect):
+        """
+        Atualiza o índice de desenho de um elemento (kind 0: nó, 1: aresta). Ele
+        entra nas células do seu retângulo se estiver ativado e aparecer na imagem.
+        """
+        for tile in self._drawn[kind].pop(element, ()):
+            self._drawn_tiles[kind][tile].discard(element)
+        x0, y0, x1, y1 = rect
+        if x1 <= x0 or y1 <= y0:
+            return
+        tiles = self._tiles(rect)
+        self._drawn[kind][element] = tiles
+        for tile in tiles:
+            self._drawn_tiles[kind].setdefault(tile, set()).add(element)
+
+    def _drawn_near(self, rect):
+        # Elementos ativados nas células cobertas por rect, no formato de _active_elements
+        found = (set(), set())
+        for kind in (0, 1):
+            cells = self._drawn_tiles[kind]
+            for tile in self._tiles(rect):
+                found[kind].update(cells.get(tile, ()))
+        nodes = np.array(sorted(found[0]), dtype=int)
+        edges = np.array(sorted(found[1]), dtype=int)
+        return nodes, self._node_rects(nodes), edges, self._aresta_rects(edges)
+
+    def _update_frame(self):
+        """
+        Atualiza self._frame (a imagem do estado atual, sem o texto da etapa).
+        A imagem é a base (tudo desativado, desenhada uma vez) com os elementos
+        ativados por cima. Depois da primeira vez, só as regiões dos nós e arestas
+        anotados por set_node_state, set_aresta_state e pelo estilo dos nós (ver
+        _mark_dirty) são refeitas: cada região é restaurada da base e os elementos
+        ativados que passam por ela são redesenhados inteiros numa imagem auxiliar,
+        de onde só a região é copiada. Assim o resultado é idêntico ao de redesenhar
+        tudo. Os elementos ativados são achados por um índice de células de tile_px
+        pixels, então o custo depende só do que mudou e não do tamanho do grafo.
+        """
+        if self._base_img is None:
+            self._base_img = self._render_base()
+            self._scratch = self._base_img.copy()
+            self._frame = None
+
+        height, width = self.img_shape[:2]
+        bounds = [width, height, width, height]
+        if self._frame is None:
+            active = self._active_elements()
+            self._frame = self._draw_active(self._base_img.copy(), active=active)
+            # Refaz o índice de desenho com todos os elementos ativados
+            self._drawn, self._drawn_tiles = ({}, {}), ({}, {})
+            nodes, node_rects, edges, edge_rects = active
+            for kind, elements, rects in ((0, nodes, node_rects), (1, edges, edge_rects)):
+                for element, rect in zip(elements.tolist(), np.clip(rects, 0, bounds).tolist()):
+                    self._index_drawn(kind, element, rect)
+        else:
+            nodes = np.array(sorted(self._dirty_nodes), dtype=int)
+            edges = np.array(sorted(self._dirty_edges), dtype=int)
+            node_rects = np.clip(self._node_rects(nodes), 0, bounds)
+            edge_rects = np.clip(self._aresta_rects(edges), 0, bounds)
+            # O índice passa a ter o estado atual dos elementos alterados
+            for kind, elements, rects, states in ((0, nodes, node_rects, self.node_active[nodes]),
+                                                  (1, edges, edge_rects, self.edge_active[edges])):
+                for element, rect, state in zip(elements.tolist(), rects.tolist(), states.tolist()):
+                    self._index_drawn(kind, element, rect if state else (0, 0, 0, 0))
+            for x0, y0, x1, y1 in np.concatenate([node_rects, edge_rects]).tolist():
+                if x1 <= x0 or y1 <= y0:
+                    continue
+                rect = (x0, y0, x1, y1)
+                self._scratch[y0:y1, x0:x1] = self._base_img[y0:y1, x0:x1]
+                self._scratch = self._draw_active(self._scratch, rect=rect, active=self._drawn_near(rect))
+                self._frame[y0:y1, x0:x1] = self._scratch[y0:y1, x0:x1]
+        self._dirty_nodes, self._dirty_edges = set(), set()
+
+    def plot(self, step=None):
+        """
+        Função para plotar o grafo em uma imagem.
+        Os nós e arestas desativados formam uma imagem base, desenhada só uma vez;
+        os ativados são desenhados por cima dela. Cada chamada só redesenha o que
+        mudou desde a chamada anterior.
+        """
+        if not self.compilated:
+            raise ValueError(
+                "Você deve fazer o .compile do grafo antes de chamar o plot")
 
+        self._update_frame()
+        img = self._frame.copy()
         if step is not None:
             # Adiciona um texto indicando o número da etapa
             img = cv2.putText(img, f'{step}', (30, 30),
@@ -303,8 +791,11 @@ class VisualGraph:
         if not self.compilated:
             raise ValueError(
                 "Você deve fazer o .compile do grafo antes de tentar alterar o estado de algum nó")
-        if node_id < len(self.nodes) and node_id >= 0:
-            self.nodes[node_id].set_state(state)
+        if node_id < len(self.node_active) and node_id >= 0:
+            self.node_active[node_id] = state
+            if state:
+                self._touched_nodes.append(node_id)
+            self._mark_dirty(0, node_id)
             return True
         else:
             return False
@@ -316,31 +807,146 @@ class VisualGraph:
         if not self.compilated:
             raise ValueError(
                 "Você deve fazer o .compile do grafo antes de tentar alterar o estado de alguma aresta")
-        if (node_i, node_j) in self.arestas.keys():
-            self.arestas[(node_i, node_j)].set_state(state)
+        edge = self.edge_index(node_i, node_j)
+        if edge >= 0:
+            self.edge_active[edge] = state
+            if state:
+                self._touched_edges.append(edge)
+            self._mark_dirty(1, edge)
             return True
         else:
             return False
 
-    def save(self, file_name: str):
+    def clear_states(self):
         """
-        Função que salva o grafo visual em um arquivo `.pkl`.
+        Desativa todos os nós e arestas. Só os elementos ativados por set_node_state
+        e set_aresta_state desde a última limpeza são visitados, então o custo é o
+        do que foi ativado (ex.: por uma busca), e não o do tamanho do grafo.
+        """
+        self.node_active[self._touched_nodes] = False
+        self.edge_active[self._touched_edges] = False
+        for node in self._touched_nodes:
+            self._mark_dirty(0, node)
+        for edge in self._touched_edges:
+            self._mark_dirty(1, edge)
+        self._touched_nodes, self._touched_edges = [], []
+
+    # Atributos que são só cache (refeitos sob demanda) e não precisam ser salvos
+    _cache_attributes = Graph._cache_attributes + (
+        '_base_img', '_scratch', '_frame', '_cull_index',
+        '_drawn', '_drawn_tiles', '_dirty_nodes', '_dirty_edges')
+
+    def _state_meta(self):
+        # Estado extra salvo no meta.json (as subclasses acrescentam o seu)
+        return {}
+
+    def _restore_state(self, meta: dict):
+        # Restaura o estado extra salvo por _state_meta
+        pass
+
+    def save(self, file_name: str, format: str = 'dir'):
+        """
+        Função que salva o grafo visual.
+        Args:
+            file_name: str - nome do diretório (formato 'dir') ou do arquivo (formato 'pkl')
+            format: str [default='dir'] - 'dir' salva só os arrays (ids, arestas, posições
+                e estados) em um diretório com um .npy por array e um meta.json com o
+                estilo, que o load abre com memmap; 'pkl' salva o objeto inteiro em um
+                arquivo `.pkl` (formato antigo)
+        Returns:
+            str - caminho do diretório ou arquivo salvo
         """
         if not self.compilated:
             file_name += '_uncompilated'
-        file_name += '.pkl' if '.pkl' not in file_name else ''
-        with open(f"{file_name}", "wb") as file:
-            pickle.dump(self, file)
-
-    @staticmethod
-    def load(file_name: str):
+        if format == 'pkl':
+            file_name += '.pkl' if '.pkl' not in file_name else ''
+            with open(f"{file_name}", "wb") as file:
+                pickle.dump(self, file)
+            return file_name
+        if format != 'dir':
+            raise ValueError(f"Erro - formato '{format}' desconhecido. Use 'dir' ou 'pkl'")
+
+        # Arestas na ordem em que foram adicionadas e o id externo de cada id interno
+        src, dst, weights = self._edge_arrays(grouped=False)
+        arrays = {'external_ids': np.array([self.node_id_antimapping[i]
+                                            for i in range(len(self.node_id_antimapping))],
+                                           dtype=np.int64),
+                  'src': src, 'dst': dst, 'weight': weights}
+        meta = {'class': type(self).__name__, 'compiled': self.compilated,
+                'style': {name: np.asarray(getattr(self, name)).tolist() for name in (
+                    'color_activate', 'color_deactivate', 'color_add',
+                    'radius', 'radius_add', 'thickness', 'thickness_add')}}
+        if self.compilated:
+            arrays.update({'positions': self.positions, 'edge_src': self.edge_src,
+                           'edge_dst': self.edge_dst, 'edge_weight': self.edge_weight,
+                           'edge_keys': self._edge_keys, 'edge_order': self._edge_order,
+                           'node_active': self.node_active, 'edge_active': self.edge_active})
+            meta.update({
+                'img_shape': self.img_shape.tolist(),
+                'translade': np.asarray(self._translade).tolist(),
+                'scale': np.asarray(self._scale).tolist(),
+                'viewport': None if self.viewport is None else
+                [self.viewport[0].tolist(), self.viewport[1]],
+                'lod_px': self.lod_px,
+                'node_style': {str(node): [np.asarray(color).tolist(), np.asarray(add).tolist()]
+                               for node, (color, add, _) in self.node_style.items()}})
+        meta.update(self._state_meta())
+        save_arrays(file_name, arrays, meta)
+        return file_name
+
+    @classmethod
+    def load(cls, file_name: str, mmap: bool = True):
         """
-        Função que carrega um grafo a partir de um arquivo `.pkl`.
+        Função que carrega um grafo salvo por save.
+        Args:
+            file_name: str - diretório (formato 'dir') ou arquivo `.pkl`
+            mmap: bool [default=True] - no formato 'dir', abre os arrays com memmap; o
+                compile não precisa ser refeito e os caches (imagens do plot, grafo
+                networkx, índice espacial) são refeitos só quando forem usados
         """
-        file_name += '.pkl' if '.pkl' not in file_name else ''
-        with open(file_name, "rb") as file:
-            file = pickle.load(file)
-            return cast(VisualGraph, file)
+        if not is_saved_dir(file_name):
+            file_name += '.pkl' if '.pkl' not in file_name else ''
+            with open(file_name, "rb") as file:
+                file = pickle.load(file)
+                return cast(VisualGraph, file)
+
+        arrays, meta = load_arrays(file_name, mmap=mmap)
+        graph = cls.__new__(cls)
+        for name, value in meta['style'].items():
+            setattr(graph, name, tuple(value) if isinstance(value, list) else value)
+
+        external_ids = arrays['external_ids'].tolist()
+        graph.node_id_antimapping = dict(enumerate(external_ids))
+        graph.node_id_mapping = {node: i for i, node in enumerate(external_ids)}
+        graph._edge_chunks = [(arrays['src'], arrays['dst'], arrays['weight'])]
+        graph._pending_edges = []
+        for name in cls._cache_attributes:
+            setattr(graph, name, None)
+
+        graph.compilated = meta['compiled']
+        if graph.compilated:
+            graph.img_shape = np.array(meta['img_shape'])
+            graph.positions = arrays['positions']
+            graph._translade = np.array(meta['translade'])
+            graph._scale = np.array(meta['scale'])
+            graph.viewport = None if meta['viewport'] is None else \
+                (np.array(meta['viewport'][0]), meta['viewport'][1])
+            graph.lod_px = meta['lod_px']
+            graph._project()
+            graph.edge_src, graph.edge_dst = arrays['edge_src'], arrays['edge_dst']
+            graph.edge_weight = arrays['edge_weight']
+            graph._edge_keys, graph._edge_order = arrays['edge_keys'], arrays['edge_order']
+            # Os estados mudam durante o uso, então são copiados para a memória
+            graph.node_active = np.array(arrays['node_active'])
+            graph.edge_active = np.array(arrays['edge_active'])
+            graph._touched_nodes = np.flatnonzero(graph.node_active).tolist()
+            graph._touched_edges = np.flatnonzero(graph.edge_active).tolist()
+            graph.border_color = add_color(graph.color_activate, graph.color_add)
+            graph.node_style = {}
+            for node, (color, add) in meta['node_style'].items():
+                graph.node_style[int(node)] = (tuple(color), add, add_color(color, add))
+        graph._restore_state(meta)
+        return graph
 
 
 # Código de execução, onde se define o grafo e chama-se a função de plotagem
@@ -400,7 +1006,7 @@ if __name__ == "__main__":
     def plot():
         for i in range(10):
             # Geração de estados aleatórios para os nós
-            states = np.random.randint(0, 2, len(Grafo.nodes))
+            states = np.random.randint(0, 2, len(Grafo.node_active))
             for j, state in enumerate(states):
                 Grafo.set_node_state(j, state)
 
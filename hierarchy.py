@@ -0,0 +1,371 @@
+"""
+Este módulo implementa uma hierarquia de contração (contraction hierarchies) para
+responder muitas consultas de menor caminho no mesmo grafo.
+
+No pré-processamento os nós são contraídos um a um, do menos para o mais
+importante (ordem pela diferença de arestas: atalhos criados menos arestas
+removidas, mais a quantidade de vizinhos já contraídos e a profundidade do nó). Ao contrair v, cada
+caminho u -> v -> x que não tem um caminho alternativo tão curto quanto ele
+(busca de testemunha, um Dijkstra local sem passar por v) vira um atalho
+u -> x, que guarda v para que o caminho possa ser desfeito depois. Cada aresta
+(original ou atalho) fica guardada no nó de menor ordem:
+- forward: arestas v -> x com x mais importante que v
+- backward: arestas u -> v com u mais importante que v (guardadas em v)
+
+A consulta é um Dijkstra bidirecional que só sobe na hierarquia: do início
+pelas arestas forward e do objetivo pelas backward. As duas buscas ficam
+pequenas e a menor soma das distâncias num nó em comum é a distância exata.
+As tabelas são arrays (formato CSR) e podem ser salvas ao lado do grafo com o
+formato de storage.py.
+"""
+import os
+import time
+from heapq import heappush, heappop
+import numpy as np
+from storage import save_arrays, load_arrays, is_saved_dir
+
+
+class ContractionHierarchy:
+    def __init__(self, ids: np.ndarray, rank: np.ndarray, forward: tuple, backward: tuple,
+                 build_time: float = 0, witness_limit: int = 128, directory: str = None):
+        """
+        Args:
+            ids: np.ndarray - id externo de cada nó
+            rank: np.ndarray - ordem de contração de cada nó
+            forward: tuple - (indptr, indices, weights, middle) das arestas que sobem
+                a partir de cada nó; middle é o nó contraído do atalho (-1 na aresta original)
+            backward: tuple - (indptr, indices, weights, middle) das arestas que chegam
+                em cada nó vindas de nós mais importantes
+            build_time: float [default=0] - tempo do pré-processamento, em segundos
+            witness_limit: int [default=128] - witness_limit usado no build
+            directory: str [default=None] - diretório de onde a hierarquia foi carregada
+                ou onde foi salva
+        """
+        self.ids = ids
+        self.rank = rank
+        self.forward = forward
+        self.backward = backward
+        self.build_time = build_time
+        self.witness_limit = witness_limit
+        self.directory = directory
+        self._index = None  # id externo -> nó (montado na primeira consulta)
+        self._lists = None  # Tabelas em listas do Python (montadas na primeira consulta)
+
+    @classmethod
+    def build(cls, src: np.ndarray, dst: np.ndarray, weights: np.ndarray, ids: np.ndarray = None,
+              witness_limit: int = 128, verbose=False):
+        """
+        Contrai o grafo dado pela lista de arestas.
+        Args:
+            src, dst: np.ndarray - extremidades de cada aresta (src -> dst), de 0 a n-1
+            weights: np.ndarray - peso de cada aresta
+            ids: np.ndarray [default=None] - id externo de cada nó (None: os próprios índices)
+            witness_limit: int [default=128] - máximo de nós fixados em cada busca de
+                testemunha; buscas menores só criam atalhos a mais, sem mudar as distâncias
+            verbose: bool [default=False] - exibe o progresso
+        """
+        ti = time.time()
+        src, dst = np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64)
+        if ids is None:
+            ids = np.arange(int(max(src.max(), dst.max())) + 1 if len(src) else 0)
+        ids = np.asarray(ids)
+        n = len(ids)
+
+        # Grafo restante: out_edges[v][x] = (peso, nó do meio) e in_edges[x][v] igual
+        out_edges = [{} for _ in range(n)]
+        in_edges = [{} for _ in range(n)]
+        for u, x, w in zip(src.tolist(), dst.tolist(), np.asarray(weights, dtype=np.float64).tolist()):
+            if u != x and (x not in out_edges[u] or w < out_edges[u][x][0]):
+                out_edges[u][x] = in_edges[x][u] = (w, -1)
+
+        deleted_neighboors = [0] * n
+        level = [0] * n  # profundidade do nó na hierarquia (vizinhos já contraídos abaixo dele)
+        rank = np.zeros(n, dtype=np.int64)
+        up_out, up_in = [None] * n, [None] * n
+
+        def shortcuts(v: int, limit: int = witness_limit):
+            # Atalhos necessários para contrair v
+            found = []
+            out_v = out_edges[v]
+            for u, (w_u, _) in in_edges[v].items():
+                # Uma aresta direta u -> x tão curta quanto u -> v -> x já é a testemunha
+                out_u = out_edges[u]
+                targets = {x: w_u + w_x for x, (w_x, _) in out_v.items()
+                           if x != u and (x not in out_u or out_u[x][0] > w_u + w_x)}
+                if not targets:
+                    continue
+                witness = _witness(out_edges, u, v, targets, max(targets.values()), limit)
+                for x, w in targets.items():
+                    if witness.get(x, float('inf')) > w:
+                        found.append((u, x, w))
+            return found
+
+        def priority(v: int):
+            # Na estimativa só as arestas diretas contam como testemunha (limit=0),
+            # o que é bem mais barato e quase não muda a ordem
+            return (len(shortcuts(v, 0)) - len(in_edges[v]) - len(out_edges[v])
+                    + deleted_neighboors[v] + level[v])
+
+        fila = [(priority(v), v) for v in range(n)]
+        fila.sort()
+        for order in range(n):
+            # Atualização preguiçosa: recalcula a prioridade do primeiro da fila e só
+            # contrai se ele continuar sendo o menor
+            while True:
+                _, v = heappop(fila)
+                new_priority = priority(v)
+                if not fila or new_priority <= fila[0][0]:
+                    break
+                heappush(fila, (new_priority, v))
+
+            rank[v] = order
+            up_out[v] = list(out_edges[v].items())
+            up_in[v] = list(in_edges[v].items())
+            for u, x, w in shortcuts(v):
+                if x not in out_edges[u] or w < out_edges[u][x][0]:
+                    out_edges[u][x] = in_edges[x][u] = (w, v)
+            for x in out_edges[v]:
+                del in_edges[x][v]
+                deleted_neighboors[x] += 1
+                level[x] = max(level[x], level[v] + 1)
+            for u in in_edges[v]:
+                del out_edges[u][v]
+                deleted_neighboors[u] += 1
+                level[u] = max(level[u], level[v] + 1)
+            out_edges[v], in_edges[v] = {}, {}
+            if verbose and (order + 1) % 10000 == 0:
+                print(f'{order + 1}/{n} nós contraídos ({time.time() - ti:.1f}s)')
+
+        hierarchy = cls(ids, rank, _to_csr(up_out), _to_csr(up_in), build_time=time.time() - ti,
+                        witness_limit=witness_limit)
+        if verbose:
+            print(f'Hierarquia: {n} nós, {hierarchy.count_shortcuts()} atalhos em {hierarchy.build_time:.2f}s')
+        return hierarchy
+
+    @classmethod
+    def from_csr(cls, indptr: np.ndarray, indices: np.ndarray, weights: np.ndarray, **kwargs):
+        """
+        Contrai o grafo dado pela adjacência CSR (ex.: MundoPequeno.to_csr()).
+        """
+        indptr = np.asarray(indptr)
+        src = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        return cls.build(src, indices, weights, ids=np.arange(len(indptr) - 1), **kwargs)
+
+    def count_shortcuts(self):
+        # Quantidade de atalhos criados na contração
+        return int(np.count_nonzero(np.asarray(self.forward[3]) >= 0)
+                   + np.count_nonzero(np.asarray(self.backward[3]) >= 0))
+
+    def _prepare(self):
+        # Listas do Python usadas nas consultas (bem mais rápidas de indexar que os arrays)
+        if self._lists is None:
+            self._index = {node_id: i for i, node_id in enumerate(np.asarray(self.ids).tolist())}
+            self._lists = (tuple(np.asarray(array).tolist() for array in self.forward),
+                           tuple(np.asarray(array).tolist() for array in self.backward))
+        return self._lists
+
+    def _search(self, source: int, target: int):
+        """
+        Busca bidirecional que só sobe na hierarquia, com ids internos. A busca a
+        partir do início sobe até o fim (o espaço de busca é pequeno) e a do objetivo
+        para quando nenhum nó da fila pode melhorar a menor distância encontrada.
+        Returns:
+            (distância, nó de encontro, pais da busca forward, pais da busca backward)
+        """
+        forward, backward = self._prepare()
+        dist_f, parent_f, _, _ = _upward(forward, backward, source)
+        _, parent_b, mu, meet = _upward(backward, forward, target, dist_f)
+        return mu, meet, parent_f, parent_b
+
+    def distance(self, source: int, target: int) -> float:
+        """
+        Menor distância de source até target (ids externos); inf se não houver caminho.
+        """
+        self._prepare()
+        return self._search(self._index[source], self._index[target])[0]
+
+    def path(self, source: int, target: int):
+        """
+        Menor caminho de source até target (ids externos), já sem atalhos.
+        Returns:
+            (distância, lista de ids externos do caminho); (inf, []) se não houver caminho
+        """
+        self._prepare()
+        mu, meet, parent_f, parent_b = self._search(self._index[source], self._index[target])
+        if meet < 0:
+            return mu, []
+        # Caminho na hierarquia: início -> encontro pela forward, encontro -> objetivo pela backward
+        nodes = [meet]
+        while parent_f[nodes[-1]] >= 0:
+            nodes.append(parent_f[nodes[-1]])
+        nodes.reverse()
+        while parent_b[nodes[-1]] >= 0:
+            nodes.append(parent_b[nodes[-1]])
+
+        unpacked = [nodes[0]]
+        for a, b in zip(nodes, nodes[1:]):
+            unpacked.extend(self._unpack(a, b))
+        ids = np.asarray(self.ids)
+        return mu, ids[unpacked].tolist()
+
+    def _middle(self, a: int, b: int):
+        # Nó do meio da aresta a -> b (fica no nó de menor ordem)
+        forward, backward = self._lists
+        rank = self.rank
+        if rank[a] < rank[b]:
+            (indptr, indices, _, middle), row, other = forward, a, b
+        else:
+            (indptr, indices, _, middle), row, other = backward, b, a
+        for k in range(indptr[row], indptr[row + 1]):
+            if indices[k] == other:
+                return middle[k]
+        raise ValueError(f"Erro - a aresta {a} -> {b} não está na hierarquia")
+
+    def _unpack(self, a: int, b: int):
+        # Nós da aresta a -> b sem atalhos, sem o a
+        nodes, pilha = [], [(a, b)]
+        while pilha:
+            a, b = pilha.pop()
+            middle = self._middle(a, b)
+            if middle < 0:
+                nodes.append(b)
+            else:
+                pilha.append((middle, b))
+                pilha.append((a, middle))
+        return nodes
+
+    def save(self, directory: str):
+        """
+        Salva a hierarquia em um diretório (ver storage.py)
+        """
+        arrays = {'ids': self.ids, 'rank': self.rank}
+        for prefix, table in (('forward', self.forward), ('backward', self.backward)):
+            for name, array in zip(('indptr', 'indices', 'weights', 'middle'), table):
+                arrays[f'{prefix}_{name}'] = array
+        save_arrays(directory, arrays, {'kind': 'ContractionHierarchy', 'build_time': self.build_time,
+                                        'witness_limit': self.witness_limit})
+        self.directory = directory
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True):
+        """
+        Carrega uma hierarquia salva por save (os arrays são abertos com memmap por padrão)
+        """
+        arrays, meta = load_arrays(directory, mmap=mmap)
+        if meta.get('kind') != 'ContractionHierarchy':
+            raise ValueError(f"Erro - '{directory}' não contém uma hierarquia de contração salva")
+        tables = [tuple(arrays[f'{prefix}_{name}'] for name in ('indptr', 'indices', 'weights', 'middle'))
+                  for prefix in ('forward', 'backward')]
+        # Hierarquias salvas antes do witness_limit ir para o meta.json usaram o padrão
+        return cls(arrays['ids'], np.asarray(arrays['rank']), *tables, build_time=meta['build_time'],
+                   witness_limit=meta.get('witness_limit', 128), directory=directory)
+
+    @classmethod
+    def for_graph(cls, graph_path: str, **kwargs):
+        """
+        Hierarquia do grafo salvo em graph_path (diretório ou .pkl do MundoPequeno.save,
+        ou .npy do MundoPequeno.save_connections). Ela fica salva ao lado do grafo
+        (ver hierarchy_path): se já existir é só carregada, senão é calculada e salva.
+        Args:
+            graph_path: str - caminho do grafo salvo
+            kwargs - parâmetros do build (ex.: witness_limit, verbose)
+        """
+        directory = hierarchy_path(graph_path)
+        if is_saved_dir(directory):
+            return cls.load(directory)
+        if graph_path.endswith('.npy'):
+            from generator import read_connections
+            blocks = list(read_connections(graph_path))
+            src, dst, weights = (np.concatenate([block[i] for block in blocks]) for i in range(3))
+            hierarchy = cls.build(src, dst, weights, **kwargs)
+        else:
+            from generator import MundoPequeno
+            hierarchy = cls.from_csr(*MundoPequeno.load(graph_path).to_csr(), **kwargs)
+        hierarchy.save(directory)
+        return hierarchy
+
+
+def hierarchy_path(graph_path: str):
+    """
+    Diretório onde fica a hierarquia de um grafo salvo: o caminho do grafo, sem a
+    extensão, com '_ch' no final (ex.: saves/2000nodes_k=7_p=0.1_ch/)
+    """
+    path = os.path.normpath(graph_path)
+    for extension in ('.pkl', '.npy'):
+        if path.endswith(extension):
+            path = path[:-len(extension)]
+    return path + '_ch'
+
+
+def _upward(table: tuple, stall: tuple, source: int, dist_outro: dict = None):
+    """
+    Dijkstra pelas arestas que sobem na hierarquia (table), com stall-on-demand
+    pelas arestas que chegam de nós mais importantes (stall). Com dist_outro (as
+    distâncias da busca do outro lado), guarda o melhor encontro e para quando a
+    fila não pode mais melhorá-lo.
+    Returns:
+        (distâncias, pais, menor distância até o outro lado, nó de encontro)
+    """
+    indptr, indices, weights = table[:3]
+    stall_indptr, stall_indices, stall_weights = stall[:3]
+    inf = float('inf')
+    dist, parent = {source: 0}, {source: -1}
+    fila = [(0, source)]
+    mu, meet = inf, -1
+    while fila:
+        d, cur = heappop(fila)
+        if d >= mu:
+            break
+        if d > dist[cur]:
+            continue
+        if dist_outro is not None and cur in dist_outro and d + dist_outro[cur] < mu:
+            mu, meet = d + dist_outro[cur], cur
+
+        # Stall-on-demand: se um nó mais importante já chega em cur por um caminho
+        # menor, o cur não está num menor caminho e não é expandido
+        for k in range(stall_indptr[cur], stall_indptr[cur + 1]):
+            if dist.get(stall_indices[k], inf) + stall_weights[k] < d:
+                break
+        else:
+            for k in range(indptr[cur], indptr[cur + 1]):
+                outro = indices[k]
+                dist_novo = d + weights[k]
+                if dist_novo < dist.get(outro, inf):
+                    dist[outro] = dist_novo
+                    parent[outro] = cur
+                    heappush(fila, (dist_novo, outro))
+    return dist, parent, mu, meet
+
+
+def _witness(out_edges: list, source: int, skip: int, targets: dict, max_dist: float, limit: int):
+    # Dijkstra local a partir de source sem passar por skip; para ao passar de
+    # max_dist, ao fixar todos os targets ou ao fixar limit nós
+    inf = float('inf')
+    dist = {source: 0}
+    fila = [(0, source)]
+    settled, missing = 0, len(targets)
+    while fila and settled < limit:
+        d, cur = heappop(fila)
+        if d > dist[cur]:
+            continue
+        settled += 1
+        if cur in targets:
+            missing -= 1
+            if missing == 0:
+                break
+        for outro, (w, _) in out_edges[cur].items():
+            dist_outro = d + w
+            if dist_outro <= max_dist and outro != skip and dist_outro < dist.get(outro, inf):
+                dist[outro] = dist_outro
+                heappush(fila, (dist_outro, outro))
+    return dist
+
+
+def _to_csr(rows: list):
+    # Lista de arestas (vizinho, (peso, meio)) de cada nó -> arrays CSR
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(row) for row in rows])
+    indices = np.array([x for row in rows for x, _ in row], dtype=np.int64)
+    weights = np.array([w for row in rows for _, (w, _) in row], dtype=np.float64)
+    middle = np.array([m for row in rows for _, (_, m) in row], dtype=np.int64)
+    return indptr, indices, weights, middle
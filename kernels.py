@@ -0,0 +1,343 @@
+"""
+Este módulo contém os kernels das buscas de algoritmos.py: as mesmas buscas, mas
+escritas para rodar rápido sobre a lista de vizinhos do Navigator.
+
+Os kernels usam só ids internos (inteiros de 0 a n-1) e estruturas simples do
+Python: a lista de vizinhos em listas (Navigator.adjacency), um bytearray de
+visitados, collections.deque para a fila do BFS e heapq com tuplas para as filas
+de prioridade. Empates de prioridade saem na ordem em que entraram na fila.
+
+O que a busca faz no grafo é passado por funções opcionais:
+- nav(atual, destino): chamada a cada navegação (ex.: Navigator.nav_internal)
+- frame(): chamada onde a busca gera uma imagem do GIF (ex.: mostra_grafo)
+- log(mensagem): mensagens de progresso (ex.: print); desligado por padrão
+Com elas None, o kernel só faz a busca.
+
+As buscas com heurística chamam heuristica(posição do nó, goal_xy), ou, se
+node_heuristic for dado, node_heuristic(nó), com o id interno do nó (usado por
+heurísticas que não dependem das posições, como a de landmarks.py).
+
+A lista de vizinhos é a tupla (indptr, vizinhos, pesos, ids externos, posições):
+os vizinhos do nó i são vizinhos[indptr[i]:indptr[i+1]], com os pesos das
+arestas nas mesmas posições; os ids externos só são usados nas mensagens.
+
+As buscas bidirecionais (bidirectional_bfs e bidirectional_dijkstra) crescem uma
+fronteira a partir de cada ponta e também recebem a lista de vizinhos reversa
+(Navigator.reverse_adjacency), usada pela busca que sai do objetivo. Nelas, a
+navegação da busca reversa é feita no sentido da aresta: nav(vizinho, atual).
+"""
+from collections import deque
+from heapq import heappush, heappop
+
+
+def dfs(adjacency: tuple, start: int, goal: int, nav=None, frame=None, log=None) -> bool:
+    # Busca em profundidade, com pilha explícita
+    indptr, indices, _, names, _ = adjacency
+    visited = bytearray(len(indptr) - 1)
+    stack = [start]
+    while stack:
+        cur = stack.pop()
+        if visited[cur]:
+            continue
+        visited[cur] = 1
+        if frame is not None:
+            frame()
+        if cur == goal:
+            return True
+
+        # Vizinhos em ordem reversa, para o primeiro vizinho sair primeiro da pilha
+        for k in range(indptr[cur + 1] - 1, indptr[cur] - 1, -1):
+            outro = indices[k]
+            if not visited[outro]:
+                if nav is not None:
+                    nav(cur, outro)
+                if log is not None:
+                    log(f'DFS: Indo de {names[cur]} -> {names[outro]}')
+                stack.append(outro)
+    return False
+
+
+def bfs(adjacency: tuple, start: int, goal: int, nav=None, frame=None, log=None) -> bool:
+    # Busca em largura
+    indptr, indices, _, names, _ = adjacency
+    visited = bytearray(len(indptr) - 1)
+    visited[start] = 1
+    fila = deque([start])
+    while fila:
+        if frame is not None:
+            frame()
+        cur = fila.popleft()
+        if log is not None:
+            log(f'BFS: Expandindo {names[cur]}')
+
+        for k in range(indptr[cur], indptr[cur + 1]):
+            outro = indices[k]
+            if not visited[outro]:
+                if nav is not None:
+                    nav(cur, outro)
+                visited[outro] = 1
+                if log is not None:
+                    log(f'BFS: Indo de {names[cur]} -> {names[outro]}')
+                if outro == goal:
+                    return True
+                fila.append(outro)
+
+    if frame is not None:
+        frame()
+    return False
+
+
+def astar(adjacency: tuple, start: int, goal: int, heuristica, goal_xy, w: float = 1,
+          historic: list = None, node_heuristic=None, nav=None, frame=None, log=None) -> bool:
+    """
+    A* (Dijkstra com heuristica = 0). A prioridade de cada nó é a distância até
+    ele mais heuristica(posição, goal_xy)*w; historic recebe a prioridade de cada
+    nó expandido.
+    """
+    indptr, indices, weights, names, positions = adjacency
+    distancias = [float('inf')] * (len(indptr) - 1)
+    distancias[start] = 0
+    fila = [(0, 0, start, 0)]  # (prioridade, ordem de entrada, nó, distância)
+    count = 1
+    while fila:
+        est, _, cur, dist = heappop(fila)
+        # Se depois de por na fila encontrou-se um caminho melhor, ignora
+        if distancias[cur] < dist:
+            continue
+        if log is not None:
+            log(f'Expandindo {names[cur]} ({dist = })')
+        if historic is not None:
+            historic.append(est)
+
+        for k in range(indptr[cur], indptr[cur + 1]):
+            outro = indices[k]
+            dist_outro = dist + weights[k]
+            if dist_outro < distancias[outro]:
+                if nav is not None:
+                    nav(cur, outro)
+                if frame is not None:
+                    frame()
+                if outro == goal:
+                    return True
+
+                if node_heuristic is None:
+                    est = heuristica(positions[outro], goal_xy) * w
+                else:
+                    est = node_heuristic(outro) * w
+                est_outro = dist_outro + est
+                distancias[outro] = dist_outro
+                heappush(fila, (est_outro, count, outro, dist_outro))
+                count += 1
+                if log is not None:
+                    log(f'Indo de {names[cur]} -> {names[outro]} ({est = }, tot = {est_outro})')
+    return False
+
+
+def best_first(adjacency: tuple, start: int, goal: int, heuristica, goal_xy,
+               historic: list = None, node_heuristic=None, nav=None, frame=None, log=None) -> bool:
+    # Best First Search: expande sempre o nó de menor heurística
+    indptr, indices, _, names, positions = adjacency
+    if node_heuristic is None:
+        node_heuristic = _position_heuristic(heuristica, positions, goal_xy)
+    visited = bytearray(len(indptr) - 1)
+    visited[start] = 1
+    fila = [(node_heuristic(start), 0, start)]
+    count = 1
+    while fila:
+        est, _, cur = heappop(fila)
+        if historic is not None:
+            historic.append(est)
+        if frame is not None:
+            frame()
+        if cur == goal:
+            return True
+        if log is not None:
+            log(f'BestFirst: Expandindo {names[cur]} ({est = })')
+
+        for k in range(indptr[cur], indptr[cur + 1]):
+            outro = indices[k]
+            if not visited[outro]:
+                if nav is not None:
+                    nav(cur, outro)
+                visited[outro] = 1
+                heappush(fila, (node_heuristic(outro), count, outro))
+                count += 1
+    return False
+
+
+def hill_climb(adjacency: tuple, start: int, goal: int, heuristica, goal_xy,
+               historic: list = None, node_heuristic=None, nav=None, frame=None, log=None) -> bool:
+    # Hill Climbing: vai para o primeiro vizinho com heurística menor que a do nó atual
+    indptr, indices, _, names, positions = adjacency
+    if node_heuristic is None:
+        node_heuristic = _position_heuristic(heuristica, positions, goal_xy)
+    cur = start
+    cur_est = node_heuristic(start)
+    while cur != goal:
+        if log is not None:
+            log(f'HillClimb: expandindo {names[cur]} ({cur_est = })')
+        for k in range(indptr[cur], indptr[cur + 1]):
+            outro = indices[k]
+            est = node_heuristic(outro)
+            if est < cur_est:
+                if nav is not None:
+                    nav(cur, outro)
+                if frame is not None:
+                    frame()
+                if log is not None:
+                    log(f'HillClimb: indo de {names[cur]} -> {names[outro]} ({est = })')
+                cur, cur_est = outro, est
+                if historic is not None:
+                    historic.append(est)
+                break
+        else:
+            # Nao achou nenhum vizinho melhor
+            if frame is not None:
+                frame()
+            return False
+    return True
+
+
+def _position_heuristic(heuristica, positions: list, goal_xy):
+    # Heurística de cada nó a partir da sua posição
+    def node_heuristic(node: int):
+        return heuristica(positions[node], goal_xy)
+    return node_heuristic
+
+
+def shortest_distances(adjacency: tuple, source: int) -> list:
+    """
+    Dijkstra completo a partir de source.
+    Returns:
+        list - menor distância de source até cada nó (inf para os inalcançáveis)
+    """
+    indptr, indices, weights = adjacency[:3]
+    distancias = [float('inf')] * (len(indptr) - 1)
+    distancias[source] = 0
+    fila = [(0, source)]
+    while fila:
+        dist, cur = heappop(fila)
+        if distancias[cur] < dist:
+            continue
+        for k in range(indptr[cur], indptr[cur + 1]):
+            outro = indices[k]
+            dist_outro = dist + weights[k]
+            if dist_outro < distancias[outro]:
+                distancias[outro] = dist_outro
+                heappush(fila, (dist_outro, outro))
+    return distancias
+
+
+def bidirectional_bfs(adjacency: tuple, reverse: tuple, start: int, goal: int,
+                      nav=None, frame=None, log=None) -> bool:
+    """
+    BFS bidirecional: a cada rodada expande um nível inteiro da menor das duas
+    fronteiras (a que sai do início, pelas arestas, ou a que sai do objetivo,
+    pelas arestas reversas). Há caminho assim que um nó descoberto por um lado
+    já foi visto pelo outro; sem caminho, uma das fronteiras fica vazia.
+    """
+    if start == goal:
+        return True
+    n = len(adjacency[0]) - 1
+    names = adjacency[3]
+    visited = (bytearray(n), bytearray(n))
+    visited[0][start] = 1
+    visited[1][goal] = 1
+    frontiers = [[start], [goal]]
+    while frontiers[0] and frontiers[1]:
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        indptr, indices = (adjacency if side == 0 else reverse)[:2]
+        own, other = visited[side], visited[1 - side]
+        proximos = []
+        for cur in frontiers[side]:
+            if frame is not None:
+                frame()
+            if log is not None:
+                log(f'BiBFS: Expandindo {names[cur]} ({"início" if side == 0 else "objetivo"})')
+            for k in range(indptr[cur], indptr[cur + 1]):
+                outro = indices[k]
+                if not own[outro]:
+                    if nav is not None:
+                        if side == 0:
+                            nav(cur, outro)
+                        else:
+                            nav(outro, cur)
+                    own[outro] = 1
+                    if other[outro]:
+                        return True  # As duas buscas se encontraram
+                    proximos.append(outro)
+        frontiers[side] = proximos
+
+    if frame is not None:
+        frame()
+    return False
+
+
+def bidirectional_dijkstra(adjacency: tuple, reverse: tuple, start: int, goal: int,
+                           potential=None, historic: list = None,
+                           nav=None, frame=None, log=None) -> float:
+    """
+    Dijkstra bidirecional, alternando o lado cuja fila tem o menor topo. Guarda a
+    menor distância mu de um caminho formado por uma aresta que liga os dois lados
+    e para quando topo da frente + topo de trás >= mu, quando nenhum caminho
+    melhor é possível.
+    Com potential (função do nó), vira o A* bidirecional: a prioridade é
+    distância + potential(nó) na busca da frente e distância - potential(nó) na de
+    trás. Com potential = (h(nó, objetivo) - h(nó, início))/2 e h consistente, o
+    critério de parada continua o mesmo e a distância continua exata.
+    Returns:
+        float - menor distância do início ao objetivo (inf se não houver caminho)
+    """
+    if start == goal:
+        return 0
+    inf = float('inf')
+    n = len(adjacency[0]) - 1
+    names = adjacency[3]
+    if potential is None:
+        potential = _zero
+    distancias = ([inf] * n, [inf] * n)
+    distancias[0][start] = 0
+    distancias[1][goal] = 0
+    # (prioridade, ordem de entrada, nó, distância) de cada lado
+    filas = ([(potential(start), 0, start, 0)], [(-potential(goal), 1, goal, 0)])
+    count = 2
+    mu = inf
+    while filas[0] and filas[1]:
+        if filas[0][0][0] + filas[1][0][0] >= mu:
+            break
+        side = 0 if filas[0][0][0] <= filas[1][0][0] else 1
+        est, _, cur, dist = heappop(filas[side])
+        own, other = distancias[side], distancias[1 - side]
+        # Se depois de por na fila encontrou-se um caminho melhor, ignora
+        if own[cur] < dist:
+            continue
+        if log is not None:
+            log(f'BiDijkstra: Expandindo {names[cur]} ({"início" if side == 0 else "objetivo"}, {dist = })')
+        if historic is not None:
+            historic.append(est)
+
+        indptr, indices, weights = (adjacency if side == 0 else reverse)[:3]
+        sign = 1 if side == 0 else -1
+        for k in range(indptr[cur], indptr[cur + 1]):
+            outro = indices[k]
+            dist_outro = dist + weights[k]
+            if dist_outro < own[outro]:
+                own[outro] = dist_outro
+                if nav is not None:
+                    if side == 0:
+                        nav(cur, outro)
+                    else:
+                        nav(outro, cur)
+                if frame is not None:
+                    frame()
+                heappush(filas[side], (dist_outro + sign * potential(outro), count, outro, dist_outro))
+                count += 1
+            # Caminho início -> ... -> cur -> outro -> ... -> objetivo
+            if dist_outro + other[outro] < mu:
+                mu = dist_outro + other[outro]
+    return mu
+
+
+def _zero(node: int):
+    # Potencial nulo (Dijkstra bidirecional sem heurística)
+    return 0
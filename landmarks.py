@@ -0,0 +1,208 @@
+"""
+Este módulo implementa a heurística de landmarks (ALT: A*, Landmarks e
+desigualdade Triangular) para o A*.
+
+As heurísticas de heuristicas.py usam só as posições dos nós, e no MundoPequeno
+uma conexão distante atravessa o espaço todo, então elas ficam bem abaixo da
+distância real. Aqui, num pré-processamento, são escolhidos alguns nós
+(landmarks) e a distância de cada landmark até todos os nós é calculada com um
+Dijkstra completo (kernels.shortest_distances). Pela desigualdade triangular,
+para qualquer landmark L:
+    d(v, t) >= d(L, t) - d(L, v)   e   d(v, t) >= d(v, L) - d(t, L)
+e o maior desses valores é uma estimativa que nunca passa da distância real
+(admissível) e é consistente, então o A* com w = 1 continua achando a menor
+distância.
+
+Os landmarks são escolhidos por seleção do mais distante: cada novo landmark é
+o nó mais longe (na distância do grafo) dos landmarks já escolhidos. As tabelas
+de distâncias ficam em arrays (landmarks x nós); quando o grafo é simétrico (o
+caso do MundoPequeno), a tabela até os landmarks é a mesma da tabela a partir
+deles e só uma é guardada.
+"""
+import time
+import numpy as np
+import kernels
+from heuristicas import heuristica_euclidian
+from storage import save_arrays, load_arrays
+
+
+class Landmarks:
+    def __init__(self, landmarks: np.ndarray, from_landmarks: np.ndarray,
+                 to_landmarks: np.ndarray = None, build_time: float = 0,
+                 count: int = None, seed: int = None):
+        """
+        Args:
+            landmarks: np.ndarray - ids internos dos landmarks
+            from_landmarks: np.ndarray - (landmarks x nós) distância de cada landmark até cada nó
+            to_landmarks: np.ndarray [default=None] - (landmarks x nós) distância de cada nó
+                até cada landmark; None quando o grafo é simétrico (igual a from_landmarks)
+            build_time: float [default=0] - tempo do pré-processamento, em segundos
+            count: int [default=None] - quantidade pedida no build (se None, a de landmarks)
+            seed: int [default=None] - semente usada no build
+        """
+        self.landmarks = landmarks
+        self.from_landmarks = from_landmarks
+        self.to_landmarks = to_landmarks
+        self.build_time = build_time
+        self.count = len(landmarks) if count is None else count
+        self.seed = seed
+
+    @classmethod
+    def build(cls, adjacency: tuple, reverse: tuple, count: int = 8, seed: int = None,
+              dtype=np.float64):
+        """
+        Escolhe os landmarks e calcula as tabelas de distâncias.
+        Args:
+            adjacency: tuple - lista de vizinhos dos kernels (Navigator.adjacency)
+            reverse: tuple - lista de vizinhos reversa (Navigator.reverse_adjacency)
+            count: int [default=8] - quantidade de landmarks
+            seed: int [default=None] - semente do nó a partir do qual a seleção começa
+            dtype [default=np.float64] - tipo das tabelas; np.float32 usa metade da
+                memória, mas o arredondamento pode passar um pouco da distância real
+        """
+        ti = time.time()
+        n = len(adjacency[0]) - 1
+        requested = count
+        count = min(count, n)
+        symmetric = _is_symmetric(adjacency, reverse)
+
+        # O primeiro landmark é o nó mais longe de um nó sorteado; os seguintes são
+        # os mais longe de todos os landmarks já escolhidos
+        start = np.random.default_rng(seed).integers(n)
+        closest = np.asarray(kernels.shortest_distances(adjacency, start))
+        landmarks, from_landmarks, to_landmarks = [], [], []
+        for _ in range(count):
+            # Os nós inalcançáveis (inf) vêm primeiro, o que cobre as outras componentes
+            landmark = int(np.argmax(closest))
+            landmarks.append(landmark)
+            distances = np.asarray(kernels.shortest_distances(adjacency, landmark))
+            from_landmarks.append(distances)
+            if not symmetric:
+                to_landmarks.append(kernels.shortest_distances(reverse, landmark))
+            closest = distances.copy() if len(landmarks) == 1 else np.minimum(closest, distances)
+            closest[landmarks] = -1  # um landmark não é escolhido duas vezes
+
+        return cls(np.array(landmarks, dtype=np.int64),
+                   np.array(from_landmarks, dtype=dtype),
+                   None if symmetric else np.array(to_landmarks, dtype=dtype),
+                   build_time=time.time() - ti, count=requested, seed=seed)
+
+    def to_goal(self, goal: int) -> np.ndarray:
+        """
+        Estimativa (admissível) da distância de cada nó até goal.
+        Args:
+            goal: int - id interno do objetivo
+        Returns:
+            np.ndarray - estimativa para cada id interno (inf para os nós que com
+            certeza não chegam ao objetivo)
+        """
+        # d(v, t) >= d(L, t) - d(L, v)  e  d(v, t) >= d(v, L) - d(t, L)
+        with np.errstate(invalid='ignore'):
+            differences = self.from_landmarks[:, goal, None] - self.from_landmarks
+            if self.to_landmarks is None:
+                # Grafo simétrico: d(v, L) = d(L, v)
+                return _bound(np.abs(differences))
+            return _bound(differences, self.to_landmarks - self.to_landmarks[:, goal, None])
+
+    def from_source(self, source: int) -> np.ndarray:
+        """
+        Estimativa (admissível) da distância de source até cada nó; usada pelo
+        potencial do A* bidirecional.
+        """
+        # d(s, v) >= d(L, v) - d(L, s)  e  d(s, v) >= d(s, L) - d(v, L)
+        with np.errstate(invalid='ignore'):
+            differences = self.from_landmarks - self.from_landmarks[:, source, None]
+            if self.to_landmarks is None:
+                return _bound(np.abs(differences))
+            return _bound(differences, self.to_landmarks[:, source, None] - self.to_landmarks)
+
+    def node_heuristic(self, goal: int):
+        """
+        Heurística de cada id interno até goal, no formato do node_heuristic dos
+        kernels (ver kernels.astar). As estimativas de todos os nós são calculadas
+        de uma vez.
+        """
+        return self.to_goal(goal).tolist().__getitem__
+
+    def save(self, directory: str):
+        """
+        Salva as tabelas em um diretório (ver storage.py)
+        """
+        arrays = {'landmarks': self.landmarks, 'from_landmarks': self.from_landmarks}
+        if self.to_landmarks is not None:
+            arrays['to_landmarks'] = self.to_landmarks
+        save_arrays(directory, arrays, {'kind': 'Landmarks', 'build_time': self.build_time,
+                                        'count': self.count, 'seed': self.seed})
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True):
+        """
+        Carrega as tabelas salvas por save (abertas com memmap por padrão)
+        """
+        arrays, meta = load_arrays(directory, mmap=mmap)
+        if meta.get('kind') != 'Landmarks':
+            raise ValueError(f"Erro - '{directory}' não contém landmarks salvos")
+        return cls(arrays['landmarks'], arrays['from_landmarks'], arrays.get('to_landmarks'),
+                   build_time=meta['build_time'], count=meta.get('count'), seed=meta.get('seed'))
+
+
+def _is_symmetric(adjacency: tuple, reverse: tuple):
+    # O grafo é simétrico se cada nó tem os mesmos vizinhos (e pesos) nas duas listas
+    if adjacency[0] != reverse[0]:
+        return False
+    indptr = adjacency[0]
+    for i in range(len(indptr) - 1):
+        a, b = indptr[i], indptr[i + 1]
+        if sorted(zip(adjacency[1][a:b], adjacency[2][a:b])) != sorted(zip(reverse[1][a:b], reverse[2][a:b])):
+            return False
+    return True
+
+
+def _bound(*differences):
+    # Maior das diferenças, ignorando inf - inf (nan), e nunca negativa
+    bound = np.fmax.reduce(np.concatenate(differences) if len(differences) > 1
+                           else differences[0], axis=0)
+    return np.fmax(bound, 0)
+
+
+def report_expansions(graph, queries: list, landmarks: Landmarks = None,
+                      heuristica=heuristica_euclidian, verbose=True):
+    """
+    Compara o A* com a heurística de landmarks e com uma heurística geométrica.
+    Args:
+        graph: Navigator - grafo compilado
+        queries: list - pares (início, objetivo), com ids externos
+        landmarks: Landmarks [default=None] - se None, usa graph.landmarks()
+        heuristica [default=heuristica_euclidian] - heurística geométrica comparada
+        verbose: bool [default=True] - exibe o resumo
+    Returns:
+        dict - tempo do pré-processamento e média de nós expandidos por busca
+    """
+    if landmarks is None:
+        landmarks = graph.landmarks()
+    adjacency = graph.adjacency()
+    mapping = graph.node_id_mapping
+    expansions_geo, expansions_alt = [], []
+    for inicio, fim in queries:
+        start, goal = mapping[inicio], mapping[fim]
+        goal_xy = adjacency[4][goal]
+        historic = []
+        kernels.astar(adjacency, start, goal, heuristica, goal_xy, historic=historic)
+        expansions_geo.append(len(historic))
+        historic = []
+        kernels.astar(adjacency, start, goal, None, goal_xy, historic=historic,
+                      node_heuristic=landmarks.node_heuristic(goal))
+        expansions_alt.append(len(historic))
+
+    report = {'build_time': landmarks.build_time,
+              'landmarks': len(landmarks.landmarks),
+              'expansions_geometric': float(np.mean(expansions_geo)),
+              'expansions_landmarks': float(np.mean(expansions_alt))}
+    report['saved'] = report['expansions_geometric'] - report['expansions_landmarks']
+    if verbose:
+        saved = 100 * report['saved'] / max(report['expansions_geometric'], 1)
+        print(f"Landmarks: {report['landmarks']} em {report['build_time']:.3f}s; "
+              f"nós expandidos por busca: {report['expansions_geometric']:.1f} ({heuristica.__name__}) "
+              f"-> {report['expansions_landmarks']:.1f} "
+              f"({abs(saved):.1f}% a {'menos' if saved >= 0 else 'mais'})")
+    return report
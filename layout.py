@@ -0,0 +1,210 @@
+"""
+Este módulo implementa o layout automático (force-directed) usado pelo
+VisualGraph.compile quando as posições dos nós não são informadas.
+
+O layout segue o modelo de Fruchterman-Reingold (o mesmo do nx.spring_layout):
+nós se repelem com força k²/d e arestas atraem seus nós com força d²/k. A
+repulsão entre todos os pares, que custa O(n²) por iteração, é aproximada por
+Barnes-Hut: os nós são agrupados numa quadtree e um grupo de nós distante é
+tratado como um único ponto no seu centro de massa. A árvore é percorrida nível
+a nível com numpy, para todos os nós ao mesmo tempo.
+
+O módulo também mantém um cache em disco de layouts: a chave é um hash do
+conjunto de arestas (em ids externos) e dos parâmetros do layout, então o mesmo
+grafo nunca é calculado duas vezes, mesmo entre execuções diferentes. Só os
+layouts com seed vão para o cache: sem seed o layout é aleatório.
+"""
+import hashlib
+import json
+import os
+import numpy as np
+
+DEFAULT_CACHE_DIR = os.path.join('saves', 'layouts')  # Diretório padrão do cache de layouts
+
+
+def _repulsion(pos: np.ndarray, k: float, theta: float, leaf_size: int, chunk_size: int):
+    """
+    Soma, para cada nó, as forças de repulsão k²/d de todos os outros nós,
+    aproximadas por Barnes-Hut.
+    Args:
+        pos: np.ndarray (n, 2) - posições atuais
+        k: float - distância ideal entre nós
+        theta: float - uma célula de lado s a uma distância d é aproximada pelo seu
+            centro de massa quando s < theta*d (theta=0 calcula todos os pares)
+        leaf_size: int - ocupação média desejada das células do último nível
+        chunk_size: int - quantidade de nós percorrendo a árvore ao mesmo tempo
+    Returns:
+        np.ndarray (n, 2) - força de repulsão de cada nó
+    """
+    n = len(pos)
+    lo = pos.min(axis=0)
+    size = max(float((pos.max(axis=0) - lo).max()), 1e-12)
+    depth = max(1, int(np.ceil(np.log(max(n / leaf_size, 1)) / np.log(4))))
+    side = 2 ** depth
+    coords = np.minimum(((pos - lo) / size * side).astype(np.int64), side - 1)
+
+    # Para cada nível: célula de cada nó, massa (quantidade de nós) e centro de massa de cada célula
+    levels = []
+    for level in range(depth + 1):
+        width = 2 ** level
+        cell = coords >> (depth - level)
+        ids = cell[:, 0] * width + cell[:, 1]
+        mass = np.bincount(ids, minlength=width * width).astype(np.float64)
+        com = np.column_stack([np.bincount(ids, pos[:, 0], width * width),
+                               np.bincount(ids, pos[:, 1], width * width)]) / np.maximum(mass, 1)[:, None]
+        levels.append((ids, mass, com))
+
+    # Nós ordenados pela célula do último nível, para as interações exatas nas folhas
+    leaf_ids = levels[depth][0]
+    order = np.argsort(leaf_ids, kind='stable')
+    starts = np.searchsorted(leaf_ids[order], np.arange(side * side + 1))
+
+    force = np.zeros((n, 2))
+    for first in range(0, n, chunk_size):
+        chunk = np.arange(first, min(first + chunk_size, n))
+        # Pares (nó, célula), começando pelas 4 células do nível 1
+        nodes = np.repeat(chunk, 4)
+        cells = np.tile(np.arange(4), len(chunk))
+        for level in range(1, depth + 1):
+            ids, mass, com = levels[level]
+            width = 2 ** level
+            keep = mass[cells] > 0
+            nodes, cells = nodes[keep], cells[keep]
+
+            delta = pos[nodes] - com[cells]
+            dist = np.maximum(np.sqrt(np.einsum('ij,ij->i', delta, delta)), 0.01)
+            far = (ids[nodes] != cells) & (size / width < theta * dist)
+            strength = k * k * mass[cells[far]] / dist[far] ** 2
+            force[:, 0] += np.bincount(nodes[far], delta[far, 0] * strength, n)
+            force[:, 1] += np.bincount(nodes[far], delta[far, 1] * strength, n)
+            nodes, cells = nodes[~far], cells[~far]
+
+            if level == depth:
+                # Folhas que não puderam ser aproximadas: interação nó a nó
+                counts = starts[cells + 1] - starts[cells]
+                pair_nodes = np.repeat(nodes, counts)
+                offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+                others = order[np.repeat(starts[cells], counts) + offsets]
+                valid = pair_nodes != others
+                pair_nodes, others = pair_nodes[valid], others[valid]
+                delta = pos[pair_nodes] - pos[others]
+                dist = np.maximum(np.sqrt(np.einsum('ij,ij->i', delta, delta)), 0.01)
+                strength = k * k / dist ** 2
+                force[:, 0] += np.bincount(pair_nodes, delta[:, 0] * strength, n)
+                force[:, 1] += np.bincount(pair_nodes, delta[:, 1] * strength, n)
+            else:
+                # Abre as células próximas nas suas 4 filhas
+                cx, cy = cells // width, cells % width
+                children = [(2 * cx + a) * (2 * width) + 2 * cy + b for a in (0, 1) for b in (0, 1)]
+                nodes = np.repeat(nodes, 4)
+                cells = np.stack(children, axis=1).ravel()
+    return force
+
+
+def barnes_hut_layout(src: np.ndarray, dst: np.ndarray, n: int, k: float = None,
+                      iterations: int = 50, threshold: float = 1e-4, theta: float = 0.8,
+                      seed: int = None, leaf_size: int = 4, chunk_size: int = 8192):
+    """
+    Layout force-directed (Fruchterman-Reingold) com repulsão aproximada por Barnes-Hut.
+    Os parâmetros k, iterations, threshold e seed têm o mesmo significado que no
+    nx.spring_layout; os pesos das arestas não são usados.
+    Args:
+        src: np.ndarray (m,) - nó de origem de cada aresta (0 a n-1)
+        dst: np.ndarray (m,) - nó de destino de cada aresta (0 a n-1)
+        n: int - quantidade de nós
+        k: float [default=None] - distância ideal entre nós. Se None, usa 1/sqrt(n)
+        iterations: int [default=50] - número máximo de iterações
+        threshold: float [default=1e-4] - para quando o deslocamento médio fica abaixo disso
+        theta: float [default=0.8] - precisão da aproximação (menor = mais preciso e mais lento)
+        seed: int [default=None] - seed das posições iniciais
+        leaf_size: int [default=4] - ocupação média das folhas da quadtree
+        chunk_size: int [default=8192] - nós processados de uma vez (limita a memória)
+    Returns:
+        np.ndarray (n, 2) - posição de cada nó
+    """
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    pos = np.random.default_rng(seed).random((n, 2))
+    if n <= 1:
+        return pos
+    if k is None:
+        k = 1 / np.sqrt(n)
+
+    # Cada aresta não direcionada atrai seus nós uma única vez
+    valid = src != dst
+    low, high = np.minimum(src[valid], dst[valid]), np.maximum(src[valid], dst[valid])
+    edges = np.unique(low * n + high)
+    low, high = edges // n, edges % n
+
+    temperature = max(float((pos.max(axis=0) - pos.min(axis=0)).max()), 1e-12) * 0.1
+    cooling = temperature / (iterations + 1)
+    for _ in range(iterations):
+        displacement = _repulsion(pos, k, theta, leaf_size, chunk_size)
+        delta = pos[low] - pos[high]
+        dist = np.maximum(np.sqrt(np.einsum('ij,ij->i', delta, delta)), 0.01)
+        pull = delta * (dist / k)[:, None]
+        for axis in range(2):
+            displacement[:, axis] -= np.bincount(low, pull[:, axis], n)
+            displacement[:, axis] += np.bincount(high, pull[:, axis], n)
+
+        # Deslocamento limitado pela temperatura, que cai a cada iteração
+        length = np.sqrt(np.einsum('ij,ij->i', displacement, displacement))
+        length = np.where(length < 0.01, 0.1, length)
+        delta_pos = displacement * (temperature / length)[:, None]
+        pos += delta_pos
+        temperature -= cooling
+        if np.linalg.norm(delta_pos) / n < threshold:
+            break
+    return pos
+
+
+def layout_key(src: np.ndarray, dst: np.ndarray, nodes: np.ndarray, params: dict):
+    """
+    Chave do cache: hash do conjunto de nós e de arestas não direcionadas (em ids
+    externos, sem depender da ordem de inserção) e dos parâmetros do layout.
+    """
+    src, dst = np.asarray(src, dtype=np.int64), np.asarray(dst, dtype=np.int64)
+    edges = np.unique(np.column_stack([np.minimum(src, dst), np.maximum(src, dst)]), axis=0)
+    digest = hashlib.sha1()
+    digest.update(np.ascontiguousarray(np.sort(nodes), dtype=np.int64).tobytes())
+    digest.update(np.ascontiguousarray(edges, dtype=np.int64).tobytes())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def cached_layout(src: np.ndarray, dst: np.ndarray, external_ids: np.ndarray,
+                  layout_f, cache_dir: str = DEFAULT_CACHE_DIR, **kwargs):
+    """
+    Calcula (ou lê do cache) o layout de um grafo.
+    Args:
+        src, dst: np.ndarray (m,) - arestas em ids internos (0 a n-1)
+        external_ids: np.ndarray (n,) - id externo de cada id interno
+        layout_f - função de layout, chamada como layout_f(src, dst, n, **kwargs)
+        cache_dir: str [default='saves/layouts'] - diretório do cache; se None, não usa cache
+        kwargs - parâmetros do layout (também entram na chave do cache). Sem 'seed'
+            (ou com seed=None) o layout é aleatório e o cache não é usado
+    Returns:
+        np.ndarray (n, 2) - posição de cada nó, indexada pelo id interno
+    """
+    external_ids = np.asarray(external_ids, dtype=np.int64)
+    n = len(external_ids)
+    if cache_dir is None or kwargs.get('seed') is None:
+        return layout_f(src, dst, n, **kwargs)
+
+    params = dict(kwargs, layout=getattr(layout_f, '__name__', str(layout_f)))
+    key = layout_key(external_ids[src], external_ids[dst], external_ids, params)
+    file_name = os.path.join(cache_dir, f'{key}.npy')
+
+    # No arquivo, as posições ficam na ordem crescente dos ids externos, então
+    # o cache serve mesmo que os nós tenham sido inseridos em outra ordem
+    external_order = np.argsort(external_ids, kind='stable')
+    if os.path.isfile(file_name):
+        stored = np.load(file_name)
+        positions = np.empty_like(stored)
+        positions[external_order] = stored
+        return positions
+
+    positions = layout_f(src, dst, n, **kwargs)
+    os.makedirs(cache_dir, exist_ok=True)
+    np.save(file_name, positions[external_order])
+    return positions
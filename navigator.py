@@ -10,7 +10,11 @@ podem ser conectadas ou desconectadas. Ela oferece funcionalidades como:
 - Definir um objetivo de navegação (método `set_goal`).
 - Compilação e configuração de atributos visuais do grafo (método `compile`).
 - Geração de GIFs para visualização da navegação ao longo do tempo (métodos 
-  `add_imgtogif` e `make_gif`).
+  `add_imgtogif` e `make_gif`), guardando as imagens na memória ou gravando em 
+  streaming um GIF ou MP4 (método `record`).
+- Registro dos eventos da navegação (`log_events=True`), para que as imagens 
+  sejam geradas depois da busca, em paralelo (método `render_log`, ver 
+  `renderer.py`).
 - Resetar o grafo ao seu estado inicial (método `reset`).
 
 Além disso, a classe oferece métodos auxiliares para obter informações sobre a 
@@ -22,6 +26,11 @@ entre dois nós, a aresta correspondente é marcada como "conectada", e o nó de
 destino é ativado. O objetivo é atingido quando o nó de destino é alcançado. A 
 classe também permite desfazer a navegação e reverter o estado do grafo.
 
+A parte da navegação que não desenha nada (lista de vizinhos, posições, goal e 
+contadores de passos e distância) fica na classe `NavigatorBase`, que herda só de 
+`Graph`. O `Navigator` acrescenta a ela a parte visual do `VisualGraph`, e a 
+classe `HeadlessNavigator` é a base sozinha, para rodar muitas buscas sem plot.
+
 O código depende de bibliotecas externas como `numpy`, `PIL` e `cv2` para 
 manipulação de imagens e geração de GIFs.
 
@@ -32,23 +41,302 @@ processo de navegação em formato GIF.
 
 
 import numpy as np
-import math
-from grafo import VisualGraph
+from grafo import Graph, VisualGraph
 from PIL import Image
 import cv2
+from layout import DEFAULT_CACHE_DIR
+from video import open_sink
+from landmarks import Landmarks
+from hierarchy import ContractionHierarchy
+from storage import is_saved_dir
 
 # Definição de constantes para os estados de conexão
 CONNECTED = True
 DISCONNECTED = False
 
+# Tipos de evento do registro da navegação (ver Navigator.replay)
+EVENT_NAV = 0       # (EVENT_NAV, nó atual, nó de destino), em ids internos
+EVENT_UNDO_NAV = 1  # (EVENT_UNDO_NAV, nó atual, nó de destino)
+EVENT_GOAL = 2      # (EVENT_GOAL, nó, cor, color_add)
+EVENT_RESET = 3     # (EVENT_RESET,)
+EVENT_FRAME = 4     # (EVENT_FRAME,) - uma imagem do GIF (add_imgtogif)
+
+
+class NavigatorBase(Graph):
+    """
+    Navegação sem nenhuma parte visual: a lista de vizinhos (ver _build_neighboors),
+    as posições dos nós (para as heurísticas), o goal, o contador de passos e a
+    distância percorrida. É o que as buscas de algoritmos.py usam, e é a base do
+    Navigator (que acrescenta os estados visuais) e do HeadlessNavigator.
+    """
+    # A lista de vizinhos dos kernels e as tabelas das heurísticas também não são salvas
+    _cache_attributes = Graph._cache_attributes + ('_adjacency', '_reverse_adjacency',
+                                                   '_landmarks', '_hierarchy')
+
+    def __init__(self):
+        self._adjacency = None  # Lista de vizinhos dos kernels (ver adjacency)
+        self._reverse_adjacency = None
+        self._landmarks = None  # Tabelas da heurística de landmarks (ver landmarks)
+        self._hierarchy = None  # Hierarquia de contração (ver contraction_hierarchy)
+        super().__init__()
+        self.goal = None
+        self.steps_percorridas = 0
+        self.distancia_percorrida = 0
+
+    def compile(self, nodes_positions=None, kwargs_graph={},
+                layout='barnes_hut', layout_cache=DEFAULT_CACHE_DIR):
+        """
+        Monta as posições dos nós (sem escalar para uma imagem) e a lista de vizinhos.
+        Args:
+            nodes_positions: array ou dict [default=None] - posições dos nós; se None,
+                são calculadas pelo layout
+            kwargs_graph: dict [default={}] - parâmetros do layout
+            layout: str [default='barnes_hut'] - ver VisualGraph.compile
+            layout_cache: str [default=DEFAULT_CACHE_DIR] - ver VisualGraph.compile
+        """
+        self.positions = np.array(self._layout_points(nodes_positions, kwargs_graph,
+                                                      layout, layout_cache), dtype=np.float64)
+        self.compilated = True
+        self._compile_navigation()
+
+    def _compile_navigation(self):
+        # Estado inicial da navegação, depois que as posições foram definidas
+        self.goal = None
+        self.distancia_percorrida = 0
+        self.steps_percorridas = 0
+        self._build_neighboors()
+
+    def _build_neighboors(self):
+        """
+        Monta a lista de vizinhos de todos os nós em arrays contíguos (formato CSR):
+        os vizinhos do nó interno i são neighboor_ids[neighboor_indptr[i]:neighboor_indptr[i+1]],
+        na ordem em que as conexões foram adicionadas, com os ids externos em
+        neighboor_ids, os internos em neighboor_internal e os pesos em neighboor_weights.
+        Arestas adicionadas sem peso recebem a distância euclidiana entre as posições.
+        """
+        src, dst, weights = self._edge_arrays()
+        order = np.argsort(src, kind='stable')
+        src, dst, weights = src[order], dst[order], weights[order]
+        missing = np.isnan(weights)
+        if missing.any():
+            weights = weights.copy()
+            weights[missing] = np.linalg.norm(
+                self.positions[src[missing]] - self.positions[dst[missing]], axis=1)
+
+        self.external_ids = np.array([self.node_id_antimapping[i]
+                                      for i in range(len(self.node_id_antimapping))], dtype=np.int64)
+        self.neighboor_indptr = np.searchsorted(src, np.arange(len(self.external_ids) + 1))
+        self.neighboor_internal = dst
+        self.neighboor_ids = self.external_ids[dst]
+        self.neighboor_weights = weights
+        self._adjacency = None
+        self._reverse_adjacency = None
+        self._landmarks = None
+        self._hierarchy = None
+
+    def adjacency(self):
+        """
+        Lista de vizinhos em listas do Python, no formato dos kernels de busca
+        (ver kernels.py): (indptr, vizinhos internos, pesos, ids externos, posições).
+        É montada uma vez e reaproveitada em todas as buscas.
+        """
+        if self._adjacency is None:
+            self._adjacency = (self.neighboor_indptr.tolist(), self.neighboor_internal.tolist(),
+                               self.neighboor_weights.tolist(), self.external_ids.tolist(),
+                               self.positions.tolist())
+        return self._adjacency
+
+    def reverse_adjacency(self):
+        """
+        Lista de vizinhos reversa, no mesmo formato do adjacency: os vizinhos do nó
+        i são os nós que têm uma aresta para i, com o peso dessa aresta. Usada
+        pelas buscas bidirecionais, que também andam a partir do objetivo.
+        """
+        if self._reverse_adjacency is None:
+            indptr, indices, weights, names, positions = self.adjacency()
+            sources = np.repeat(np.arange(len(self.external_ids)), np.diff(self.neighboor_indptr))
+            order = np.argsort(self.neighboor_internal, kind='stable')
+            reverse_indptr = np.searchsorted(self.neighboor_internal[order],
+                                             np.arange(len(self.external_ids) + 1))
+            self._reverse_adjacency = (reverse_indptr.tolist(), sources[order].tolist(),
+                                       self.neighboor_weights[order].tolist(), names, positions)
+        return self._reverse_adjacency
 
-class Navigator(VisualGraph):
-    def __init__(self, allow_gif=False):
+    def landmarks(self, count: int = 8, seed: int = 0, directory: str = None, verbose=False):
+        """
+        Heurística de landmarks do grafo (ver landmarks.py). O pré-processamento é
+        feito uma vez para cada (count, seed) e reaproveitado em todas as buscas.
+        Args:
+            count: int [default=8] - quantidade de landmarks
+            seed: int [default=0] - semente da seleção dos landmarks
+            directory: str [default=None] - se for dado, as tabelas são carregadas
+                desse diretório, ou calculadas e salvas nele se ele não existir
+            verbose: bool [default=False] - exibe o tempo do pré-processamento
+        """
+        if self._landmarks is None or (self._landmarks.count, self._landmarks.seed) != (count, seed):
+            if directory is not None and is_saved_dir(directory):
+                self._landmarks = Landmarks.load(directory)
+                if self._landmarks.from_landmarks.shape[1] != len(self.external_ids):
+                    self._landmarks = None
+                    raise ValueError(f"Erro - os landmarks de '{directory}' são de outro grafo")
+                if (self._landmarks.count, self._landmarks.seed) != (count, seed):
+                    saved = self._landmarks
+                    self._landmarks = None
+                    raise ValueError(f"Erro - os landmarks de '{directory}' foram calculados com "
+                                     f"count={saved.count} e seed={saved.seed}")
+            else:
+                self._landmarks = Landmarks.build(self.adjacency(), self.reverse_adjacency(),
+                                                  count=count, seed=seed)
+                if directory is not None:
+                    self._landmarks.save(directory)
+            if verbose:
+                print(f'Landmarks: {len(self._landmarks.landmarks)} em {self._landmarks.build_time:.3f}s')
+        return self._landmarks
+
+    def contraction_hierarchy(self, directory: str = None, witness_limit: int = 128, verbose=False):
+        """
+        Hierarquia de contração do grafo (ver hierarchy.py), calculada uma vez e
+        reaproveitada em todas as consultas. A hierarquia guardada é refeita se foi
+        calculada com outro witness_limit, e com directory ela é a desse diretório
+        (se ainda não existir, a guardada é salva nele).
+        Args:
+            directory: str [default=None] - se for dado, a hierarquia é carregada desse
+                diretório, ou calculada e salva nele se ele não existir
+            witness_limit: int [default=128] - parâmetro do ContractionHierarchy.build
+            verbose: bool [default=False] - exibe o progresso e o resumo do pré-processamento
+        """
+        hierarchy = self._hierarchy
+        if hierarchy is not None and hierarchy.witness_limit != witness_limit:
+            hierarchy = None
+        if directory is not None and is_saved_dir(directory):
+            if hierarchy is None or hierarchy.directory != directory:
+                hierarchy = ContractionHierarchy.load(directory)
+                if len(hierarchy.ids) != len(self.external_ids):
+                    raise ValueError(f"Erro - a hierarquia de '{directory}' é de outro grafo")
+                if hierarchy.witness_limit != witness_limit:
+                    raise ValueError(f"Erro - a hierarquia de '{directory}' foi calculada com "
+                                     f"witness_limit={hierarchy.witness_limit}")
+                if verbose:
+                    print(f"Hierarquia de contração carregada de '{directory}'")
+        else:
+            if hierarchy is None:
+                src = np.repeat(np.arange(len(self.external_ids)), np.diff(self.neighboor_indptr))
+                hierarchy = ContractionHierarchy.build(src, self.neighboor_internal,
+                                                       self.neighboor_weights, ids=self.external_ids,
+                                                       witness_limit=witness_limit, verbose=verbose)
+            if directory is not None:
+                hierarchy.save(directory)
+        self._hierarchy = hierarchy
+        return self._hierarchy
+
+    def get_neighboors(self, current_node_id: int, current_is_internal=False, return_internal=False, return_weight=False):
+        """
+        Função para obter os vizinhos de um nó.
+        Retorna um array com os vizinhos (ids externos, ou internos se return_internal
+        for True), que é uma fatia (sem cópia) da lista montada no compile e não deve
+        ser alterado. Se return_weight for True, retorna, como antes, uma lista de
+        pares (vizinho, peso), com os pesos das arestas (a distância euclidiana nas
+        arestas sem peso, ver _build_neighboors).
+        """
+        if current_is_internal:
+            mapped_current_id = current_node_id
+        else:
+            mapped_current_id = self.node_id_mapping[current_node_id]
+        neighboors, weights = self._neighboors_of(mapped_current_id, return_internal)
+        
+        # Se for necessário, retorna os pesos das arestas entre os nós
+        if return_weight:
+            return list(zip(neighboors.tolist(), weights.tolist()))
+        else:
+            return neighboors
+
+    def _neighboors_of(self, mapped_current_id: int, return_internal=True):
+        """
+        Vizinhos (ids internos, ou externos se return_internal for False) e pesos de
+        um nó (id interno), como fatias sem cópia dos arrays do compile. É o acesso
+        usado internamente pela navegação.
+        """
+        start = self.neighboor_indptr[mapped_current_id]
+        end = self.neighboor_indptr[mapped_current_id + 1]
+        neighboors = (self.neighboor_internal if return_internal else self.neighboor_ids)[start:end]
+        return neighboors, self.neighboor_weights[start:end]
+
+    def nav(self, current_node_id: int, destination_id: int):
+        """
+        Recebe um nó e tenta ir até ele. É necessário
+        ter chamado o compile antes de usar esta função
+        """
+        # Etapa de mapeamento para id interno da rede
+        return self.nav_internal(self.node_id_mapping[current_node_id],
+                                 self.node_id_mapping[destination_id])
+
+    def nav_internal(self, mapped_current_id: int, mapped_destination_id: int):
+        """
+        O mesmo que o nav, recebendo ids internos (usado pelos kernels de busca)
+        """
+        # Procura a aresta na linha do nó atual da lista de vizinhos (uma aresta
+        # repetida fica com o último peso, como no VisualGraph)
+        indptr, indices, weights = self.adjacency()[:3]
+        start, end = indptr[mapped_current_id], indptr[mapped_current_id + 1]
+        try:
+            edge = end - 1 - indices[start:end][::-1].index(mapped_destination_id)
+        except ValueError:
+            # Caso o destino não esteja entre os vizinhos
+            raise ValueError(
+                "Ok, provavelmente deu algum erro. O nó de destino não está entre os vizinhos do nó inicial") from None
+
+        # acumula a distancia percorrida
+        self.distancia_percorrida += weights[edge]
+        self.steps_percorridas += 1
+        # Verifica se o objetivo foi atingido
+        return mapped_destination_id == self.goal
+
+    def get_distancia_percorrida(self):
+        return self.distancia_percorrida
+
+    def set_goal(self, node_id: int):
+        """
+        Define o nó objetivo (goal) da navegação
+        """
+        self.goal = self.node_id_mapping[node_id]
+        # Salva a posição do objetivo
+        self.goal_xy = self.positions[self.goal]
+
+    def reset(self):
+        """
+        Volta a navegação ao estado inicial
+        """
+        # reseta a distância percorrida
+        self.distancia_percorrida = 0
+        self.steps_percorridas = 0
+
+    def get_pos(self, node_id: int):
+        """
+        Retorna a posição xy de um nó
+        """
+        internal_node_id = self.node_id_mapping[node_id]
+        return self.positions[internal_node_id]
+
+    def get_pos_goal(self):
+        return self.goal_xy
+
+
+class Navigator(NavigatorBase, VisualGraph):
+    # O arquivo aberto pelo record também não é salvo
+    _cache_attributes = VisualGraph._cache_attributes + \
+        NavigatorBase._cache_attributes[len(Graph._cache_attributes):] + ('_sink',)
+
+    def __init__(self, allow_gif=False, log_events=False):
         # Inicializa a classe com a possibilidade de gerar GIFs
         self.allow_gif = allow_gif
         self.gif_images = []  # Lista para armazenar imagens para o GIF
-        super().__init__()  # Chama o construtor da classe base VisualGraph
-        self.steps_percorridas = 0
+        self._sink = None  # Gravação em streaming (ver record)
+        # Se True, a navegação só é registrada em self.events e as imagens do GIF
+        # são geradas depois, pelo render_log
+        self.log_events = log_events
+        self.events = []
+        super().__init__()  # NavigatorBase e VisualGraph
+
     def compile(self, img_shape: np.ndarray,
                 border: int = 30,
                 color_activate=None,
@@ -56,16 +344,18 @@ class Navigator(VisualGraph):
                 color_add=None,
                 radius=None, radius_add=None,
                 thickness=None, thickness_add=None,
-                kwargs_graph={}, nodes_positions=None):
+                kwargs_graph={}, nodes_positions=None,
+                layout='barnes_hut', layout_cache=DEFAULT_CACHE_DIR):
         """
         Compila e seta os atributos do grafo
         """
-        # Chama o método compile da classe base para configurar o grafo
-        super().compile(img_shape,
-                        border=border, kwargs_graph=kwargs_graph, nodes_positions=nodes_positions)
+        # Chama o método compile do VisualGraph para configurar o grafo
+        VisualGraph.compile(self, img_shape,
+                            border=border, kwargs_graph=kwargs_graph, nodes_positions=nodes_positions,
+                            layout=layout, layout_cache=layout_cache)
 
         # Define os atributos de ativação e desativação
-        super().set_attributes(
+        self.set_attributes(
             color_deactivate=color_deactivate,
             color_activate=color_activate,
             color_add=color_add,
@@ -74,72 +364,67 @@ class Navigator(VisualGraph):
             thickness=thickness,
             thickness_add=thickness_add
         )
-        self.goal = None  # Inicializa a variável de objetivo (goal)
-        self.allow_gif = self.allow_gif  # Mantém a configuração do GIF
-        self.distancia_percorrida = 0    # coloca a distância percorrida
-    def get_neighboors(self, current_node_id: int, current_is_internal=False, return_internal=False, return_weight=False):
-        # Função para obter os vizinhos de um nó
-        if current_is_internal:
-            mapped_current_id = current_is_internal
-        else:
-            mapped_current_id = self.node_id_mapping[current_node_id]
-        
-        # Obtém os vizinhos do nó atual
-        neighboors = self.connections[mapped_current_id]
-        neighboors = [neighboor[0] for neighboor in neighboors]
-        
-        # Mapeia os vizinhos de volta para os ids externos, se necessário
-        if not return_internal:
-            neighboors = [int(self.node_id_antimapping[neighboor])
-                          for neighboor in neighboors]
-        
-        # Se for necessário, retorna os pesos das arestas entre os nós
-        if return_weight:
-            x, y = self.get_pos(current_node_id)
-            def dist(par): return math.sqrt((par[0]-x)**2 + (par[1]-y)**2)
-            
-            return [(idx, dist(self.get_pos(idx))) for idx in neighboors]
-        else:
-            return neighboors
-            
+        self.events = []  # O registro começa no estado do compile (tudo desativado)
+        self._compile_navigation()
 
-    def nav(self, current_node_id: int, destination_id: int):
+    def nav_internal(self, mapped_current_id: int, mapped_destination_id: int):
         """
-        Recebe um nó e tenta ir até ele. É necessário
-        ter chamado o compile antes de usar esta função
+        O mesmo que o nav, recebendo ids internos (usado pelos kernels de busca)
         """
-        # Etapa de mapeamento para id interno da rede
-        mapped_destination_id = self.node_id_mapping[destination_id]
-        mapped_current_id = self.node_id_mapping[current_node_id]
-        
-        # Obtém os vizinhos do nó atual
-        neighboors = self.get_neighboors(current_node_id, return_internal=True)
-        
-        # Verifica se o destino está entre os vizinhos
-        if mapped_destination_id in neighboors:
-            # Marca a aresta como conectada e o nó de destino como ativado
-            conseguiu_setar = self.set_aresta_state(
-                mapped_current_id, mapped_destination_id, CONNECTED)
-            self.set_node_state(mapped_destination_id, CONNECTED)
-            # Verifica se o objetivo foi atingido
-            chegou_no_goal = destination_id == self.goal if self.goal is not None else False
-            
-            # acumula a distancia percorrida:
-            self.distancia_percorrida+=self.arestas[(mapped_current_id,mapped_destination_id)].weight
-            self.steps_percorridas += 1
-            return chegou_no_goal
-        else:
-            # Caso o destino não esteja entre os vizinhos
-            raise ValueError(
-                "Ok, provavelmente deu algum erro. O nó de destino não está entre os vizinhos do nó inicial")
-    
-    def get_distancia_percorrida(self):
-        return self.distancia_percorrida
+        chegou_no_goal = super().nav_internal(mapped_current_id, mapped_destination_id)
+        # Marca a aresta como conectada e o nó de destino como ativado
+        self.set_aresta_state(mapped_current_id, mapped_destination_id, CONNECTED)
+        self.set_node_state(mapped_destination_id, CONNECTED)
+        if self.log_events:
+            self.events.append((EVENT_NAV, mapped_current_id, mapped_destination_id))
+        return chegou_no_goal
+
+    def _state_meta(self):
+        # Estado da navegação salvo junto com o grafo (ver VisualGraph.save)
+        return {'allow_gif': self.allow_gif,
+                'log_events': self.log_events,
+                'goal': None if getattr(self, 'goal', None) is None else int(self.goal),
+                'steps_percorridas': self.steps_percorridas,
+                'distancia_percorrida': float(getattr(self, 'distancia_percorrida', 0))}
+
+    def _restore_state(self, meta: dict):
+        self.allow_gif = meta.get('allow_gif', False)
+        self.gif_images = []
+        self.log_events = meta.get('log_events', False)
+        self.events = []
+        self.goal = meta.get('goal')
+        if self.goal is not None:
+            self.goal_xy = self.positions[self.goal]
+        self.steps_percorridas = meta.get('steps_percorridas', 0)
+        self.distancia_percorrida = meta.get('distancia_percorrida', 0)
+        if self.compilated:
+            self._build_neighboors()
+
     def add_imgtogif(self):
         # Adiciona a imagem atual ao GIF se a opção permitir
-        if self.allow_gif:
+        if self.log_events:
+            self.events.append((EVENT_FRAME,))
+        elif self._sink is not None:
+            self._sink.write(self.plot(self._sink.frames))
+        elif self.allow_gif:
             self.gif_images.append(self.plot(len(self.gif_images)))
 
+    def record(self, output_name: str, format: str = 'gif', **kwargs):
+        """
+        Começa a gravar a navegação em streaming no arquivo 'saves/<output_name>.<format>':
+        cada imagem do add_imgtogif é codificada e escrita na hora, sem ficar na memória.
+        O make_gif finaliza o arquivo.
+        Args:
+            output_name: str - nome do arquivo, sem a extensão
+            format: str [default='gif'] - 'gif' ou 'mp4' (ver video.py)
+            kwargs - parâmetros do sink: delay_frame (ms por quadro) e, no GIF,
+                delta=False para guardar em cada quadro a imagem inteira
+        """
+        if self._sink is not None:
+            self._sink.close()
+        self.allow_gif = True
+        self._sink = open_sink(f'saves/{output_name}', format, **kwargs)
+
     def undo_nav(self, current_node_id: int, destination_id: int):
         """
         Desfaz uma ação que já foi feita de navegação
@@ -149,7 +434,7 @@ class Navigator(VisualGraph):
         mapped_current_id = self.node_id_mapping[current_node_id]
 
         # Verifica se o nó de destino já foi ativado (já foi visitado)
-        if self.nodes[mapped_destination_id].activate:
+        if self.node_active[mapped_destination_id]:
             return False  # Não é possível desfazer se o nó foi ativado
 
         # Obtém os vizinhos do nó atual
@@ -162,6 +447,8 @@ class Navigator(VisualGraph):
             self.set_aresta_state(
                 mapped_current_id, mapped_destination_id, DISCONNECTED)
             self.set_node_state(mapped_destination_id, DISCONNECTED)
+            if self.log_events:
+                self.events.append((EVENT_UNDO_NAV, mapped_current_id, mapped_destination_id))
 
             return True  # Foi possível desfazer a navegação
         else:
@@ -173,20 +460,66 @@ class Navigator(VisualGraph):
         Função para alterar os atributos do goal
         """
         print(f"Goal setado para {node_id}")
-        # Mapeia o id externo do nó para o id interno
-        internal_node_id = self.node_id_mapping[node_id]
-        self.goal = internal_node_id  # Define o nó como objetivo
-        # Salva a posição do objetivo
-        self.goal_xy = self.nodes[internal_node_id].center
+        if self.goal is not None and self.goal != self.node_id_mapping[node_id]:
+            # O goal anterior volta ao estilo geral (grafo reaproveitado em outra busca)
+            self.clear_node_style(self.goal)
+        super().set_goal(node_id)
         # Altera a cor do nó de objetivo
-        self.nodes[internal_node_id].color_activate = color
-        self.nodes[internal_node_id].default_color_append = color_add
-        self.nodes[internal_node_id].activate = True  # Ativa o nó de objetivo
+        self.set_node_style(self.goal, color_activate=color, color_add=color_add)
+        self.set_node_state(self.goal, CONNECTED)  # Ativa o nó de objetivo
+        if self.log_events:
+            self.events.append((EVENT_GOAL, self.goal, color, color_add))
+
+    def replay(self, events):
+        """
+        Aplica eventos do registro (self.events) aos estados visuais dos nós e
+        arestas, sem mexer na distância e nos passos. Usado pelo renderer.py para
+        refazer, em outro processo, o estado de cada imagem do GIF
+        """
+        for event in events:
+            kind = event[0]
+            if kind == EVENT_NAV or kind == EVENT_UNDO_NAV:
+                state = kind == EVENT_NAV
+                self.set_aresta_state(event[1], event[2], state)
+                self.set_node_state(event[2], state)
+            elif kind == EVENT_GOAL:
+                if self.goal is not None and self.goal != event[1]:
+                    self.clear_node_style(self.goal)
+                self.goal = event[1]
+                self.set_node_style(event[1], color_activate=event[2], color_add=event[3])
+                self.set_node_state(event[1], CONNECTED)
+            elif kind == EVENT_RESET:
+                self.clear_states()
+
+    def render_log(self, output_name: str, format: str = 'gif', processes: int = None, **kwargs):
+        """
+        Gera o GIF (ou MP4) 'saves/<output_name>.<format>' a partir do registro de
+        eventos, com as imagens desenhadas em paralelo (ver renderer.render_events).
+        Args:
+            output_name: str - nome do arquivo, sem a extensão
+            format: str [default='gif'] - 'gif' ou 'mp4'
+            processes: int [default=None] - quantidade de processos; se None, usa todos os núcleos
+            kwargs - parâmetros do sink (ex.: delay_frame)
+        """
+        from renderer import render_events
+        return render_events(self, self.events, f'saves/{output_name}', format=format,
+                             processes=processes, **kwargs)
 
     def make_gif(self, output_name: str, delay_frame: int = 100):
         """
         Função para gerar um gif do grafo
         """
+        if self.log_events:
+            # As imagens ainda não foram geradas: são desenhadas agora a partir do registro
+            frames = self.render_log(output_name, delay_frame=delay_frame)
+            print("quantidade de imagens: ", frames)
+            return
+        if self._sink is not None:
+            # Gravação em streaming: as imagens já estão no arquivo, só falta finalizá-lo
+            self._sink.close()
+            print("quantidade de imagens: ", self._sink.frames)
+            self._sink = None
+            return
         if not self.allow_gif:
             raise ValueError("Você não habilitou a gravação 'allow_gif'")
 
@@ -207,23 +540,20 @@ class Navigator(VisualGraph):
 
     def reset(self):
         """
-        Volta a rede ao estado inicial
+        Volta a rede ao estado inicial. O custo é proporcional ao que foi ativado
+        desde o último reset, então o mesmo grafo compilado pode ser usado em
+        muitas buscas seguidas
         """
         # Desativa todos os nós e desconecta todas as arestas
-        for node in self.nodes:
-            node.set_state(DISCONNECTED)
-        for aresta in self.arestas.values():
-            aresta.set_state(DISCONNECTED)
-        
-        # reseta a distância percorrida
-        self.distancia_percorrida=0
-        self.steps_percorridas=0
-    def get_pos(self, node_id: int):
-        """
-        Retorna a posição xy de um nó
-        """
-        internal_node_id = self.node_id_mapping[node_id]
-        return self.nodes[internal_node_id].center
+        self.clear_states()
+        if self.log_events:
+            self.events.append((EVENT_RESET,))
+        super().reset()
 
-    def get_pos_goal(self):
-        return self.goal_xy
+
+class HeadlessNavigator(NavigatorBase):
+    """
+    Navegação sem a parte visual, para rodar muitas buscas sem plot (ex.: experiments.py).
+    É a NavigatorBase sozinha: o compile não escala posições para a imagem nem cria
+    os estados de nós e arestas, e não há plot, GIF nem save.
+    """
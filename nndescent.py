@@ -0,0 +1,190 @@
+"""
+Este módulo implementa a busca aproximada de k vizinhos mais próximos por
+NN-descent (Dong, Moses e Li, 2011), usada pelo MundoPequeno para embeddings
+de alta dimensão (128 a 768 dimensões), onde calcular todos os pares é inviável.
+
+A ideia é que "o vizinho do meu vizinho provavelmente também é meu vizinho":
+começa com vizinhos aleatórios e, a cada iteração, cada nó testa os vizinhos
+(diretos e reversos) dos seus vizinhos, ficando com os k melhores. Tudo é feito
+em blocos de nós com numpy. A função de distância é recebida como parâmetro
+(qualquer uma de generator.batch_metrics), e "mais próximo" significa menor valor.
+
+Durante a busca as distâncias 'euclidean' e 'cosine' são calculadas por produto
+interno em float32, bem mais rápido que a fórmula exata; as distâncias devolvidas
+no final são sempre recalculadas com a função exata.
+"""
+import numpy as np
+
+
+def _merge(idx: np.ndarray, dist: np.ndarray, rows: np.ndarray, k: int):
+    """
+    Fica com os k candidatos de menor distância de cada linha, ignorando o próprio
+    nó, posições vazias (-1) e candidatos repetidos.
+    """
+    dist = dist.copy()
+    dist[(idx == rows[:, None]) | (idx < 0)] = np.inf
+    # Marca as repetições: ordena cada linha pelo id e compara com o vizinho anterior
+    order = np.argsort(idx, axis=1, kind='stable')
+    sorted_idx = np.take_along_axis(idx, order, axis=1)
+    repeated = np.zeros_like(sorted_idx, dtype=bool)
+    repeated[:, 1:] = sorted_idx[:, 1:] == sorted_idx[:, :-1]
+    np.put_along_axis(dist, order, np.where(repeated, np.inf, np.take_along_axis(dist, order, axis=1)),
+                      axis=1)
+
+    part = np.argpartition(dist, k - 1, axis=1)[:, :k]
+    part_dist = np.take_along_axis(dist, part, axis=1)
+    best = np.argsort(part_dist, axis=1, kind='stable')
+    return (np.take_along_axis(np.take_along_axis(idx, part, axis=1), best, axis=1),
+            np.take_along_axis(part_dist, best, axis=1))
+
+
+def _reverse(idx: np.ndarray, k: int, rng: np.random.Generator):
+    """
+    Para cada nó, sorteia até k nós que o têm como vizinho (vizinhos reversos).
+    Posições sem vizinho reverso ficam com -1.
+    """
+    n = len(idx)
+    sources = np.repeat(np.arange(n), idx.shape[1])
+    targets = idx.ravel()
+    shuffle = rng.permutation(len(targets))
+    sources, targets = sources[shuffle], targets[shuffle]
+    order = np.argsort(targets, kind='stable')
+    sources, targets = sources[order], targets[order]
+    # Posição de cada aresta dentro do grupo do seu destino
+    group_start = np.searchsorted(targets, targets, side='left')
+    rank = np.arange(len(targets)) - group_start
+    keep = rank < k
+    reverse = np.full((n, k), -1, dtype=idx.dtype)
+    reverse[targets[keep], rank[keep]] = sources[keep]
+    return reverse
+
+
+class _FastMetric:
+    """
+    Distâncias aproximadas usadas só para ordenar candidatos durante a busca.
+    Para 'euclidean' e 'cosine' usa produto interno em float32 com normas
+    pré-calculadas ('cosine' é a distância 1 - cos, como em generator.batch_metrics);
+    para outras métricas usa a própria função exata.
+    """
+
+    def __init__(self, points: np.ndarray, metric: str, metric_f):
+        self.metric = metric
+        self.metric_f = metric_f
+        self.points = points
+        if metric in ('euclidean', 'cosine'):
+            self.points = points.astype(np.float32)
+            self.sq_norms = np.einsum('ij,ij->i', self.points, self.points)
+            self.norms = np.sqrt(self.sq_norms)
+
+    def __call__(self, rows: np.ndarray, candidates: np.ndarray):
+        # Distância de cada nó em rows para cada um dos seus candidatos
+        safe = np.maximum(candidates, 0)
+        if self.metric == 'euclidean':
+            dot = np.einsum('rd,rcd->rc', self.points[rows], self.points[safe])
+            dist = self.sq_norms[rows][:, None] + self.sq_norms[safe] - 2 * dot
+        elif self.metric == 'cosine':
+            dot = np.einsum('rd,rcd->rc', self.points[rows], self.points[safe])
+            dist = 1 - dot / (self.norms[rows][:, None] * self.norms[safe])
+        else:
+            dist = self.metric_f(self.points[rows][:, None, :], self.points[safe])
+        dist = dist.astype(np.float64)
+        dist[candidates < 0] = np.inf
+        return dist
+
+
+def nn_descent(points: np.ndarray, k: int, metric: str, metric_f, rng: np.random.Generator,
+               max_iterations: int = 12, delta: float = 0.001, sample: int = 12,
+               search_k: int = 16, memory_budget: int = 2 ** 24, verbose=False):
+    """
+    Busca aproximada dos k vizinhos mais próximos de cada ponto (sem contar ele mesmo).
+    Args:
+        points: np.ndarray (n, dim) - embeddings
+        k: int - quantidade de vizinhos
+        metric: str - nome da métrica ('euclidean', 'cosine' ou outra)
+        metric_f - função de distância vetorizada exata (ver generator.batch_metrics)
+        rng: np.random.Generator - gerador de números aleatórios
+        max_iterations: int [default=12] - número máximo de iterações
+        delta: float [default=0.001] - para quando menos de delta*n*k vizinhos mudam numa iteração
+        sample: int [default=12] - quantos vizinhos (diretos e reversos) de cada nó entram
+            na troca a cada iteração; cada nó testa sample x sample candidatos.
+            Valores maiores aumentam o recall e o custo
+        search_k: int [default=16] - a busca mantém max(k, search_k) vizinhos por nó e só
+            no final corta para k; com k pequeno isso melhora muito a convergência
+        memory_budget: int [default=2**24] - quantidade máxima de valores temporários por bloco
+        verbose: bool [default=False] - se True, exibe o progresso de cada iteração
+    Returns:
+        (indices, distancias) - arrays (n, k) ordenados do mais próximo ao mais distante
+    """
+    n, dim = points.shape
+    k = min(k, n - 1)
+    result_k = k
+    k = min(max(k, search_k), n - 1)
+    all_rows = np.arange(n)
+    distance = _FastMetric(points, metric, metric_f)
+
+    # Vizinhos iniciais aleatórios (k + 1 para sobrar k depois de tirar repetições)
+    idx = rng.integers(0, n, size=(n, k + 1))
+    dist = np.empty(idx.shape)
+    rows_per_block = max(1, memory_budget // ((k + 1) * dim))
+    for start in range(0, n, rows_per_block):
+        rows = all_rows[start:start + rows_per_block]
+        dist[rows] = distance(rows, idx[rows])
+    idx, dist = _merge(idx, dist, all_rows, k)
+
+    for iteration in range(max_iterations):
+        # Lista de cada nó: vizinhos diretos + reversos. Os candidatos de um nó são
+        # uma amostra das listas de cada nó da sua própria lista
+        joined = np.concatenate([idx, _reverse(idx, k, rng)], axis=1)
+        columns = rng.permuted(np.tile(np.arange(joined.shape[1]), (n, 1)), axis=1)[:, :sample]
+        sampled = np.take_along_axis(joined, columns, axis=1)
+
+        width = sample * sample
+        rows_per_block = max(1, memory_budget // ((width + k) * dim))
+        updates = 0
+        for start in range(0, n, rows_per_block):
+            rows = all_rows[start:start + rows_per_block]
+            own = sampled[rows]
+            candidates = np.where(own[:, :, None] >= 0, sampled[np.maximum(own, 0)], -1)
+            candidates = candidates.reshape(len(rows), -1)
+            cand_dist = distance(rows, candidates)
+
+            new_idx, new_dist = _merge(np.concatenate([idx[rows], candidates], axis=1),
+                                       np.concatenate([dist[rows], cand_dist], axis=1), rows, k)
+            updates += int((~(new_idx[:, :, None] == idx[rows][:, None, :]).any(axis=2)).sum())
+            idx[rows], dist[rows] = new_idx, new_dist
+
+        if verbose:
+            print(f"NN-descent: iteração {iteration + 1}, {updates} vizinhos atualizados")
+        if updates < delta * n * k:
+            break
+
+    # Distâncias finais com a função exata (a ordem é refeita com elas)
+    idx = idx[:, :result_k]
+    dist = np.empty(idx.shape)
+    rows_per_block = max(1, memory_budget // (result_k * dim))
+    for start in range(0, n, rows_per_block):
+        rows = all_rows[start:start + rows_per_block]
+        dist[rows] = metric_f(points[rows][:, None, :], points[idx[rows]])
+    order = np.argsort(dist, axis=1, kind='stable')
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(dist, order, axis=1)
+
+
+def knn_recall(points: np.ndarray, idx: np.ndarray, metric_f, rng: np.random.Generator,
+               sample_size: int = 200, memory_budget: int = 2 ** 24):
+    """
+    Mede o recall de um kNN aproximado comparando, numa amostra de nós, com o kNN exato.
+    Returns:
+        float - fração dos k vizinhos exatos encontrados, em média, na amostra
+    """
+    n, k = idx.shape
+    dim = points.shape[1]
+    nodes = rng.choice(n, size=min(sample_size, n), replace=False)
+    found = 0
+    rows_per_block = max(1, memory_budget // (n * dim))
+    for start in range(0, len(nodes), rows_per_block):
+        block = nodes[start:start + rows_per_block]
+        exact = metric_f(points[block][:, None, :], points[None, :, :])
+        exact[np.arange(len(block)), block] = np.inf
+        exact = np.argpartition(exact, k - 1, axis=1)[:, :k]
+        found += int((idx[block][:, :, None] == exact[:, None, :]).any(axis=2).sum())
+    return found / (len(nodes) * k)
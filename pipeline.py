@@ -1,5 +1,7 @@
 from algoritmos import *
 from heuristicas import *
+from generator import read_connections
+from navigator import NavigatorBase, Navigator, HeadlessNavigator
 import time
 import matplotlib.pyplot as plt
 import numpy as np
@@ -11,7 +13,11 @@ algorithms = {
     "AEstrela": AEstrela,      # Algoritmo A*
     "Dijkstra": Dijkstra,      # Algoritmo de Dijkstra
     "BestFirst": BestFirstSearch,  # Busca Best-First
-    "HillClimb": HillClimb     # Algoritmo de Hill Climbing
+    "HillClimb": HillClimb,    # Algoritmo de Hill Climbing
+    "BiBFS": BidirectionalBFS,            # Busca em Largura bidirecional
+    "BiDijkstra": BidirectionalDijkstra,  # Dijkstra bidirecional
+    "BiAEstrela": BidirectionalAEstrela,  # A* bidirecional
+    "CH": ContractionHierarchySearch      # Hierarquia de contração (pré-processada por grafo)
 }
 
 # Dicionário de heurísticas disponíveis
@@ -19,10 +25,60 @@ heuristicas = {
     "euclidian": heuristica_euclidian,     # Heurística Euclidiana
     "manhattan": heuristica_manhattan,     # Heurística Manhattan
     "chebyshev": heuristica_chebyshev,     # Heurística Chebyshev
+    "landmarks": None,                    # Landmarks (ALT), calculada por grafo (ver landmarks.py)
     "None": None                          # Sem heurística
 }
 
 
+def build_graph(mundoPequeno_connections: list,
+                nodes_positions=None,
+                img_dimension=(600, 600),
+                headless=False,
+                allow_gif=False,
+                log_events=False):
+    """
+    Cria e compila o grafo usado pelo pipeline. O grafo compilado pode ser passado
+    ao pipeline no lugar das conexões, para ser reaproveitado em muitas buscas.
+
+    Args:
+        mundoPequeno_connections: list - Conexões, nos mesmos formatos aceitos pelo pipeline.
+        nodes_positions: list (opcional) - Posições dos nós para visualização.
+        img_dimension: tuple - Dimensões da imagem de visualização.
+        headless: bool [default=False] - Se True, cria um HeadlessNavigator (sem plot).
+        allow_gif: bool [default=False] - Permite gerar o gif do processo.
+        log_events: bool [default=False] - Registra os eventos da navegação (ver renderer.py).
+
+    Returns:
+        Navigator ou HeadlessNavigator - grafo compilado
+    """
+    graph = HeadlessNavigator() if headless else Navigator(allow_gif=allow_gif,
+                                                           log_events=log_events)
+    if isinstance(mundoPequeno_connections, str):
+        # Arquivo escrito por MundoPequeno.save_connections
+        mundoPequeno_connections = read_connections(mundoPequeno_connections)
+    if isinstance(mundoPequeno_connections, list):
+        if mundoPequeno_connections:
+            node, conn, dist = zip(*mundoPequeno_connections)
+            graph.add_edges(node, conn, dist)
+    else:
+        # Blocos (src, dst, weight) vindos de MundoPequeno.iter_connections
+        for src, dst, weights in mundoPequeno_connections:
+            graph.add_edges(src, dst, weights)
+
+    if headless:
+        # Sem imagem: só as posições dos nós e a lista de vizinhos
+        graph.compile(kwargs_graph={'k': 0.05}, nodes_positions=nodes_positions)
+        return graph
+
+    # Configurações do gráfico e posições dos nós
+    graph.compile(img_dimension,
+                  border=-150,
+                  kwargs_graph={'k': 0.05},
+                  nodes_positions=nodes_positions)
+    graph.set_attributes(radius=5, radius_add=4, thickness=1, thickness_add=2)
+    return graph
+
+
 def pipeline(mundoPequeno_connections: list,
              algorithm_name: str,
              heuristica_name: str,
@@ -32,46 +88,75 @@ def pipeline(mundoPequeno_connections: list,
              nodes_positions=None,
              img_dimension=(600, 600),
              try_plot=False,
+             headless=None,
              kwargs_run={},
-             kwargs_gif={}):
+             kwargs_gif={},
+             video_format='gif',
+             render_processes=None):
     """
     Função principal que executa um experimento com um algoritmo de busca no grafo de pequeno mundo.
     Conecta os nós, escolhe o algoritmo e heurística, executa a busca e gera o resultado.
 
     Args:
         mundoPequeno_connections: list - Lista com as conexões entre os nós e suas distâncias.
+            Também aceita os blocos (src, dst, weight) de MundoPequeno.iter_connections
+            ou o caminho de um arquivo escrito por MundoPequeno.save_connections.
+            Também aceita um grafo já compilado por build_graph, que é reaproveitado:
+            ele só volta ao estado inicial (reset), e o custo disso é o da busca anterior.
         algorithm_name: str - Nome do algoritmo de busca a ser utilizado.
-        heuristica_name: str - Nome da heurística a ser utilizada.
+        heuristica_name: str - Nome da heurística a ser utilizada ('landmarks' usa as tabelas
+            de Navigator.landmarks, calculadas na primeira busca de cada grafo).
         init_node: int - Nó de início para a busca.
         goal_node: int - Nó objetivo para a busca.
         gif_name: str (opcional) - Nome do arquivo para salvar um gif do processo.
         nodes_positions: list (opcional) - Posições dos nós para visualização.
         img_dimension: tuple - Dimensões da imagem de visualização.
         try_plot: bool - Se True, gera gráficos e gif do processo.
+        headless: bool [default=None] - Se True, usa o HeadlessNavigator (sem nenhuma parte
+            visual). Se None, usa o HeadlessNavigator quando try_plot for False.
         kwargs_run: dict - Argumentos adicionais para o algoritmo de busca.
-        kwargs_gif: dict - Argumentos adicionais para a geração do gif.
+        kwargs_gif: dict - Argumentos adicionais para a geração do gif (ex.: delay_frame,
+            e delta=False para guardar em cada quadro a imagem inteira).
+        video_format: str [default='gif'] - Formato do arquivo gravado: 'gif' ou 'mp4'.
+        render_processes: int [default=None] - Se for dado, a busca só registra os eventos
+            da navegação e as imagens são desenhadas depois dela, em paralelo, nessa
+            quantidade de processos (ver renderer.py). O tempo medido fica só o da busca.
 
     Returns:
         tuple - Nome do experimento, tempo de execução, distancia percorrida, 
                 true/false se chegou no goal, e histórico da heurística (se houver).
     """
 
-    # Criando o grafo e adicionando as conexões
-    graph = Navigator(allow_gif=gif_name is not None)
-    for node, conn, dist in mundoPequeno_connections:
-        graph.add(node, conn, weight=dist)
-
-    # Configurações do gráfico e posições dos nós
-    graph.compile(img_dimension,
-                  border=-150,
-                  kwargs_graph={'k': 0.05},
-                  nodes_positions=nodes_positions)
-    graph.set_attributes(radius=5, radius_add=4, thickness=1, thickness_add=2)
+    log_events = try_plot and gif_name is not None and render_processes is not None
+    if isinstance(mundoPequeno_connections, NavigatorBase):
+        # Grafo já compilado: só volta ao estado inicial
+        graph = mundoPequeno_connections
+        if try_plot and not isinstance(graph, Navigator):
+            raise ValueError("Erro - try_plot precisa do Navigator, use build_graph(headless=False)")
+        graph.reset()
+        if isinstance(graph, Navigator):
+            graph.log_events = log_events
+            graph.events = []  # O registro de eventos é só desta busca
+    else:
+        # Criando o grafo e adicionando as conexões
+        if headless is None:
+            headless = not try_plot
+        if headless and try_plot:
+            raise ValueError("Erro - try_plot precisa do Navigator, use headless=False")
+        graph = build_graph(mundoPequeno_connections, nodes_positions=nodes_positions,
+                            img_dimension=img_dimension, headless=headless,
+                            allow_gif=gif_name is not None, log_events=log_events)
     graph.set_goal(goal_node)
+    if try_plot and gif_name is not None and not log_events:
+        # As imagens são gravadas em streaming durante a busca
+        graph.record(gif_name, format=video_format, **kwargs_gif)
     
     # Seleciona a heurística e o algoritmo a serem utilizados
-    if algorithm_name in ['AEstrela','BestFirst','HillClimb','Dijkstra']:
+    if algorithm_name in ['AEstrela','BestFirst','HillClimb','Dijkstra','BiDijkstra','BiAEstrela']:
         heuristica = heuristicas[heuristica_name]
+        if heuristica_name == 'landmarks':
+            # As tabelas ficam no grafo, então um grafo reaproveitado não refaz o pré-processamento
+            heuristica = graph.landmarks()
     else:
         heuristica = None
     
@@ -96,8 +181,10 @@ def pipeline(mundoPequeno_connections: list,
     experiment_name = f'{algorithm_name}_{n}nodes'
     
     # Se o parâmetro try_plot for True, gera o gif do processo
-    if try_plot:
-        graph.make_gif(gif_name, **kwargs_gif)
+    if log_events:
+        graph.render_log(gif_name, format=video_format, processes=render_processes, **kwargs_gif)
+    elif try_plot:
+        graph.make_gif(gif_name)
 
     # Se não houver heurística, retorna apenas o nome do experimento e o tempo
     if heuristica is None:
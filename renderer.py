@@ -0,0 +1,124 @@
+"""
+Este módulo gera o GIF (ou MP4) de uma navegação a partir do registro de eventos
+do Navigator (Navigator(log_events=True)), depois que a busca terminou.
+
+Durante a busca o Navigator só anota os eventos (nav, undo_nav, set_goal, reset e
+o pedido de cada imagem), sem desenhar nada. Aqui as imagens são divididas em
+blocos consecutivos e cada bloco é desenhado num processo de um pool: o processo
+refaz os eventos até o início do bloco (só mudando os estados, sem desenhar) e
+desenha as imagens do bloco com o plot incremental. No GIF, os quadros também
+são codificados nos processos (ver video.encode_gif_frame); o processo principal
+só os escreve em ordem no arquivo.
+"""
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from navigator import EVENT_FRAME
+from video import open_sink, encode_gif_frame
+
+_worker = {}  # Estado de cada processo do pool (ver _init_worker)
+
+
+def _restart(graph):
+    # Volta a cópia do grafo ao estado do compile: tudo desativado e sem goal
+    graph.node_active[:] = False
+    graph.edge_active[:] = False
+    graph._touched_nodes, graph._touched_edges = [], []
+    graph.node_style = {}
+    graph.goal = None
+    graph._frame = None  # os estados mudaram sem passar por set_node_state: refaz a imagem
+
+
+def _init_worker(graph, events: list, frame_positions: list, encode_gif: bool, delta: bool,
+                 delay_frame: int):
+    # Cada processo recebe uma cópia do grafo
+    _restart(graph)
+    _worker.update(graph=graph, events=events, frame_positions=frame_positions,
+                   encode_gif=encode_gif, delta=delta, delay_frame=delay_frame, position=0)
+
+
+def _render_frames(first: int, last: int):
+    """
+    Desenha as imagens first a last-1 do registro. Fica no nível do módulo para
+    poder ser executada nos processos do pool.
+    Returns:
+        list - quadros codificados (GIF) ou imagens BGR (MP4)
+    """
+    graph, events = _worker['graph'], _worker['events']
+    frame_positions = _worker['frame_positions']
+    encode_gif, delta = _worker['encode_gif'], _worker['delta']
+
+    # No GIF com delta, cada quadro depende da imagem anterior, que também é desenhada
+    start = first - 1 if (encode_gif and delta and first > 0) else first
+    if frame_positions[start] < _worker['position']:
+        # Os blocos chegam em ordem, mas se voltar, refaz a partir do compile
+        _restart(graph)
+        _worker['position'] = 0
+
+    frames, previous = [], None
+    for frame in range(start, last):
+        position = frame_positions[frame]
+        graph.replay(events[_worker['position']:position])
+        _worker['position'] = position
+        img = graph.plot(frame)
+        if frame >= first:
+            if encode_gif:
+                frames.append(encode_gif_frame(img, previous if delta else None,
+                                               _worker['delay_frame']))
+            else:
+                frames.append(img)
+        previous = img
+    return frames
+
+
+def render_events(graph, events: list, output_name: str, format: str = 'gif',
+                  processes: int = None, chunk_size: int = 16, **kwargs):
+    """
+    Desenha as imagens de um registro de eventos em paralelo e as escreve em ordem.
+    Args:
+        graph: Navigator - grafo compilado que gerou o registro
+        events: list - registro de eventos (Navigator.events)
+        output_name: str - caminho do arquivo, sem a extensão
+        format: str [default='gif'] - 'gif' ou 'mp4' (ver video.py)
+        processes: int [default=None] - quantidade de processos; se None, usa todos os núcleos
+        chunk_size: int [default=16] - quantidade de imagens desenhadas por tarefa
+        kwargs - parâmetros do sink (ex.: delay_frame, delta)
+    Returns:
+        int - quantidade de imagens escritas
+    """
+    frame_positions = [i for i, event in enumerate(events) if event[0] == EVENT_FRAME]
+    if not frame_positions:
+        raise ValueError("Erro - o registro não tem nenhuma imagem (add_imgtogif)")
+    sink = open_sink(output_name, format, **kwargs)
+    encode_gif = format == 'gif'
+    delta = getattr(sink, 'delta', False)
+    delay_frame = getattr(sink, 'delay_frame', 100)
+    img_shape = tuple(graph.img_shape)
+
+    chunks = [(first, min(first + chunk_size, len(frame_positions)))
+              for first in range(0, len(frame_positions), chunk_size)]
+    processes = processes or multiprocessing.cpu_count()
+    context = multiprocessing.get_context(
+        'fork' if 'fork' in multiprocessing.get_all_start_methods() else None)
+    with sink, ProcessPoolExecutor(max_workers=processes, mp_context=context,
+                                   initializer=_init_worker,
+                                   initargs=(graph, events, frame_positions, encode_gif,
+                                             delta, delay_frame)) as pool:
+        # No máximo 2 blocos por processo ficam pendentes, o que limita a memória
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_render_frames, *chunk))
+            if len(pending) >= 2 * processes:
+                _write(sink, pending.popleft().result(), encode_gif, img_shape)
+        while pending:
+            _write(sink, pending.popleft().result(), encode_gif, img_shape)
+    return sink.frames
+
+
+def _write(sink, frames: list, encode_gif: bool, img_shape):
+    # Escreve no sink, em ordem, os quadros de um bloco
+    for frame in frames:
+        if encode_gif:
+            sink.write_encoded(frame, img_shape)
+        else:
+            sink.write(frame)
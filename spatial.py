@@ -0,0 +1,255 @@
+"""
+Este módulo implementa um índice espacial de grade uniforme (GridIndex) sobre
+um conjunto de pontos de baixa dimensão (2D ou 3D).
+
+Os pontos são agrupados em células de lado fixo e guardados ordenados pelo
+índice da célula, de modo que os pontos de uma célula (e de uma linha inteira
+de células vizinhas) ocupam um trecho contíguo de um único array. Isso permite
+responder consultas de k vizinhos mais próximos (distância euclidiana) olhando
+apenas as células ao redor de cada consulta, sem nunca montar a matriz de
+distâncias n x n.
+"""
+import numpy as np
+
+
+class GridIndex:
+    # Maior raio (em células) resolvido pelas passadas vetorizadas do knn
+    vectorized_radius = 3
+
+    def __init__(self, points: np.ndarray, cell_size: float = None, points_per_cell: int = 4):
+        """
+        Constrói o índice.
+        Args:
+            points: np.ndarray (n, dim) - pontos indexados (dim deve ser 2 ou 3)
+            cell_size: float [default=None] - lado de cada célula. Se None, é escolhido
+                para que cada célula tenha em média points_per_cell pontos
+            points_per_cell: int [default=4] - ocupação média desejada por célula
+        """
+        points = np.asarray(points, dtype=np.float64)
+        if points.ndim != 2 or points.shape[1] not in (2, 3):
+            raise ValueError(
+                "Erro - o GridIndex só trabalha com pontos de dimensão 2 ou 3")
+        self.points = points
+        self.dim = points.shape[1]
+
+        self.lo = points.min(axis=0)
+        extent = np.maximum(points.max(axis=0) - self.lo, 1e-12)
+        if cell_size is None:
+            volume = float(np.prod(extent))
+            cell_size = (volume * points_per_cell / max(len(points), 1)) ** (1 / self.dim)
+        self.cell_size = float(cell_size)
+        self.shape = (np.floor(extent / self.cell_size).astype(int) + 1)
+
+        self._build()
+
+    def _build(self):
+        # Ordena os pontos pelo índice (linear) da célula em que caem
+        cell_ids = self._cell_ids(self._cell_coords(self.points))
+        self.order = np.argsort(cell_ids, kind='stable')
+        sorted_ids = cell_ids[self.order]
+        # starts[c]:starts[c+1] é o trecho de self.order que pertence à célula c
+        self.starts = np.searchsorted(
+            sorted_ids, np.arange(int(np.prod(self.shape)) + 1))
+
+    def _cell_coords(self, points: np.ndarray):
+        # Coordenadas inteiras da célula; pontos fora da grade vão para a borda
+        coords = np.floor((points - self.lo) / self.cell_size).astype(int)
+        return np.clip(coords, 0, self.shape - 1)
+
+    def _cell_ids(self, coords: np.ndarray):
+        return np.ravel_multi_index(tuple(coords.T), tuple(self.shape))
+
+    def insert(self, points: np.ndarray, all_points: np.ndarray = None):
+        """
+        Adiciona novos pontos ao índice. Os novos pontos recebem os índices
+        len(self.points) em diante. Pontos fora da grade atual vão para as
+        células da borda, o que mantém as consultas exatas. A ordem dos pontos e o
+        início de cada célula são refeitos por inteiro (um merge ordenado), então
+        cada chamada custa O(n + células), além do O(m log m) de ordenar o lote.
+        Args:
+            points: np.ndarray (m, dim) - pontos novos
+            all_points: np.ndarray [default=None] - array com os pontos antigos seguidos
+                dos novos, se já existir; é usado no lugar de concatenar uma cópia
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, self.dim)
+        first = len(self.points)
+        if all_points is None:
+            all_points = np.concatenate([self.points, points])
+        self.points = all_points
+
+        new_ids = self._cell_ids(self._cell_coords(points))
+        new_order = np.argsort(new_ids, kind='stable')
+        # Posição de cada novo ponto dentro da ordem atual (merge ordenado)
+        positions = self.starts[new_ids[new_order] + 1]
+        self.order = np.insert(self.order, positions, first + new_order)
+        self.starts = self.starts + np.searchsorted(
+            np.sort(new_ids), np.arange(len(self.starts)), side='left')
+
+    def _block(self, cell: np.ndarray, radius: int):
+        """
+        Retorna os índices de todos os pontos nas células a até radius células
+        (distância de Chebyshev) da célula dada.
+        """
+        lo = np.maximum(cell - radius, 0)
+        hi = np.minimum(cell + radius, self.shape - 1)
+        # Na última dimensão as células vizinhas são contíguas em self.order,
+        # então basta um slice por "linha" de células
+        ranges = [np.arange(lo[d], hi[d] + 1) for d in range(self.dim - 1)]
+        rows = np.stack(np.meshgrid(*ranges, indexing='ij'), axis=-1).reshape(-1, self.dim - 1)
+        first = self._cell_ids(np.column_stack([rows, np.full(len(rows), lo[-1])]))
+        last = self._cell_ids(np.column_stack([rows, np.full(len(rows), hi[-1])]))
+        return np.concatenate([self.order[self.starts[a]:self.starts[b + 1]]
+                               for a, b in zip(first, last)])
+
+    def query_box(self, lo: np.ndarray, hi: np.ndarray):
+        """
+        Retorna os índices de todos os pontos dentro da caixa [lo, hi] (bordas inclusas).
+        Só as linhas de células que cobrem a caixa são lidas.
+        """
+        lo = np.asarray(lo, dtype=np.float64)
+        hi = np.asarray(hi, dtype=np.float64)
+        if np.any(hi < lo):
+            return np.empty(0, dtype=int)
+        cell_lo = self._cell_coords(lo[None, :])[0]
+        cell_hi = self._cell_coords(hi[None, :])[0]
+        ranges = [np.arange(cell_lo[d], cell_hi[d] + 1) for d in range(self.dim - 1)]
+        rows = np.stack(np.meshgrid(*ranges, indexing='ij'), axis=-1).reshape(-1, self.dim - 1)
+        first = self._cell_ids(np.column_stack([rows, np.full(len(rows), cell_lo[-1])]))
+        last = self._cell_ids(np.column_stack([rows, np.full(len(rows), cell_hi[-1])]))
+        candidates = np.concatenate([self.order[self.starts[a]:self.starts[b + 1]]
+                                     for a, b in zip(first.tolist(), last.tolist())])
+        points = self.points[candidates]
+        return candidates[np.all((points >= lo) & (points <= hi), axis=1)]
+
+    def _rows(self, cells: np.ndarray, radius: int):
+        """
+        Para cada célula em cells (m, dim), retorna os trechos [inicio, fim) de
+        self.order que cobrem as células a até radius células dela. Cada trecho
+        é uma "linha" de células contíguas na última dimensão.
+        Returns:
+            (inicio, fim) - arrays (m, (2*radius+1)**(dim-1)); linhas fora da grade ficam vazias
+        """
+        offsets = np.stack(np.meshgrid(*[np.arange(-radius, radius + 1)] * (self.dim - 1),
+                                       indexing='ij'), axis=-1).reshape(-1, self.dim - 1)
+        rows = cells[:, None, :-1] + offsets[None, :, :]
+        valid = np.all((rows >= 0) & (rows < self.shape[:-1]), axis=-1)
+        rows = np.clip(rows, 0, self.shape[:-1] - 1)
+        last_lo = np.broadcast_to(np.maximum(cells[:, None, -1:] - radius, 0), rows.shape[:2] + (1,))
+        last_hi = np.broadcast_to(np.minimum(cells[:, None, -1:] + radius, self.shape[-1] - 1),
+                                  rows.shape[:2] + (1,))
+        first = self._cell_ids(np.concatenate([rows, last_lo], axis=-1).reshape(-1, self.dim))
+        last = self._cell_ids(np.concatenate([rows, last_hi], axis=-1).reshape(-1, self.dim))
+        start = self.starts[first].reshape(valid.shape)
+        end = self.starts[last + 1].reshape(valid.shape)
+        return np.where(valid, start, 0), np.where(valid, end, 0)
+
+    @staticmethod
+    def _select(dist: np.ndarray, k: int):
+        # Seleciona e ordena as k menores distâncias de cada linha
+        part = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        part_dist = np.take_along_axis(dist, part, axis=1)
+        order = np.argsort(part_dist, axis=1, kind='stable')
+        return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_dist, order, axis=1)
+
+    def knn(self, k: int, queries: np.ndarray = None, chunk_size: int = 16384):
+        """
+        Busca exata dos k vizinhos mais próximos (distância euclidiana).
+        Args:
+            k: int - quantidade de vizinhos
+            queries: np.ndarray (m, dim) [default=None] - pontos de consulta. Se None,
+                consulta os próprios pontos indexados, excluindo cada ponto dele mesmo
+            chunk_size: int [default=16384] - consultas processadas de uma vez na
+                primeira passada (limita a memória temporária)
+        Returns:
+            (indices, distancias) - arrays (m, k) ordenados do mais próximo ao mais distante
+        """
+        exclude_self = queries is None
+        if exclude_self:
+            queries = self.points
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, self.dim)
+        available = len(self.points) - (1 if exclude_self else 0)
+        k = min(k, available)
+
+        m = len(queries)
+        indices = np.empty((m, k), dtype=int)
+        distances = np.empty((m, k), dtype=np.float64)
+        if m == 0 or k == 0:
+            return indices, distances
+
+        # Passadas vetorizadas: candidatos nas células a até radius células da
+        # consulta, guardados numa matriz preenchida com -1 onde não há ponto.
+        # A cada passada só seguem as consultas que ainda não têm resposta garantida
+        pending = np.arange(m)
+        radius = 1
+        while len(pending) and radius <= self.vectorized_radius:
+            pending = np.concatenate([
+                self._knn_vectorized(queries, pending[start:start + chunk_size], k, radius,
+                                     exclude_self, indices, distances)
+                for start in range(0, len(pending), chunk_size)])
+            radius += 1
+
+        if len(pending):
+            self._knn_grouped(queries, pending, k, radius, exclude_self, indices, distances)
+        return indices, distances
+
+    def _knn_vectorized(self, queries, chunk, k, radius, exclude_self, indices, distances):
+        """
+        Resolve de uma vez as consultas de chunk olhando as células a até radius
+        células de cada uma. Retorna as consultas que ficaram sem resposta garantida.
+        """
+        row_start, row_end = self._rows(self._cell_coords(queries[chunk]), radius)
+        width = int((row_end - row_start).max())
+        slots = row_start[:, :, None] + np.arange(width)[None, None, :]
+        filled = slots < row_end[:, :, None]
+        candidates = np.where(filled, self.order[np.minimum(slots, len(self.order) - 1)], -1)
+        candidates = candidates.reshape(len(chunk), -1)
+        if candidates.shape[1] < k:
+            return chunk
+
+        diff = queries[chunk][:, None, :] - self.points[candidates]
+        dist = np.sqrt(np.sum(diff ** 2, axis=-1))
+        dist[candidates < 0] = np.inf
+        if exclude_self:
+            dist[candidates == chunk[:, None]] = np.inf
+
+        part, part_dist = self._select(dist, k)
+        # Qualquer ponto fora do bloco está a pelo menos radius*cell_size
+        # da consulta, então só as consultas cujo k-ésimo vizinho está
+        # dentro desse raio têm a resposta garantida
+        done = part_dist[:, -1] <= radius * self.cell_size
+        indices[chunk[done]] = np.take_along_axis(candidates, part, axis=1)[done]
+        distances[chunk[done]] = part_dist[done]
+        return chunk[~done]
+
+    def _knn_grouped(self, queries, pending, k, radius, exclude_self, indices, distances):
+        """
+        Passada de correção para as (poucas) consultas que não tiveram resposta
+        garantida nas passadas vetorizadas: agrupa por célula e vai aumentando o
+        raio a partir de radius até garantir.
+        """
+        query_cells = self._cell_ids(self._cell_coords(queries[pending]))
+        query_order = np.argsort(query_cells, kind='stable')
+        bounds = np.flatnonzero(np.diff(query_cells[query_order])) + 1
+        max_radius = int(self.shape.max())
+
+        for group in np.split(query_order, bounds):
+            cell = np.array(np.unravel_index(query_cells[group[0]], tuple(self.shape)))
+            group = pending[group]
+            group_radius = radius
+            while len(group):
+                candidates = self._block(cell, group_radius)
+                diff = queries[group][:, None, :] - self.points[candidates][None, :, :]
+                dist = np.sqrt(np.sum(diff ** 2, axis=-1))
+                if exclude_self:
+                    dist[group[:, None] == candidates[None, :]] = np.inf
+
+                if dist.shape[1] < k + (1 if exclude_self else 0) and group_radius < max_radius:
+                    group_radius += 1
+                    continue
+
+                part, part_dist = self._select(dist, k)
+                done = (part_dist[:, -1] <= group_radius * self.cell_size) | (group_radius >= max_radius)
+                indices[group[done]] = candidates[part[done]]
+                distances[group[done]] = part_dist[done]
+                group = group[~done]
+                group_radius += 1
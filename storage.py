@@ -0,0 +1,61 @@
+"""
+Este módulo implementa o formato em disco usado para salvar grafos sem pickle.
+
+Um grafo salvo é um diretório com um arquivo .npy por array e um meta.json com
+os metadados (parâmetros de geração, versão do formato e a lista de arrays).
+Na leitura, os arrays são abertos com memmap (np.load(mmap_mode='r')): nada é
+lido do disco até ser usado, e vários processos que abrem o mesmo grafo
+compartilham as mesmas páginas de memória.
+"""
+import json
+import os
+import numpy as np
+
+FORMAT_VERSION = 1  # Versão atual do formato em disco
+META_FILE = 'meta.json'
+
+
+def save_arrays(directory: str, arrays: dict, meta: dict):
+    """
+    Salva um conjunto de arrays e seus metadados em um diretório.
+    Args:
+        directory: str - diretório de destino (é criado se não existir)
+        arrays: dict - nome -> np.ndarray; cada array vira um arquivo <nome>.npy
+        meta: dict - metadados serializáveis em JSON
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, f'{name}.npy'), np.asarray(array))
+
+    meta = dict(meta)
+    meta['format_version'] = FORMAT_VERSION
+    meta['arrays'] = sorted(arrays.keys())
+    with open(os.path.join(directory, META_FILE), 'w') as file:
+        json.dump(meta, file, indent=2)
+
+
+def load_arrays(directory: str, mmap: bool = True):
+    """
+    Carrega um diretório salvo por save_arrays.
+    Args:
+        directory: str - diretório salvo
+        mmap: bool [default=True] - se True, os arrays são abertos com memmap (somente leitura)
+    Returns:
+        (arrays, meta) - dicionário nome -> array e os metadados
+    """
+    with open(os.path.join(directory, META_FILE)) as file:
+        meta = json.load(file)
+    version = meta.get('format_version')
+    if version != FORMAT_VERSION:
+        raise ValueError(
+            f"Erro - formato em disco versão {version} não suportado (esperado {FORMAT_VERSION})")
+
+    arrays = {name: np.load(os.path.join(directory, f'{name}.npy'),
+                            mmap_mode='r' if mmap else None)
+              for name in meta['arrays']}
+    return arrays, meta
+
+
+def is_saved_dir(path: str):
+    # Indica se o caminho é um diretório salvo por save_arrays
+    return os.path.isfile(os.path.join(path, META_FILE))
@@ -0,0 +1,179 @@
+"""
+Este módulo implementa a gravação em streaming das imagens da navegação.
+
+Em vez de guardar todas as imagens em uma lista e só escrever o arquivo no
+final, cada imagem é codificada e escrita no disco assim que é produzida, então
+a memória usada não depende da quantidade de passos da busca. Há dois formatos:
+- GifSink: GIF animado, escrito quadro a quadro com o codificador do PIL. Por
+  padrão (delta=True) cada quadro guarda só o retângulo que mudou em relação ao
+  anterior, o que deixa o arquivo bem menor.
+- Mp4Sink: vídeo MP4 escrito pelo cv2.VideoWriter (o próprio codec já guarda só
+  as diferenças entre quadros).
+As imagens recebidas estão em BGR, como as geradas pelo VisualGraph.plot.
+
+Os quadros do GIF são codificados de forma independente (encode_gif_frame), o
+que permite codificá-los em paralelo e só escrevê-los em ordem (ver renderer.py).
+"""
+import cv2
+import numpy as np
+from PIL import Image, GifImagePlugin
+
+
+def encode_gif_frame(img: np.ndarray, previous: np.ndarray = None, delay_frame: int = 100):
+    """
+    Codifica um quadro de GIF (sem o cabeçalho do arquivo).
+    Args:
+        img: np.ndarray - imagem BGR
+        previous: np.ndarray [default=None] - quadro anterior; se for dado, o quadro
+            guarda só o retângulo que mudou em relação a ele
+        delay_frame: int [default=100] - duração do quadro, em milissegundos
+    Returns:
+        bytes - quadro codificado, com a sua própria paleta
+    """
+    offset = (0, 0)
+    region = img
+    if previous is not None:
+        # Retângulo que contém todos os pixels que mudaram
+        changed = np.any(img != previous, axis=2)
+        rows = np.flatnonzero(changed.any(axis=1))
+        cols = np.flatnonzero(changed.any(axis=0))
+        if len(rows):
+            y0, y1, x0, x1 = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+        else:
+            # Nada mudou: um quadro de 1 pixel mantém a duração
+            y0, y1, x0, x1 = 0, 1, 0, 1
+        region = img[y0:y1, x0:x1]
+        offset = (int(x0), int(y0))
+
+    frame = Image.fromarray(cv2.cvtColor(region, cv2.COLOR_BGR2RGB)).convert(
+        'P', palette=Image.Palette.ADAPTIVE)
+    # disposal=1 mantém o quadro anterior embaixo do próximo
+    return b''.join(GifImagePlugin.getdata(frame, offset, duration=delay_frame, disposal=1,
+                                           include_color_table=True))
+
+
+class GifSink:
+    def __init__(self, file_name: str, delay_frame: int = 100, loop: int = 0, delta: bool = True):
+        """
+        Args:
+            file_name: str - arquivo de saída (.gif)
+            delay_frame: int [default=100] - duração de cada quadro, em milissegundos
+            loop: int [default=0] - quantidade de repetições (0 = loop infinito)
+            delta: bool [default=True] - se True, cada quadro guarda só o retângulo
+                que mudou desde o quadro anterior; se False, guarda a imagem inteira
+        """
+        self.file_name = file_name
+        self.delay_frame = delay_frame
+        self.loop = loop
+        self.delta = delta
+        self.frames = 0  # quantidade de quadros escritos
+        self._previous = None  # último quadro escrito (só no modo delta)
+        self._file = open(file_name, 'wb')
+
+    def write(self, img: np.ndarray):
+        """
+        Codifica e escreve um quadro (imagem BGR)
+        """
+        previous = self._previous if self.frames > 0 else None
+        data = encode_gif_frame(img, previous, self.delay_frame)
+        if self.delta:
+            self._previous = img.copy()
+        self.write_encoded(data, img.shape[:2])
+
+    def write_encoded(self, data: bytes, img_shape):
+        """
+        Escreve um quadro já codificado por encode_gif_frame.
+        Args:
+            data: bytes - quadro codificado
+            img_shape: tuple - (altura, largura) das imagens; usado no cabeçalho,
+                escrito antes do primeiro quadro
+        """
+        if self.frames == 0:
+            # Cabeçalho do arquivo com o tamanho da imagem inteira e o loop. Cada
+            # quadro tem a sua paleta, então a paleta global não é usada
+            canvas = Image.new('P', (int(img_shape[1]), int(img_shape[0])))
+            header, _ = GifImagePlugin.getheader(canvas, info={'loop': self.loop,
+                                                               'duration': self.delay_frame})
+            self._file.write(b''.join(header))
+        self._file.write(data)
+        self.frames += 1
+
+    def close(self):
+        """
+        Finaliza o arquivo
+        """
+        if self._file.closed:
+            return
+        self._file.write(b';')  # fim do GIF
+        self._file.close()
+        self._previous = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class Mp4Sink:
+    def __init__(self, file_name: str, delay_frame: int = 100, fourcc: str = 'mp4v'):
+        """
+        Args:
+            file_name: str - arquivo de saída (.mp4)
+            delay_frame: int [default=100] - duração de cada quadro, em milissegundos
+            fourcc: str [default='mp4v'] - codec usado pelo cv2.VideoWriter
+        """
+        self.file_name = file_name
+        self.fps = 1000 / delay_frame
+        self.fourcc = fourcc
+        self.frames = 0  # quantidade de quadros escritos
+        self._writer = None  # criado no primeiro quadro, quando o tamanho é conhecido
+
+    def write(self, img: np.ndarray):
+        """
+        Codifica e escreve um quadro (imagem BGR)
+        """
+        if self._writer is None:
+            height, width = img.shape[:2]
+            self._writer = cv2.VideoWriter(self.file_name, cv2.VideoWriter_fourcc(*self.fourcc),
+                                           self.fps, (width, height))
+            if not self._writer.isOpened():
+                raise ValueError(
+                    f"Erro - o cv2.VideoWriter não conseguiu abrir '{self.file_name}' com o codec '{self.fourcc}'")
+        self._writer.write(np.ascontiguousarray(img))
+        self.frames += 1
+
+    def close(self):
+        """
+        Finaliza o arquivo
+        """
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+# Formatos disponíveis: nome -> (classe, extensão)
+sinks = {
+    'gif': (GifSink, '.gif'),
+    'mp4': (Mp4Sink, '.mp4'),
+}
+
+
+def open_sink(output_name: str, format: str = 'gif', **kwargs):
+    """
+    Abre um sink de gravação.
+    Args:
+        output_name: str - caminho do arquivo, sem a extensão
+        format: str [default='gif'] - 'gif' (GifSink) ou 'mp4' (Mp4Sink)
+        kwargs - parâmetros do sink (ex.: delay_frame, delta)
+    """
+    if format not in sinks:
+        raise ValueError(f"Erro - formato '{format}' desconhecido, use um de {list(sinks)}")
+    sink_type, extension = sinks[format]
+    return sink_type(output_name + extension, **kwargs)